@@ -1,14 +1,14 @@
 from flask import Flask
-from flasgger import Swagger
 from flask_marshmallow import Marshmallow
 from flask_cors import CORS
-from app.config.swagger import swagger_template
+from app.config.config import config
 
 prefix = "/api/v1"
 
 def create_app():
     app = Flask(__name__)
-    print(" * Swagger on: http://127.0.0.1:5000/apidocs")
+    if config.swagger_enabled:
+        print(" * Swagger on: http://127.0.0.1:5000/apidocs")
     
     register_extensions(app)
     register_routes(app)
@@ -18,10 +18,24 @@ def create_app():
 def register_extensions(app):
     
     CORS(app, resources={r"/api/*": {"origins": "*"}})
-    Swagger(app, template=swagger_template)
+    if config.swagger_enabled:
+        # flasgger registra sus rutas al crear la app, así que no puede cargarse más tarde
+        from flasgger import Swagger
+        from app.config.swagger import swagger_template
+        Swagger(app, template=swagger_template)
     Marshmallow(app)
 
 def register_routes(app):
     from app.chat.controller.chat_controller import chat_controller
     app.register_blueprint(chat_controller, url_prefix=prefix)
-    ...
\ No newline at end of file
+    ...
+
+
+def prewarm():
+    """
+    Importa y construye por adelantado lo que la app carga de forma diferida
+    (LangGraph, proveedores, reportlab, tiktoken). Se llama desde el hook de
+    gunicorn con preload_app para que los workers hereden los módulos al hacer fork.
+    """
+    from app.chat.controller.chat_controller import chat_services
+    chat_services.prewarm()
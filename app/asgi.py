@@ -0,0 +1,101 @@
+"""
+Modo de servicio asíncrono (ASGI).
+
+Expone las mismas rutas de chat que la app Flask, pero sobre un event loop:
+las llamadas al proveedor usan `ainvoke`/`astream`, así que un solo worker
+puede mantener cientos de streams SSE abiertos mientras espera al LLM.
+
+    uvicorn app.asgi:app --host 0.0.0.0 --port 8000
+"""
+import anyio
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import prefix
+from app.chat.services.history import HISTORY_HEADERS
+from app.chat.services.streaming import SSE_HEADERS
+from app.core.lazy import LazyInstance
+from app.core.metrics import CONTENT_TYPE, registry
+
+
+def _create_chat_services():
+    from app.chat.services.chat_services import ChatServices
+    return ChatServices(None)
+
+
+chat_services = LazyInstance(_create_chat_services)
+
+
+class SSEResponse(StreamingResponse):
+    """
+    StreamingResponse que cierra el generador de eventos al terminar.
+
+    Si el cliente se desconecta, Starlette abandona el generador en el `yield`
+    pendiente; cerrarlo aquí corta el stream del proveedor y guarda la respuesta
+    parcial en ese momento, sin esperar a que lo recoja el recolector de basura.
+    """
+
+    async def stream_response(self, send):
+        try:
+            await super().stream_response(send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.body_iterator.aclose()
+
+
+async def chat(request):
+    data = await request.json()
+    state, config, stream, stream_mode = chat_services.prepare_chat(data, request.query_params)
+
+    if stream:
+        return SSEResponse(
+            chat_services.astream_chat(state, config, stream_mode),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
+        )
+    return JSONResponse(await chat_services.achat(state, config))
+
+
+async def get_history(request):
+    try:
+        payload, etag = await chat_services.aget_history(
+            request.path_params["session_id"], request.query_params, request.headers.get("if-none-match")
+        )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    headers = {**HISTORY_HEADERS, "ETag": etag}
+    if payload is None:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+
+async def get_prompt_types(request):
+    return JSONResponse(chat_services.prompt_types_payload())
+
+
+async def health(request):
+    return PlainTextResponse("OK")
+
+
+async def metrics(request):
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
+def create_asgi_app():
+    routes = [
+        Mount(prefix, routes=[
+            Route("/chat", chat, methods=["POST"]),
+            Route("/history/{session_id}", get_history, methods=["GET"]),
+            Route("/prompt-types", get_prompt_types, methods=["GET"]),
+        ]),
+        Route("/health", health, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+    ]
+    return Starlette(routes=routes)
+
+
+app = create_asgi_app()
@@ -1,9 +1,18 @@
 
 from flask import Blueprint, request
-from ..services.chat_services import ChatServices
+from app.core.lazy import LazyInstance
 
 chat_controller = Blueprint("chat", __name__)
-chat_services = ChatServices(request)
+
+
+def _create_chat_services():
+	# LangGraph y los proveedores se importan al atender la primera petición
+	# (o antes, con app.prewarm())
+	from ..services.chat_services import ChatServices
+	return ChatServices(request)
+
+
+chat_services = LazyInstance(_create_chat_services)
 
 @chat_controller.route("/chat", methods=["POST"])
 def chat():
@@ -33,13 +42,14 @@ def chat():
 					prompt_type:
 						type: string
 						example: "general"
-						description: "Tipo de consulta: general, case_analysis, documentation, resources"
+						description: "Tipo de consulta: auto (por defecto, se elige con un clasificador local según el mensaje), general, case_analysis, documentation o resources"
 		-	in: query
 			name: provider
 			required: true
 			type: string
-			enum: ["openai", "gemini"]
+			enum: ["openai", "gemini", "auto", "fake"]
 			example: "openai"
+			description: "auto: primario con cobertura en el secundario si no llega el primer token a tiempo o si falla; fake: modelo local simulado (FAKE_PROVIDER_ENABLED)"
 		-	in: query
 			name: stream
 			required: false
@@ -47,6 +57,13 @@ def chat():
 			enum: ["true", "false"]
 			example: "false"
 			description: "Habilitar streaming con Server-Sent Events"
+		-	in: query
+			name: stream_mode
+			required: false
+			type: string
+			enum: ["full", "delta"]
+			example: "full"
+			description: "full: cada evento lleva el texto acumulado; delta: sólo el texto nuevo, agrupado, con el texto completo y el uso de tokens en el evento final"
 	responses:
 		200:
 			description: Respuesta exitosa (JSON normal o SSE stream)
@@ -61,6 +78,57 @@ def chat():
 	"""
 	return chat_services.chat(request.json, request.args)
 
+@chat_controller.route("/chat/batch", methods=["POST"])
+def chat_batch():
+	"""
+	Endpoint para enviar un lote de mensajes al chatbot
+	---
+	tags:
+		- Chatbot
+	summary: Enviar varios mensajes en paralelo (resultados en NDJSON)
+	produces:
+		- application/x-ndjson
+	parameters:
+		-	in: body
+			name: body
+			required: true
+			schema:
+				type: object
+				properties:
+					items:
+						type: array
+						items:
+							type: object
+							properties:
+								message:
+									type: string
+									example: "Hola, ¿cómo estás?"
+								session_id:
+									type: string
+									example: "user_123"
+								prompt_type:
+									type: string
+									example: "general"
+		-	in: query
+			name: provider
+			required: true
+			type: string
+			enum: ["openai", "gemini", "auto", "fake"]
+			example: "openai"
+	responses:
+		200:
+			description: Una línea JSON por mensaje, en orden de finalización, con su latencia, y una línea final de resumen con el tiempo total
+			schema:
+				type: string
+				example: '{"type": "result", "index": 0, "session_id": "user_123", "response": "Hola", "queued_ms": 0.2, "latency_ms": 812.4}'
+		400:
+			description: Solicitud inválida
+			schema:
+				type: string
+				example: "Bad Request"
+	"""
+	return chat_services.chat_batch(request.json, request.args)
+
 @chat_controller.route("/test-connection", methods=["GET"])
 def test():
 	"""
@@ -99,7 +167,11 @@ def get_history(session_id):
 	---
 	tags:
 		- Chatbot
-	summary: Obtener historial de una sesión
+	summary: Obtener historial de una sesión (paginado y con ETag)
+	description: >
+		Sin parámetros devuelve el historial completo. Con `limit` se pagina desde `cursor`
+		(usar `next_cursor` para la siguiente página) o desde el mensaje posterior a `since`.
+		Si `If-None-Match` coincide con el ETag actual se responde 304 sin cuerpo.
 	produces:
 		- application/json
 	parameters:
@@ -108,9 +180,32 @@ def get_history(session_id):
 			required: true
 			type: string
 			example: "user_123"
+		-	in: query
+			name: since
+			required: false
+			type: string
+			description: Id del último mensaje recibido; devuelve sólo los posteriores
+		-	in: query
+			name: cursor
+			required: false
+			type: integer
+			description: Posición de inicio (next_cursor de la página anterior)
+		-	in: query
+			name: limit
+			required: false
+			type: integer
+			description: Tamaño de página (máximo HISTORY_MAX_PAGE_SIZE)
+		-	in: header
+			name: If-None-Match
+			required: false
+			type: string
+			description: ETag de una respuesta anterior
 	responses:
 		200:
 			description: Historial obtenido
+			headers:
+				ETag:
+					type: string
 			schema:
 				type: object
 				properties:
@@ -118,10 +213,28 @@ def get_history(session_id):
 						type: array
 						items:
 							type: object
+							properties:
+								id:
+									type: string
+								type:
+									type: string
+								content:
+									type: string
+								truncated:
+									type: boolean
+									description: Sólo en respuestas cortadas porque el cliente se desconectó durante el stream
+					total:
+						type: integer
+					next_cursor:
+						type: integer
+					reset:
+						type: boolean
+		304:
+			description: El historial no ha cambiado
 		400:
-			description: Error
+			description: Parámetros de paginación no válidos
 	"""
-	return chat_services.get_history(session_id)
+	return chat_services.get_history(session_id, request.args, request.headers.get("If-None-Match"))
 
 @chat_controller.route("/prompt-types", methods=["GET"])
 def get_prompt_types():
@@ -179,3 +292,199 @@ def export_history_pdf(session_id):
 						type: string
 	"""
 	return chat_services.export_history_pdf(session_id)
+
+@chat_controller.route("/export-pdf/<session_id>", methods=["POST"])
+def start_pdf_export(session_id):
+	"""
+	Iniciar exportación del historial a PDF en segundo plano
+	---
+	tags:
+		- Chatbot
+	summary: Crear un trabajo de exportación a PDF
+	produces:
+		- application/json
+	parameters:
+		-	in: path
+			name: session_id
+			required: true
+			type: string
+			example: "user_123"
+	responses:
+		202:
+			description: Trabajo creado (status "done" y "cached" si el historial no cambió desde la última exportación)
+			schema:
+				type: object
+				properties:
+					job_id:
+						type: string
+					status:
+						type: string
+						enum: ["pending", "running", "done", "failed"]
+					status_url:
+						type: string
+					download_url:
+						type: string
+	"""
+	return chat_services.start_pdf_export(session_id)
+
+@chat_controller.route("/export-pdf/jobs/<job_id>", methods=["GET"])
+def get_pdf_export(job_id):
+	"""
+	Estado de un trabajo de exportación a PDF
+	---
+	tags:
+		- Chatbot
+	summary: Consultar un trabajo de exportación
+	produces:
+		- application/json
+	parameters:
+		-	in: path
+			name: job_id
+			required: true
+			type: string
+	responses:
+		200:
+			description: Estado del trabajo
+		404:
+			description: Trabajo no encontrado o caducado
+	"""
+	return chat_services.get_pdf_export(job_id)
+
+@chat_controller.route("/export-pdf/jobs/<job_id>/download", methods=["GET"])
+def download_pdf_export(job_id):
+	"""
+	Descargar el PDF de un trabajo de exportación
+	---
+	tags:
+		- Chatbot
+	summary: Descargar el PDF generado
+	produces:
+		- application/pdf
+	parameters:
+		-	in: path
+			name: job_id
+			required: true
+			type: string
+	responses:
+		200:
+			description: PDF generado
+		404:
+			description: Trabajo no encontrado o caducado
+		409:
+			description: El trabajo aún no ha terminado o falló
+		410:
+			description: El PDF ya no está en caché
+	"""
+	return chat_services.download_pdf_export(job_id)
+
+@chat_controller.route("/sessions/export", methods=["GET"])
+def export_sessions():
+	"""
+	Exportar todas las sesiones (copia de seguridad o migración)
+	---
+	tags:
+		- Sesiones
+	summary: Descargar todas las sesiones como NDJSON en streaming
+	produces:
+		- application/x-ndjson
+		- application/gzip
+	parameters:
+		-	in: header
+			name: Authorization
+			required: true
+			type: string
+			example: "Bearer <SESSIONS_ADMIN_TOKEN>"
+		-	in: query
+			name: compress
+			required: false
+			type: string
+			enum: ["gzip"]
+	responses:
+		200:
+			description: Una línea JSON por sesión y una línea final de resumen
+			schema:
+				type: string
+				example: '{"type": "session", "session_id": "user_123", "messages": [{"id": "1", "type": "human", "content": "Hola"}], "provider": "openai", "prompt_type": "general"}'
+		401:
+			description: Token de administración no válido
+		403:
+			description: Exportación deshabilitada (SESSIONS_ADMIN_TOKEN sin configurar)
+	"""
+	return chat_services.export_sessions(request.args, request.headers.get("Authorization"))
+
+@chat_controller.route("/sessions/import", methods=["POST"])
+def import_sessions():
+	"""
+	Importar sesiones desde una exportación
+	---
+	tags:
+		- Sesiones
+	summary: Cargar sesiones desde un cuerpo NDJSON (admite gzip)
+	consumes:
+		- application/x-ndjson
+		- application/gzip
+	produces:
+		- application/json
+	parameters:
+		-	in: header
+			name: Authorization
+			required: true
+			type: string
+			example: "Bearer <SESSIONS_ADMIN_TOKEN>"
+		-	in: query
+			name: overwrite
+			required: false
+			type: boolean
+			default: false
+			description: Reemplazar las sesiones que ya existen (por defecto se omiten)
+		-	in: body
+			name: body
+			required: true
+			schema:
+				type: string
+				example: '{"type": "session", "session_id": "user_123", "messages": [{"type": "human", "content": "Hola"}]}'
+	responses:
+		200:
+			description: Resumen de la importación
+			schema:
+				type: object
+				properties:
+					imported:
+						type: integer
+					skipped:
+						type: integer
+					failed:
+						type: integer
+					errors:
+						type: array
+						items:
+							type: object
+		400:
+			description: Cuerpo ilegible (gzip corrupto o línea demasiado larga)
+		401:
+			description: Token de administración no válido
+		403:
+			description: Importación deshabilitada (SESSIONS_ADMIN_TOKEN sin configurar)
+	"""
+	return chat_services.import_sessions(request.stream, request.args, request.headers.get("Authorization"))
+
+@chat_controller.route("/stats", methods=["GET"])
+def get_stats():
+	"""
+	Estadísticas internas del worker
+	---
+	tags:
+		- Chatbot
+	summary: Obtener estadísticas de reutilización de recursos del proceso
+	produces:
+		- application/json
+	responses:
+		200:
+			description: Estadísticas del worker actual
+			schema:
+				type: object
+				properties:
+					llm_clients:
+						type: object
+	"""
+	return chat_services.get_stats()
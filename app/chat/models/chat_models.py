@@ -1,10 +1,14 @@
-from typing import TypedDict, List, Sequence
-from langchain_core.messages import BaseMessage
-from langgraph.graph.message import add_messages
+from typing import TypedDict, Dict
 from typing_extensions import Annotated
+from app.core.token_counter import merge_token_counts
+from app.chat.models.message_log import MessageLog, add_compact_messages
 
 class ChatState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], add_messages]
+    messages: Annotated[MessageLog, add_compact_messages]
     provider: str
     session_id: str
     prompt_type: str
+    token_counts: Annotated[Dict[str, int], merge_token_counts]
+    summary: str
+    summary_upto: int
+    report_summary: Dict[str, object]
@@ -0,0 +1,184 @@
+import threading
+import uuid
+from dataclasses import dataclass, field
+from itertools import islice
+
+from langchain_core.messages import (
+    AIMessage, BaseMessage, BaseMessageChunk, ChatMessage, HumanMessage, SystemMessage, message_chunk_to_message
+)
+
+_LANGCHAIN_CLASSES = {"human": HumanMessage, "ai": AIMessage, "system": SystemMessage}
+
+# Metadatos de la respuesta que se guardan con el mensaje: enrutado de provider=auto
+# y si el stream se cortó porque el cliente se desconectó
+KEPT_METADATA = ("provider", "hedged", "failover", "truncated")
+
+
+class StoredMessage:
+    """
+    Mensaje del historial compacto.
+
+    Tiene los atributos de los mensajes de LangChain que usa la app (id, type,
+    content, response_metadata), así que el código que lee el historial funciona
+    igual con sesiones antiguas guardadas como mensajes de LangChain.
+    """
+
+    __slots__ = ("id", "type", "content", "response_metadata")
+
+    def __init__(self, id: str, type: str, content, response_metadata: dict = None):
+        self.id = id
+        self.type = type
+        self.content = content
+        self.response_metadata = response_metadata or {}
+
+    def __repr__(self):
+        return f"StoredMessage(id={self.id!r}, type={self.type!r}, content={self.content!r})"
+
+    def to_langchain(self) -> BaseMessage:
+        cls = _LANGCHAIN_CLASSES.get(self.type)
+        metadata = dict(self.response_metadata)
+        if cls is None:
+            return ChatMessage(role=self.type, content=self.content, id=self.id, response_metadata=metadata)
+        return cls(content=self.content, id=self.id, response_metadata=metadata)
+
+
+def class_name(message) -> str:
+    """Nombre de la clase de LangChain del mensaje (el "type" que devuelve /history)"""
+    cls = _LANGCHAIN_CLASSES.get(message.type)
+    return cls.__name__ if cls is not None else message.__class__.__name__
+
+
+def to_langchain(messages) -> list:
+    """Convierte el historial a mensajes de LangChain (sólo al llamar al modelo)"""
+    return [msg.to_langchain() if isinstance(msg, StoredMessage) else msg for msg in messages]
+
+
+def _compact(message) -> tuple:
+    if isinstance(message, StoredMessage):
+        return message.id, message.type, message.content, message.response_metadata or None
+    if isinstance(message, BaseMessageChunk):
+        message = message_chunk_to_message(message)
+    metadata = {key: message.response_metadata[key] for key in KEPT_METADATA if key in message.response_metadata}
+    return message.id or str(uuid.uuid4()), message.type, message.content, metadata or None
+
+
+@dataclass(frozen=True, eq=False)
+class MessageLog:
+    """
+    Historial de la sesión en columnas: ids, tipos, contenidos y metadatos.
+
+    Sustituye a la lista de mensajes de LangChain en el estado del grafo. Se
+    serializa en el checkpoint como un único objeto con cuatro listas (en lugar de
+    un objeto pydantic con todos sus campos por mensaje) y no se convierte de
+    vuelta a LangChain al leer el estado. Al acceder a un mensaje se obtiene un
+    `StoredMessage`; un slice devuelve otro MessageLog sin copiar los mensajes.
+
+    Las versiones sucesivas del historial comparten las columnas: cada una ve sólo
+    sus `length` primeros elementos, y añadir a la última versión no copia nada.
+    """
+
+    ids: list = field(default_factory=list)
+    types: list = field(default_factory=list)
+    contents: list = field(default_factory=list)
+    metadata: list = field(default_factory=list)
+    length: int = None
+
+    def __post_init__(self):
+        if self.length is None:
+            object.__setattr__(self, "length", len(self.ids))
+        # Posición de cada id, compartida con las versiones que añaden sobre esta
+        object.__setattr__(self, "_index", None)
+
+    @classmethod
+    def from_messages(cls, messages) -> "MessageLog":
+        """
+        Crea el historial a partir de mensajes de LangChain o `StoredMessage`.
+        Los mensajes sin id reciben uno nuevo, como en `add_messages`.
+        """
+        if isinstance(messages, MessageLog):
+            return messages
+        if isinstance(messages, (BaseMessage, StoredMessage)):
+            messages = [messages]
+        columns = tuple(zip(*(_compact(msg) for msg in messages or ())))
+        if not columns:
+            return cls()
+        return cls(*(list(column) for column in columns))
+
+    def _columns(self) -> tuple:
+        return self.ids, self.types, self.contents, self.metadata
+
+    def _id_index(self) -> dict:
+        if self._index is None:
+            object.__setattr__(self, "_index", {message_id: i for i, message_id in enumerate(self.ids[:self.length])})
+        return self._index
+
+    def __len__(self):
+        return self.length
+
+    def __eq__(self, other):
+        if not isinstance(other, MessageLog):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            mine[:self.length] == theirs[:other.length] for mine, theirs in zip(self._columns(), other._columns())
+        )
+
+    def __iter__(self):
+        for values in islice(zip(*self._columns()), self.length):
+            yield StoredMessage(*values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            if step < 0:
+                positions = range(start, stop, step)
+                return MessageLog(*([column[i] for i in positions] for column in self._columns()))
+            return MessageLog(*(column[start:stop:step] for column in self._columns()))
+        index = range(self.length)[index]
+        return StoredMessage(self.ids[index], self.types[index], self.contents[index], self.metadata[index])
+
+
+_append_lock = threading.Lock()
+
+
+def add_compact_messages(left, right) -> MessageLog:
+    """
+    Reducer del historial para LangGraph. Como `add_messages`: añade los mensajes
+    nuevos al final y uno con un id ya existente reemplaza al anterior.
+
+    Si `left` es la última versión de sus columnas, los mensajes nuevos se añaden
+    sobre ellas sin copiarlas (las versiones anteriores no ven los añadidos); si otra
+    versión ya añadió sobre las mismas columnas, o hay reemplazos, se copian.
+    """
+    log = MessageLog.from_messages(left)
+    new = MessageLog.from_messages(right)
+    if not new:
+        return log
+
+    new_ids = new.ids[:new.length]
+    index = log._id_index()
+    if len(set(new_ids)) == len(new_ids) and all(index.get(i, log.length) >= log.length for i in new_ids):
+        with _append_lock:
+            if len(log.ids) == log.length:
+                columns = log._columns()
+            else:
+                columns = tuple(column[:log.length] for column in log._columns())
+                index = {message_id: i for i, message_id in enumerate(columns[0])}
+            for column, values in zip(columns, new._columns()):
+                column.extend(values[:new.length])
+            index.update((message_id, log.length + offset) for offset, message_id in enumerate(new_ids))
+        result = MessageLog(*columns, length=log.length + len(new_ids))
+        object.__setattr__(result, "_index", index)
+        return result
+
+    ids, types, contents, metadata = (column[:log.length] for column in log._columns())
+    positions = {message_id: i for message_id, i in index.items() if i < log.length}
+    for values in islice(zip(*new._columns()), new.length):
+        position = positions.get(values[0])
+        if position is None:
+            positions[values[0]] = len(ids)
+            for column, value in zip((ids, types, contents, metadata), values):
+                column.append(value)
+        else:
+            for column, value in zip((ids, types, contents, metadata), values):
+                column[position] = value
+    return MessageLog(ids, types, contents, metadata)
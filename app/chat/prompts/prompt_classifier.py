@@ -0,0 +1,315 @@
+"""
+Clasificador local de prompt_type para prompt_type=auto.
+
+Vectoriza el mensaje con TF-IDF sobre raíces de palabras (prefijos de 6 letras, sin
+tildes ni palabras vacías) y bigramas, y elige el tipo con una regresión logística
+multinomial. La predicción es Python puro: unas decenas de búsquedas en un dict,
+sin llamadas al LLM.
+
+Entrenamiento con tráfico registrado (PROMPT_CLASSIFIER_LOG_PATH) o con una
+exportación de sesiones (/sessions/export):
+    python -m app.chat.prompts.prompt_classifier trafico.jsonl --out modelo.json
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+from ...config.config import config
+from ...core.metrics import register_label_values
+from ...core.private_dir import open_private, private_directory, private_file
+from .prompt_examples import SEED_EXAMPLES
+
+AUTO_PROMPT_TYPE = "auto"
+register_label_values("prompt_type", AUTO_PROMPT_TYPE)
+
+_WORD = re.compile(r"[a-z0-9]+")
+STEM_LENGTH = 6
+STOPWORDS = frozenset("""
+a al algo ante con como cual de del desde donde el ella en entre era es esa ese eso esta este esto
+ha hay la las le les lo los me mi mis muy nos o para pero por que se si sin sobre su sus te tengo
+tiene toda todo tu un una uno unos y ya yo
+""".split())
+
+
+def _normalize(text: str) -> str:
+    """Minúsculas y sin tildes (la ñ queda como n)"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def features(text: str) -> Counter:
+    """Términos del mensaje: raíces de las palabras y bigramas de raíces"""
+    words = _WORD.findall(_normalize(text))
+    stems = [word[:STEM_LENGTH] for word in words if word not in STOPWORDS and len(word) > 1]
+    terms = Counter(stems)
+    terms.update(f"{first} {second}" for first, second in zip(stems, stems[1:]))
+    return terms
+
+
+def _softmax(scores: list) -> list:
+    top = max(scores)
+    exps = [math.exp(score - top) for score in scores]
+    total = sum(exps)
+    return [value / total for value in exps]
+
+
+class PromptClassifier:
+    """
+    Modelo TF-IDF + regresión logística.
+
+    `weights` guarda por término su idf seguido de un peso por etiqueta, de modo que
+    vectorizar y puntuar es un único recorrido por los términos del mensaje.
+    """
+
+    def __init__(self, labels: list, weights: dict, bias: list):
+        self.labels = list(labels)
+        self.weights = weights
+        self.bias = list(bias)
+
+    # --- Predicción -------------------------------------------------------------------
+
+    def _vector(self, text: str) -> list:
+        vector = []
+        for term, count in features(text).items():
+            row = self.weights.get(term)
+            if row is not None:
+                vector.append((row, (1 + math.log(count)) * row[0]))
+        norm = math.sqrt(sum(value * value for _, value in vector)) or 1.0
+        return [(row, value / norm) for row, value in vector]
+
+    def predict_proba(self, text: str) -> dict:
+        """Probabilidad de cada prompt_type"""
+        scores = list(self.bias)
+        for row, value in self._vector(text):
+            for index in range(len(scores)):
+                scores[index] += row[index + 1] * value
+        return dict(zip(self.labels, _softmax(scores)))
+
+    def predict(self, text: str) -> tuple:
+        """
+        :return: (prompt_type más probable, probabilidad)
+        """
+        probabilities = self.predict_proba(text)
+        label = max(probabilities, key=probabilities.get)
+        return label, probabilities[label]
+
+    # --- Entrenamiento ----------------------------------------------------------------
+
+    @classmethod
+    def train(cls, texts: list, labels: list, epochs: int = 40, learning_rate: float = 0.5,
+              l2: float = 1e-4, seed: int = 0) -> "PromptClassifier":
+        """
+        Entrena el modelo con descenso de gradiente estocástico.
+
+        :param texts: Mensajes
+        :param labels: prompt_type de cada mensaje
+        """
+        documents = [features(text) for text in texts]
+        document_frequency = Counter(term for document in documents for term in document)
+        total = len(documents)
+        names = sorted(set(labels))
+        targets = [names.index(label) for label in labels]
+
+        weights = {
+            term: [math.log((1 + total) / (1 + frequency)) + 1] + [0.0] * len(names)
+            for term, frequency in document_frequency.items()
+        }
+        model = cls(names, weights, [0.0] * len(names))
+        vectors = [model._vector(text) for text in texts]
+
+        order = list(range(total))
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            rate = learning_rate / (1 + 0.1 * epoch)
+            for sample in order:
+                vector = vectors[sample]
+                scores = list(model.bias)
+                for row, value in vector:
+                    for index in range(len(scores)):
+                        scores[index] += row[index + 1] * value
+                for index, probability in enumerate(_softmax(scores)):
+                    gradient = probability - (index == targets[sample])
+                    model.bias[index] -= rate * gradient
+                    for row, value in vector:
+                        row[index + 1] -= rate * (gradient * value + l2 * row[index + 1])
+        return model
+
+    def evaluate(self, texts: list, labels: list) -> dict:
+        """Acierto global y por etiqueta, y latencia de predict en microsegundos"""
+        hits, per_label, latencies = 0, {}, []
+        for text, label in zip(texts, labels):
+            started = time.perf_counter()
+            predicted, _ = self.predict(text)
+            latencies.append((time.perf_counter() - started) * 1e6)
+            stats = per_label.setdefault(label, [0, 0])
+            stats[0] += predicted == label
+            stats[1] += 1
+            hits += predicted == label
+        latencies.sort()
+        return {
+            "samples": len(texts),
+            "accuracy": hits / len(texts) if texts else 0.0,
+            "per_label": {label: correct / count for label, (correct, count) in sorted(per_label.items())},
+            "latency_us": {
+                "p50": round(latencies[len(latencies) // 2], 1) if latencies else 0.0,
+                "p99": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 1) if latencies else 0.0,
+            },
+        }
+
+    # --- Persistencia -----------------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        return {"version": 1, "labels": self.labels, "bias": self.bias, "weights": self.weights}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PromptClassifier":
+        return cls(data["labels"], data["weights"], data["bias"])
+
+    def save(self, path: str):
+        with open_private(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "PromptClassifier":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+# --- Modelo del proceso ------------------------------------------------------------
+
+_classifier = None
+_classifier_lock = threading.Lock()
+_log_lock = threading.Lock()
+_log_ready = set()
+
+
+def get_prompt_classifier() -> PromptClassifier:
+    """
+    Clasificador del proceso: el modelo de PROMPT_CLASSIFIER_PATH o, si no se
+    configura o no se puede leer, uno entrenado con los ejemplos incluidos.
+    """
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                classifier = None
+                if config.prompt_classifier_path:
+                    try:
+                        classifier = PromptClassifier.load(config.prompt_classifier_path)
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"Warning: Could not load prompt classifier, using seed examples: {e}")
+                if classifier is None:
+                    texts, labels = zip(*SEED_EXAMPLES)
+                    classifier = PromptClassifier.train(list(texts), list(labels))
+                _classifier = classifier
+    return _classifier
+
+
+def classify_prompt_type(message: str, default: str = "general") -> tuple:
+    """
+    prompt_type para un mensaje con prompt_type=auto (el valor por defecto).
+
+    :return: (prompt_type, probabilidad); `default` si la predicción no supera
+        PROMPT_CLASSIFIER_MIN_CONFIDENCE o el clasificador está deshabilitado
+    """
+    if not config.prompt_classifier_enabled:
+        return default, 0.0
+    label, probability = get_prompt_classifier().predict(message)
+    if probability < config.prompt_classifier_min_confidence:
+        return default, probability
+    return label, probability
+
+
+def log_example(message: str, prompt_type: str):
+    """
+    Guarda un mensaje con el prompt_type elegido por el usuario (PROMPT_CLASSIFIER_LOG_PATH).
+    Contiene texto clínico: el fichero es 0600 y su directorio, privado (0700).
+    """
+    path = config.prompt_classifier_log_path
+    if not path:
+        return
+    line = json.dumps({"message": message, "prompt_type": prompt_type}, ensure_ascii=False) + "\n"
+    try:
+        with _log_lock:
+            if path not in _log_ready:
+                private_directory(os.path.dirname(os.path.abspath(path)))
+                private_file(path)
+                _log_ready.add(path)
+            with open_private(path, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        print(f"Warning: Could not log prompt example: {e}")
+
+
+# --- Entrenamiento desde la línea de comandos ----------------------------------------
+
+def read_examples(paths: list) -> list:
+    """
+    Lee ejemplos de ficheros JSONL: líneas {"message", "prompt_type"} del registro de
+    tráfico o sesiones de /sessions/export (mensajes del usuario con el prompt_type
+    de la sesión), sin comprimir o con gzip.
+    """
+    examples = []
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("type") == "session":
+                    prompt_type = record.get("prompt_type")
+                    if prompt_type and prompt_type != AUTO_PROMPT_TYPE:
+                        examples.extend((message["content"], prompt_type) for message in record.get("messages", [])
+                                        if message.get("type") == "human" and isinstance(message.get("content"), str))
+                elif record.get("message") and record.get("prompt_type"):
+                    examples.append((record["message"], record["prompt_type"]))
+    return examples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="JSONL de tráfico o exportaciones (por defecto, ejemplos incluidos)")
+    parser.add_argument("--out", help="fichero JSON donde guardar el modelo (PROMPT_CLASSIFIER_PATH)")
+    parser.add_argument("--test-size", type=float, default=0.2, help="fracción reservada para evaluar")
+    parser.add_argument("--no-seed", action="store_true", help="no añadir los ejemplos incluidos al entrenamiento")
+    parser.add_argument("--epochs", type=int, default=40)
+    args = parser.parse_args(argv)
+
+    examples = read_examples(args.paths)
+    if not args.no_seed or not examples:
+        examples += list(SEED_EXAMPLES)
+    random.Random(0).shuffle(examples)
+    split = int(len(examples) * (1 - args.test_size))
+    train, test = examples[:split], examples[split:]
+
+    started = time.perf_counter()
+    model = PromptClassifier.train([text for text, _ in train], [label for _, label in train], epochs=args.epochs)
+    print(f"Entrenamiento: {len(train)} ejemplos en {time.perf_counter() - started:.2f} s, "
+          f"{len(model.weights)} términos")
+    if test:
+        report = model.evaluate([text for text, _ in test], [label for _, label in test])
+        print(f"Evaluación: {report['samples']} ejemplos, acierto {report['accuracy']:.1%}, "
+              f"latencia p50 {report['latency_us']['p50']} µs, p99 {report['latency_us']['p99']} µs")
+        for label, accuracy in report["per_label"].items():
+            print(f"  {label:<15} {accuracy:.1%}")
+
+    if args.out:
+        model = PromptClassifier.train([text for text, _ in examples], [label for _, label in examples],
+                                       epochs=args.epochs)
+        model.save(args.out)
+        print(f"Modelo guardado en {args.out} ({len(examples)} ejemplos)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Ejemplos etiquetados con los que se entrena el clasificador de prompt_type cuando
+no hay un modelo entrenado con tráfico real (PROMPT_CLASSIFIER_PATH).
+"""
+
+SEED_EXAMPLES = (
+    # general
+    ("Hola, ¿cómo estás?", "general"),
+    ("Buenos días, necesito ayuda con una duda", "general"),
+    ("¿Qué diferencia hay entre un psicólogo y un psiquiatra?", "general"),
+    ("¿Qué es la terapia cognitivo conductual?", "general"),
+    ("¿Cuál es la evidencia actual sobre la terapia online?", "general"),
+    ("¿Cómo manejo el secreto profesional si un paciente menor me pide que no informe a sus padres?", "general"),
+    ("¿Cada cuánto debería tener supervisión clínica?", "general"),
+    ("¿Qué dice el código deontológico sobre regalos de pacientes?", "general"),
+    ("Tengo dudas sobre cuándo derivar a psiquiatría", "general"),
+    ("¿Qué es el burnout en profesionales de la salud mental?", "general"),
+    ("¿Cómo puedo cuidar mi propia salud mental como terapeuta?", "general"),
+    ("Explícame brevemente qué es la alianza terapéutica", "general"),
+    ("¿Cuánto suele durar un proceso de psicoterapia?", "general"),
+    ("Gracias por la ayuda", "general"),
+    ("¿Qué opinas de combinar enfoques terapéuticos?", "general"),
+    ("¿Es ético atender a un familiar de un paciente actual?", "general"),
+    ("¿Qué formación necesito para trabajar con EMDR?", "general"),
+    ("¿Cómo organizo mi agenda de consulta para no saturarme?", "general"),
+    ("¿Qué hago si un paciente llega tarde a todas las sesiones?", "general"),
+    ("Resume las diferencias entre DSM-5 y CIE-11", "general"),
+    ("¿Puedes ayudarme con una pregunta sobre mi práctica profesional?", "general"),
+    ("¿Qué es la psicología basada en la evidencia?", "general"),
+    ("¿Cómo explico a un paciente en qué consiste la terapia?", "general"),
+    ("Tengo una consulta rápida", "general"),
+
+    # case_analysis
+    ("Paciente de 34 años con insomnio, rumiación y pérdida de apetito desde hace tres meses", "case_analysis"),
+    ("Mujer de 28 años con ataques de pánico en el metro y evitación de lugares concurridos", "case_analysis"),
+    ("Tengo un paciente adolescente que se autolesiona, ¿qué diagnóstico diferencial considerarías?", "case_analysis"),
+    ("Varón de 45 años, consumo de alcohol diario, irritabilidad y conflictos de pareja", "case_analysis"),
+    ("Niño de 8 años con rabietas intensas, dificultades de atención y bajo rendimiento escolar", "case_analysis"),
+    ("La paciente presenta flashbacks y pesadillas tras un accidente de tráfico", "case_analysis"),
+    ("¿Qué hipótesis diagnósticas ves en un caso con ánimo bajo, anhedonia y culpa excesiva?", "case_analysis"),
+    ("Analiza este caso: estudiante universitaria con perfeccionismo, ansiedad ante exámenes y atracones", "case_analysis"),
+    ("Mi paciente refiere ideación suicida pasiva, ¿cómo evalúo el riesgo?", "case_analysis"),
+    ("Paciente con síntomas obsesivos de contaminación y lavado de manos compulsivo", "case_analysis"),
+    ("Hombre de 60 años jubilado recientemente, aislamiento social y tristeza persistente", "case_analysis"),
+    ("¿Qué factores de riesgo y protectores identificas en este paciente?", "case_analysis"),
+    ("Paciente con cambios de humor bruscos, impulsividad y relaciones inestables", "case_analysis"),
+    ("Mujer de 52 años con duelo prolongado tras la muerte de su marido hace dos años", "case_analysis"),
+    ("Adolescente con restricción alimentaria, pérdida de peso y distorsión de la imagen corporal", "case_analysis"),
+    ("El paciente escucha voces desde hace unas semanas y está muy suspicaz", "case_analysis"),
+    ("¿Qué evaluaciones sugerirías para un paciente con sospecha de TDAH adulto?", "case_analysis"),
+    ("Caso clínico: preocupación excesiva por la salud y consultas médicas constantes", "case_analysis"),
+    ("Paciente de 19 años con consumo de cannabis, apatía y abandono de estudios", "case_analysis"),
+    ("Después de la separación de sus padres el niño presenta enuresis y miedo a dormir solo", "case_analysis"),
+    ("¿Cómo conceptualizarías este caso desde la TCC?", "case_analysis"),
+    ("La paciente evita conducir desde el accidente, tiene hipervigilancia y sobresaltos", "case_analysis"),
+    ("Síntomas: fatiga, falta de concentración, irritabilidad y tensión muscular constante", "case_analysis"),
+    ("Paciente con dependencia emocional que vuelve siempre con su pareja pese a los conflictos", "case_analysis"),
+
+    # documentation
+    ("Ayúdame a redactar una nota de sesión", "documentation"),
+    ("Necesito escribir un informe de progreso del paciente para su médico de cabecera", "documentation"),
+    ("Redacta un informe de derivación a psiquiatría", "documentation"),
+    ("¿Cómo estructuro un plan de tratamiento por escrito?", "documentation"),
+    ("Escribe la nota SOAP de la sesión de hoy", "documentation"),
+    ("Necesito un informe para la aseguradora sobre el tratamiento", "documentation"),
+    ("Hazme una plantilla de historia clínica para la primera entrevista", "documentation"),
+    ("Redacta el motivo de consulta y las observaciones clínicas de forma objetiva", "documentation"),
+    ("¿Qué debe incluir el consentimiento informado para terapia online?", "documentation"),
+    ("Prepara un informe psicológico para el colegio del niño", "documentation"),
+    ("Ayúdame a documentar las intervenciones realizadas y la respuesta del paciente", "documentation"),
+    ("Escribe un resumen de alta terapéutica", "documentation"),
+    ("Necesito redactar un informe pericial, ¿qué estructura uso?", "documentation"),
+    ("Convierte estas notas en un informe profesional", "documentation"),
+    ("Formato de registro de sesión con objetivos y plan de seguimiento", "documentation"),
+    ("¿Cómo redacto el plan de seguimiento en la historia clínica?", "documentation"),
+    ("Hazme una carta para el médico explicando el diagnóstico y el tratamiento", "documentation"),
+    ("Redacta un informe de evolución trimestral", "documentation"),
+    ("Ayúdame a documentar una evaluación de riesgo suicida", "documentation"),
+    ("Plantilla de informe de evaluación neuropsicológica", "documentation"),
+    ("Redacta las recomendaciones finales del informe", "documentation"),
+    ("Necesito documentar la sesión de forma confidencial, solo con iniciales", "documentation"),
+    ("Escribe un informe para la baja laboral del paciente", "documentation"),
+    ("¿Qué terminología CIE-11 uso en el informe?", "documentation"),
+
+    # resources
+    ("¿Qué técnicas de relajación puedo enseñar a un paciente con ansiedad?", "resources"),
+    ("Dame un ejercicio de respiración diafragmática paso a paso", "resources"),
+    ("Necesito material psicoeducativo sobre el ciclo del pánico", "resources"),
+    ("¿Qué escalas de evaluación hay para la depresión?", "resources"),
+    ("Recomiéndame un cuestionario validado para ansiedad generalizada", "resources"),
+    ("Explícame la técnica de reestructuración cognitiva con un ejemplo", "resources"),
+    ("Dame una hoja de registro de pensamientos automáticos", "resources"),
+    ("Ejercicios de mindfulness para adolescentes", "resources"),
+    ("¿Cómo aplico la exposición gradual en fobia social?", "resources"),
+    ("Técnicas de grounding para un paciente disociativo", "resources"),
+    ("Actividades de arteterapia para niños en duelo", "resources"),
+    ("¿Qué libros recomiendas sobre terapia de aceptación y compromiso?", "resources"),
+    ("Pasos de implementación de la activación conductual", "resources"),
+    ("Dame una técnica de DBT para regular emociones intensas", "resources"),
+    ("Ejercicios de higiene del sueño para insomnio", "resources"),
+    ("Bibliografía sobre EMDR y trauma complejo", "resources"),
+    ("Material para trabajar habilidades sociales en grupo", "resources"),
+    ("¿Qué técnica uso para trabajar la autocrítica? Dame pasos concretos", "resources"),
+    ("Ejercicio de solución de problemas para pacientes con estrés", "resources"),
+    ("Una dinámica de psicoeducación sobre emociones para niños", "resources"),
+    ("Técnicas de terapia narrativa para externalizar el problema", "resources"),
+    ("¿Qué apps de meditación son recomendables para pacientes?", "resources"),
+    ("Indicaciones y contraindicaciones de la relajación muscular progresiva", "resources"),
+    ("Referencias de guías clínicas para el tratamiento del TOC", "resources"),
+)
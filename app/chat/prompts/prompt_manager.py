@@ -1,31 +1,116 @@
+import threading
+from langchain_core.messages import SystemMessage
+from ...core.metrics import register_label_values
 from .psychology_prompts import PsychologyPrompts
 
+
+SUMMARY_HEADER = "RESUMEN DE LA CONVERSACIÓN ANTERIOR:"
+
+
+class CompiledPrompt:
+    """
+    Prompt compilado una sola vez y compartido entre peticiones.
+    El mensaje de sistema se precalcula, así que formatear sólo añade el historial.
+    """
+
+    __slots__ = ("name", "description", "template", "system_message")
+
+    def __init__(self, name: str, description: str, template):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "description", description)
+        object.__setattr__(self, "template", template)
+        object.__setattr__(self, "system_message", self._precompute_system_message(template))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("CompiledPrompt es inmutable")
+
+    @staticmethod
+    def _precompute_system_message(template):
+        # Sólo se puede precalcular si el historial es la única variable y va al final
+        if template.input_variables != ["messages"] or len(template.messages) != 2:
+            return None
+        formatted = template.format_messages(messages=[])
+        if len(formatted) != 1 or not isinstance(formatted[0], SystemMessage):
+            return None
+        return formatted[0]
+
+    def format_messages(self, messages=None, summary: str = None, **kwargs):
+        """
+        Formatea el prompt con el historial de la conversación.
+
+        :param messages: Mensajes de la conversación
+        :param summary: Resumen de los turnos anteriores, que se añade al mensaje de sistema
+        :return: Lista de mensajes lista para el modelo
+        """
+        if self.system_message is None or kwargs:
+            formatted = self.template.format_messages(messages=messages or [], **kwargs)
+        else:
+            formatted = [self.system_message, *(messages or [])]
+        if summary:
+            formatted = self._with_summary(formatted, summary)
+        return formatted
+
+    @staticmethod
+    def _with_summary(formatted: list, summary: str) -> list:
+        note = f"{SUMMARY_HEADER}\n{summary}"
+        if formatted and isinstance(formatted[0], SystemMessage):
+            return [SystemMessage(content=f"{formatted[0].content}\n\n{note}"), *formatted[1:]]
+        return [SystemMessage(content=note), *formatted]
+
+
 class PromptManager:
     """Gestor de prompts para diferentes tipos de consulta"""
 
-    PROMPT_TYPES = {
-        "general": "Asistente clínico general",
-        "case_analysis": "Análisis de casos",
-        "documentation": "Documentación clínica",
-        "resources": "Recursos terapéuticos"
-    }
-    
-    @staticmethod
-    def get_prompt(prompt_type: str = "general"):
+    PROMPT_TYPES = {}
+    DEFAULT_TYPE = "general"
+
+    _factories = {}
+    _compiled = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def register_prompt(cls, prompt_type: str, description: str, factory):
+        """
+        Registra un nuevo tipo de prompt.
+
+        :param prompt_type: Identificador del tipo de consulta
+        :param description: Descripción que se muestra en /prompt-types
+        :param factory: Callable que construye el ChatPromptTemplate
+        """
+        with cls._lock:
+            cls._factories[prompt_type] = factory
+            cls._compiled.pop(prompt_type, None)
+            cls.PROMPT_TYPES[prompt_type] = description
+        register_label_values("prompt_type", prompt_type)
+
+    @classmethod
+    def get_prompt(cls, prompt_type: str = "general") -> CompiledPrompt:
         """
         Obtiene el prompt según el tipo de consulta
         """
-        prompts = {
-            "general": PsychologyPrompts.get_general_prompt(),
-            "case_analysis": PsychologyPrompts.get_case_analysis_prompt(),
-            "documentation": PsychologyPrompts.get_documentation_prompt(),
-            "resources": PsychologyPrompts.get_resources_prompt()
-        }
+        if prompt_type not in cls._factories:
+            prompt_type = cls.DEFAULT_TYPE
 
-        return prompts.get(prompt_type, prompts["general"])
-    
+        compiled = cls._compiled.get(prompt_type)
+        if compiled is None:
+            with cls._lock:
+                compiled = cls._compiled.get(prompt_type)
+                if compiled is None:
+                    compiled = CompiledPrompt(
+                        prompt_type,
+                        cls.PROMPT_TYPES[prompt_type],
+                        cls._factories[prompt_type](),
+                    )
+                    cls._compiled[prompt_type] = compiled
+        return compiled
 
     @staticmethod
     def get_available_types():
         """Retorna los tipos de prompt disponibles"""
-        return PromptManager.PROMPT_TYPES
+        return dict(PromptManager.PROMPT_TYPES)
+
+
+PromptManager.register_prompt("general", "Asistente clínico general", PsychologyPrompts.get_general_prompt)
+PromptManager.register_prompt("case_analysis", "Análisis de casos", PsychologyPrompts.get_case_analysis_prompt)
+PromptManager.register_prompt("documentation", "Documentación clínica", PsychologyPrompts.get_documentation_prompt)
+PromptManager.register_prompt("resources", "Recursos terapéuticos", PsychologyPrompts.get_resources_prompt)
@@ -133,3 +133,23 @@ class PsychologyPrompts:
                 Proporciono recursos prácticos y basados en evidencia."""),
                     MessagesPlaceholder(variable_name="messages")
                 ])
+
+    @staticmethod
+    def get_conversation_summary_prompt():
+        """Resumen acumulado de la conversación para compactar el historial"""
+        return ChatPromptTemplate.from_messages([
+            ("system", """Mantienes el RESUMEN ACUMULADO de una conversación entre un psicólogo y su asistente clínico.
+
+                INSTRUCCIONES:
+                - Integra los nuevos intercambios en el resumen previo, sin repetir lo que ya recoge
+                - Conserva datos clínicos relevantes: síntomas, hipótesis, técnicas sugeridas, acuerdos y pendientes
+                - Omite saludos y contenido sin valor clínico
+                - Redacta en prosa breve, en tercera persona, con un máximo de 250 palabras
+
+                Devuelve sólo el resumen actualizado."""),
+            ("human", """RESUMEN PREVIO:
+{summary}
+
+NUEVOS INTERCAMBIOS:
+{conversation}""")
+        ])
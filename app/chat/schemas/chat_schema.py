@@ -1,7 +1,10 @@
 from app.core.base_schema import BaseSchema
-from marshmallow import fields
+from marshmallow import fields, validate
 
 class ChatSchema(BaseSchema):
     message = fields.String(required=True)
     session_id = fields.String(required=False, load_default="default")
-    prompt_type = fields.String(required=False, load_default="general")
+    prompt_type = fields.String(required=False, load_default="auto")
+
+class ChatBatchSchema(BaseSchema):
+    items = fields.List(fields.Nested(ChatSchema), required=True, validate=validate.Length(min=1))
@@ -1,158 +1,798 @@
 from flask import jsonify, Request, Response
-from langchain_core.messages import HumanMessage, trim_messages, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START
-from langgraph.checkpoint.memory import MemorySaver
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hmac
 import json
+import queue
+import tempfile
+import threading
+import time
+import uuid
+import zlib
 
 # Schema
-from app.chat.schemas.chat_schema import ChatSchema
+from app.chat.schemas.chat_schema import ChatSchema, ChatBatchSchema
 
 # Models
 from app.chat.models.chat_models import ChatState
+from app.chat.models.message_log import MessageLog, to_langchain
 
 # Services
-from app.chat.services.pdf_service import PDFService
+from app.chat.services.response_cache import ResponseCache
+from app.chat.services.export_jobs import ExportJobs, history_version
+from app.chat.services.compaction import ConversationCompactor, select_compaction, render_transcript
+from app.chat.services.history import (
+    HISTORY_HEADERS, etag_matches, history_etag, paginate_history, parse_history_params
+)
+
+from app.chat.services.session_transfer import (
+    gzip_chunks, ndjson_chunks, parse_session, read_ndjson_lines, session_record
+)
+from app.chat.services.streaming import (
+    SSE_HEADERS, STREAM_MODES, sse_event, full_frames, delta_frames, afull_frames, adelta_frames
+)
 
 # Prompts
 from app.chat.prompts.prompt_manager import PromptManager
+from app.chat.prompts.prompt_classifier import (
+    AUTO_PROMPT_TYPE, classify_prompt_type, get_prompt_classifier, log_example
+)
+from app.chat.prompts.psychology_prompts import PsychologyPrompts
 
 # Core
 from app.core.llm_config import LLMConfig
+from app.core import metrics
+from app.core.context_budget import context_budget
+from app.core.checkpointer import (
+    batch_writes, bulk_reads, create_checkpointer, latest_checkpoint_id, list_threads
+)
+from app.core.hedging import AUTO_PROVIDER, hedged_stream, ahedged_stream, hedge_stats, cancelled
+from app.core.scheduler import get_scheduler, get_scheduler_stats
+from app.core.single_flight import request_key, single_flight
+from app.core.token_counter import get_token_counter, count_with_cache, trim_to_budget
 
 class ChatServices:
     def __init__(self, request: Request):
         self.request = request
         self.llm_config = LLMConfig()
-        self.pdf_service = PDFService()
+        self._pdf_service = None
+        self.response_cache = self._create_response_cache()
+        self.compactor = self._create_compactor()
+        settings = self.llm_config.config
+        self.export_jobs = ExportJobs(
+            settings.export_dir,
+            max_workers=settings.export_workers,
+            cache_max_bytes=settings.export_cache_max_bytes,
+            job_ttl_seconds=settings.export_job_ttl_seconds,
+        )
+        self._batch_pools = {}
+        self._batch_pools_lock = threading.Lock()
         self.app = self._create_graph()
 
+    @property
+    def pdf_service(self):
+        """
+        Servicio de PDF; reportlab se importa en la primera exportación.
+        """
+        if self._pdf_service is None:
+            from app.chat.services.pdf_service import PDFService
+            self._pdf_service = PDFService()
+        return self._pdf_service
+
+    def prewarm(self):
+        """
+        Carga por adelantado lo que se importa de forma diferida: reportlab y los
+        estilos del PDF, los clientes de los proveedores, la codificación de
+        tiktoken y el clasificador de prompt_type=auto. No crea clientes HTTP ni
+        hilos, así que es seguro antes de un fork.
+        """
+        self.pdf_service._get_styles()
+        self.llm_config.import_providers()
+        if self.llm_config.config.prompt_classifier_enabled:
+            get_prompt_classifier()
+        for provider in ("openai", "gemini"):
+            get_token_counter(provider, self.llm_config.get_model_info(provider).get("model_name"))
+
     def _create_graph(self):
         """
         Crea el grafo de ejecución de LangGraph.
         """
         workflow = StateGraph(state_schema=ChatState)
-        workflow.add_node("model", self._call_model)
+        workflow.add_node("model", RunnableLambda(self._call_model, afunc=self._acall_model, name="model"))
+        workflow.add_node("compact", RunnableLambda(self._compact, afunc=self._acompact, name="compact"))
         workflow.add_edge(START, "model")
-        return workflow.compile(checkpointer=MemorySaver())
+        workflow.add_edge("model", "compact")
+        return workflow.compile(checkpointer=create_checkpointer(allowed_types=(MessageLog,)))
 
-    def _trim_messages_if_needed(self, messages, provider: str):
+    def _create_response_cache(self):
         """
-        Recorta mensajes si son demasiados 
+        Crea la caché de respuestas si está habilitada (RESPONSE_CACHE_ENABLED).
         """
-        try:
-            chat_model = self.llm_config.get_chat_model(provider)
+        settings = self.llm_config.config
+        if not settings.response_cache_enabled:
+            return None
+        return ResponseCache(
+            max_entries=settings.response_cache_max_entries,
+            ttl_seconds=settings.response_cache_ttl_seconds,
+            near_duplicates=settings.response_cache_near_duplicates,
+            similarity=settings.response_cache_similarity,
+        )
 
-            trimmed = trim_messages(
-                messages,
-                max_tokens=4000,
-                strategy="last",
-                token_counter=chat_model,
-                include_system=True,
-                allow_partial=False,
-                start_on="human"
-            )
+    def _create_compactor(self):
+        """
+        Crea el compactador de historial si está habilitado (COMPACTION_ENABLED).
+        """
+        settings = self.llm_config.config
+        if not settings.compaction_enabled:
+            return None
+        self.summary_prompt = PsychologyPrompts.get_conversation_summary_prompt()
+        return ConversationCompactor(settings.compaction_workers)
+
+    def _trim_messages_if_needed(self, messages, provider: str, token_counts: dict = None, max_tokens: int = 4000):
+        """
+        Recorta mensajes si son demasiados.
+        Los tokens se cuentan localmente y sólo para los mensajes sin conteo en caché.
 
-            return trimmed
+        :param messages: Mensajes de la conversación
+        :param provider: Proveedor LLM
+        :param token_counts: Conteos por mensaje guardados en el estado de la sesión
+        :param max_tokens: Presupuesto de tokens del historial
+        :return: (mensajes recortados, conteos nuevos a guardar en el estado, tokens del historial recortado)
+        """
+        try:
+            counter = get_token_counter(provider, self.llm_config.get_model_info(provider).get("model_name"))
+            counts, new_counts = count_with_cache(messages, counter, token_counts)
+            trimmed = trim_to_budget(messages, counts, max_tokens=max_tokens, start_on="human")
+            return trimmed, new_counts, sum(counts[len(counts) - len(trimmed):])
         except Exception as e:
             print(f"Warning: Trimming failed: {e}")
-            return messages
+            return messages, {}, 0
+
+    def _count_response(self, response, provider: str, formatted_messages) -> dict:
+        """
+        Cuenta los tokens de la respuesta para el caché de la sesión y
+        recalibra el estimador con el uso real reportado por el proveedor.
+        """
+        try:
+            counter = get_token_counter(provider, self.llm_config.get_model_info(provider).get("model_name"))
+            usage = getattr(response, "usage_metadata", None) or {}
+            if usage.get("input_tokens"):
+                counter.observe(counter.count_messages(formatted_messages), usage["input_tokens"])
+            return {counter.cache_key(response): counter.count_message(response)}
+        except Exception as e:
+            print(f"Warning: Token counting failed: {e}")
+            return {}
+
+    def _counting_provider(self, provider: str) -> str:
+        """Proveedor cuyo contador de tokens se usa para recortar el historial"""
+        return self.llm_config.config.auto_primary_provider if provider == AUTO_PROVIDER else provider
+
+    def _context_window(self, provider: str):
+        """
+        Ventana de contexto del turno. Con provider=auto puede responder cualquiera de
+        los dos proveedores, así que se usa la menor de sus ventanas.
+        """
+        providers = self._auto_route()[0] if provider == AUTO_PROVIDER else (provider,)
+        windows = [self.llm_config.get_model_info(name).get("context_window") for name in providers]
+        windows = [window for window in windows if window]
+        return min(windows) if windows else None
+
+    def _context_limit(self, provider: str, prompt_type: str) -> int:
+        """Presupuesto de tokens de historial según el modelo, el prompt_type y la latencia observada"""
+        window = self._context_window(provider)
+        return context_budget.limit(self._counting_provider(provider), prompt_type, window)
+
+    def _prepare_model_call(self, state: ChatState, messages, token_counts: dict = None, summary: str = None):
+        """
+        Prepara la llamada al modelo: recorta el historial y formatea el prompt.
+        Si la sesión tiene resumen, `messages` son sólo los turnos posteriores a él.
+
+        :return: (mensajes formateados, conteos nuevos de tokens, tokens estimados de la llamada)
+        """
+        provider, prompt_type = state["provider"], state["prompt_type"]
+        prompt_template = PromptManager.get_prompt(prompt_type)
+        counting_provider = self._counting_provider(provider)
+
+        # Trim messages
+        with metrics.timed(metrics.TRIM, provider, prompt_type):
+            max_tokens = self._context_limit(provider, prompt_template.name)
+            trimmed_messages, new_counts, history_tokens = self._trim_messages_if_needed(
+                messages, counting_provider, token_counts, max_tokens
+            )
+        metrics.observe_context(provider, prompt_type, history_tokens, max_tokens)
+
+        with metrics.timed(metrics.PROMPT_FORMAT, provider, prompt_type):
+            formatted_messages = prompt_template.format_messages(messages=to_langchain(trimmed_messages), summary=summary)
+        estimated_tokens = history_tokens + self.llm_config.config.scheduler_completion_tokens
+        return formatted_messages, new_counts, estimated_tokens
+
+    def _finish_model_call(self, response, state: ChatState, formatted_messages, token_counts: dict, started: float):
+        if not response.id:
+            response.id = str(uuid.uuid4())
+        provider = response.response_metadata.get("provider", state["provider"])
+        elapsed = time.perf_counter() - started
+        metrics.observe_stage(metrics.GENERATION, elapsed, provider, state["prompt_type"])
+        context_budget.observe_latency(provider, elapsed)
+        metrics.count_tokens(response.usage_metadata, provider, state["prompt_type"])
+        token_counts.update(self._count_response(response, provider, formatted_messages))
+        metrics.mark_model_end()
+        return {"messages": [response], "token_counts": token_counts}
+
+    def _request_key(self, kind: str, provider: str, formatted_messages, session_id: str = "") -> str:
+        model_name = self.llm_config.get_model_info(provider).get("model_name")
+        return request_key(kind, provider, model_name, formatted_messages, scope=session_id)
+
+    def _invoke_provider(self, provider: str, session_id: str, formatted_messages, estimated_tokens: int):
+        """
+        Llamada sin streaming a un proveedor, con turno de su planificador.
+        Las llamadas idénticas simultáneas de la sesión comparten una sola petición; quien se une
+        recibe una copia sin id para que cada turno guarde su propio mensaje.
+        """
+        def invoke():
+            chat_model = self.llm_config.get_chat_model(provider)
+            with get_scheduler(provider).slot(session_id, estimated_tokens) as ticket:
+                response = chat_model.invoke(formatted_messages)
+                ticket.used_tokens = self._used_tokens(response.usage_metadata)
+            return response
+
+        response, shared = single_flight.do(self._request_key("invoke", provider, formatted_messages, session_id), invoke)
+        return response.model_copy(update={"id": None}) if shared else response
+
+    async def _ainvoke_provider(self, provider: str, session_id: str, formatted_messages, estimated_tokens: int):
+        """Versión asíncrona de `_invoke_provider`"""
+        async def invoke():
+            chat_model = self.llm_config.get_chat_model(provider)
+            async with get_scheduler(provider).aslot(session_id, estimated_tokens) as ticket:
+                response = await chat_model.ainvoke(formatted_messages)
+                ticket.used_tokens = self._used_tokens(response.usage_metadata)
+            return response
+
+        response, shared = await single_flight.ado(self._request_key("invoke", provider, formatted_messages, session_id), invoke)
+        return response.model_copy(update={"id": None}) if shared else response
+
+    def _provider_stream(self, provider: str, session_id: str, formatted_messages, estimated_tokens: int):
+        """
+        Stream de un proveedor concreto. Un stream idéntico de la sesión ya en curso se comparte:
+        quien llega tarde recibe los fragmentos desde el principio y después en vivo.
+        """
+        return single_flight.stream(
+            self._request_key("stream", provider, formatted_messages, session_id),
+            lambda: self._provider_upstream(provider, session_id, formatted_messages, estimated_tokens),
+        )
+
+    def _aprovider_stream(self, provider: str, session_id: str, formatted_messages, estimated_tokens: int):
+        """Versión asíncrona de `_provider_stream`"""
+        return single_flight.astream(
+            self._request_key("stream", provider, formatted_messages, session_id),
+            lambda: self._aprovider_upstream(provider, session_id, formatted_messages, estimated_tokens),
+        )
+
+    def _provider_upstream(self, provider: str, session_id: str, formatted_messages, estimated_tokens: int):
+        """Stream de un proveedor concreto, con turno de su planificador"""
+        chat_model = self.llm_config.get_chat_model(provider)
+        usage = {}
+        with get_scheduler(provider).slot(session_id, estimated_tokens) as ticket:
+            if cancelled():
+                # Se canceló mientras esperaba turno (p. ej. el otro proveedor ya ganó)
+                return
+            stream = chat_model.stream(formatted_messages)
+            try:
+                for chunk in stream:
+                    self._accumulate_usage(usage, chunk)
+                    yield chunk
+            finally:
+                # Si se cierra antes de terminar (cliente desconectado), se corta la petición HTTP al proveedor
+                stream.close()
+            ticket.used_tokens = self._used_tokens(usage)
+
+    async def _aprovider_upstream(self, provider: str, session_id: str, formatted_messages, estimated_tokens: int):
+        """Versión asíncrona de `_provider_upstream`"""
+        chat_model = self.llm_config.get_chat_model(provider)
+        usage = {}
+        async with get_scheduler(provider).aslot(session_id, estimated_tokens) as ticket:
+            stream = chat_model.astream(formatted_messages)
+            try:
+                async for chunk in stream:
+                    self._accumulate_usage(usage, chunk)
+                    yield chunk
+            finally:
+                await stream.aclose()
+            ticket.used_tokens = self._used_tokens(usage)
+
+    def _auto_route(self):
+        settings = self.llm_config.config
+        return (settings.auto_primary_provider, settings.auto_secondary_provider), settings.hedge_delay_ms / 1000
+
+    def _model_stream(self, state: dict, formatted_messages, estimated_tokens: int, routing: dict):
+        """
+        Stream de fragmentos del modelo. Con provider=auto se cubre entre el primario
+        y el secundario, y `routing` recibe el proveedor ganador.
+        """
+        if state["provider"] != AUTO_PROVIDER:
+            return self._provider_stream(state["provider"], state["session_id"], formatted_messages, estimated_tokens)
+        providers, hedge_delay = self._auto_route()
+        return hedged_stream(
+            lambda provider: self._provider_stream(provider, state["session_id"], formatted_messages, estimated_tokens),
+            providers, hedge_delay, routing,
+        )
+
+    def _amodel_stream(self, state: dict, formatted_messages, estimated_tokens: int, routing: dict):
+        """Versión asíncrona de `_model_stream`"""
+        if state["provider"] != AUTO_PROVIDER:
+            return self._aprovider_stream(state["provider"], state["session_id"], formatted_messages, estimated_tokens)
+        providers, hedge_delay = self._auto_route()
+        return ahedged_stream(
+            lambda provider: self._aprovider_stream(provider, state["session_id"], formatted_messages, estimated_tokens),
+            providers, hedge_delay, routing,
+        )
+
+    @staticmethod
+    def _routing_metadata(routing: dict) -> dict:
+        """Datos de enrutado de provider=auto que se guardan con la respuesta"""
+        if not routing.get("provider"):
+            return {}
+        return {"provider": routing["provider"], "hedged": routing["hedged"], "failover": routing["failover"]}
+
+    def _merge_chunks(self, chunks, routing: dict) -> AIMessage:
+        merged = AIMessageChunk(content="")
+        for chunk in chunks:
+            merged += chunk
+        return AIMessage(
+            content=merged.content,
+            usage_metadata=merged.usage_metadata,
+            response_metadata=self._routing_metadata(routing),
+        )
 
     def _call_model(self, state: ChatState):
         """
         Llama al modelo LLM con el estado actual usando prompts especializados.
         """
-        chat_model = self.llm_config.get_chat_model(state["provider"])
-        prompt_template = PromptManager.get_prompt(state["prompt_type"])
+        metrics.mark_model_start(state["provider"], state["prompt_type"])
+        formatted_messages, token_counts, estimated_tokens = self._prepare_model_call(
+            state, state["messages"][state.get("summary_upto") or 0:], state.get("token_counts"), state.get("summary")
+        )
+        started = time.perf_counter()
+        if state["provider"] == AUTO_PROVIDER:
+            routing = {}
+            chunks = list(self._model_stream(state, formatted_messages, estimated_tokens, routing))
+            response = self._merge_chunks(chunks, routing)
+        else:
+            response = self._invoke_provider(state["provider"], state["session_id"], formatted_messages, estimated_tokens)
+        return self._finish_model_call(response, state, formatted_messages, token_counts, started)
 
-        # Trim messages
-        trimmed_messages = self._trim_messages_if_needed(state["messages"], state["provider"])
+    async def _acall_model(self, state: ChatState):
+        """
+        Versión asíncrona de `_call_model`, usada por `ainvoke` en el modo ASGI.
+        """
+        metrics.mark_model_start(state["provider"], state["prompt_type"])
+        formatted_messages, token_counts, estimated_tokens = self._prepare_model_call(
+            state, state["messages"][state.get("summary_upto") or 0:], state.get("token_counts"), state.get("summary")
+        )
+        started = time.perf_counter()
+        if state["provider"] == AUTO_PROVIDER:
+            routing = {}
+            chunks = [chunk async for chunk in self._amodel_stream(state, formatted_messages, estimated_tokens, routing)]
+            response = self._merge_chunks(chunks, routing)
+        else:
+            response = await self._ainvoke_provider(
+                state["provider"], state["session_id"], formatted_messages, estimated_tokens
+            )
+        return self._finish_model_call(response, state, formatted_messages, token_counts, started)
+
+    def _compact(self, state: ChatState):
+        """
+        Nodo de compactación: tras cada turno, si el historial sin resumir supera
+        COMPACTION_TRIGGER_TOKENS, programa en segundo plano la actualización del resumen.
+        No modifica el estado; el resumen se guarda cuando termina.
+        """
+        if not self.compactor or not state.get("messages"):
+            return {}
+        try:
+            settings = self.llm_config.config
+            provider = self._counting_provider(state["provider"])
+            upto = state.get("summary_upto") or 0
+            pending = state["messages"][upto:]
+
+            counter = get_token_counter(provider, self.llm_config.get_model_info(provider).get("model_name"))
+            counts, _ = count_with_cache(pending, counter, state.get("token_counts"))
+            fold = select_compaction(
+                pending, counts, settings.compaction_trigger_tokens, settings.compaction_keep_recent_tokens
+            )
+            if fold:
+                self.compactor.submit(
+                    state["session_id"], self._summarize_history,
+                    state["session_id"], provider, state.get("summary") or "", pending[:fold], upto + fold
+                )
+        except Exception as e:
+            print(f"Warning: Could not schedule compaction: {e}")
+        return {}
+
+    async def _acompact(self, state: ChatState):
+        """Versión asíncrona de `_compact` (sólo programa el trabajo, no espera al resumen)"""
+        return self._compact(state)
+
+    def _summarize_history(self, session_id: str, provider: str, summary: str, messages, upto: int) -> bool:
+        """
+        Incorpora `messages` al resumen de la sesión y lo guarda en el estado.
+
+        :return: False si el resumen quedó obsoleto (otra compactación llegó antes)
+        """
+        formatted_messages = self.summary_prompt.format_messages(
+            summary=summary or "(sin resumen previo)",
+            conversation=render_transcript(messages)
+        )
+        chat_model = self.llm_config.get_chat_model(provider)
+        with get_scheduler(provider).slot(session_id) as ticket:
+            response = chat_model.invoke(formatted_messages)
+            ticket.used_tokens = self._used_tokens(response.usage_metadata)
+
+        config = {"configurable": {"thread_id": session_id}}
+        if (self.app.get_state(config).values.get("summary_upto") or 0) >= upto:
+            return False
+        self.app.update_state(config, {"summary": response.content.strip(), "summary_upto": upto}, as_node="compact")
+        return True
+
+    @staticmethod
+    def _turn_identity(state: dict) -> dict:
+        """Campos del turno que el stream no guarda en el estado de la sesión"""
+        return {"provider": state["provider"], "session_id": state["session_id"], "prompt_type": state["prompt_type"]}
+
+    def _stream_history(self, state: dict, values: dict):
+        """
+        Historial sobre el que se genera la respuesta en streaming.
+        El mensaje del usuario ya se guardó en el estado antes de iniciar el stream.
+        """
+        existing_messages = values.get("messages", [])
+        existing_ids = {msg.id for msg in existing_messages}
+        all_messages = list(existing_messages) + [
+            msg for msg in state["messages"] if msg.id is None or msg.id not in existing_ids
+        ]
+        return all_messages, values.get("token_counts", {})
+
+    def _stream_result(self, content_parts: list, usage: dict, state: dict, formatted_messages,
+                       new_counts: dict, stream_info: dict) -> dict:
+        """
+        Construye el mensaje final del stream y la actualización de estado a guardar.
+        Si el cliente se desconectó (`stream_info["truncated"]`) el mensaje se marca como
+        truncado y se cuentan los tokens generados y los que se estima que se ahorraron.
+
+        :return: Actualización de estado, o None si no hay nada que guardar
+        """
+        accumulated_content = "".join(content_parts)
+        stream_info["content"] = accumulated_content
+        stream_info["usage"] = usage
+
+        response_metadata = self._routing_metadata(stream_info)
+        if stream_info.get("truncated"):
+            response_metadata["truncated"] = True
+        ai_message = AIMessage(
+            content=accumulated_content,
+            id=str(uuid.uuid4()),
+            response_metadata=response_metadata,
+        )
+        provider = stream_info.get("provider") or state["provider"]
+        metrics.count_tokens(usage, provider, state["prompt_type"])
+        response_counts = self._count_response(ai_message, provider, formatted_messages)
+        new_counts.update(response_counts)
+        if stream_info.get("truncated"):
+            generated = usage.get("output_tokens") or sum(response_counts.values())
+            expected = self.llm_config.config.scheduler_completion_tokens
+            metrics.count_cancelled_stream(provider, state["prompt_type"], generated, max(expected - generated, 0))
+            if not accumulated_content:
+                # Cortado antes del primer token: no se guarda un mensaje vacío
+                return None
+        return {"messages": [ai_message], "token_counts": new_counts}
 
-        formatted_messages = prompt_template.format_messages(messages=trimmed_messages)
-        response = chat_model.invoke(formatted_messages)
-        return {"messages": [response]}
+    @staticmethod
+    def _used_tokens(usage: dict):
+        """Tokens reales de la llamada según el proveedor, o None si no los informa"""
+        return (usage or {}).get("total_tokens")
 
-    def _stream_model_response(self, state: dict, config: dict):
+    @staticmethod
+    def _accumulate_usage(usage: dict, chunk):
+        for key, value in (getattr(chunk, "usage_metadata", None) or {}).items():
+            if isinstance(value, int):
+                usage[key] = usage.get(key, 0) + value
+
+    @staticmethod
+    def _observe_stream_stage(stage: str, started: float, state: dict, stream_info: dict):
+        """Registra una etapa del stream con el proveedor que respondió (el ganador con provider=auto)"""
+        provider = stream_info.get("provider") or state["provider"]
+        elapsed = time.perf_counter() - started
+        metrics.observe_stage(stage, elapsed, provider, state["prompt_type"])
+        if stage == metrics.GENERATION:
+            context_budget.observe_latency(provider, elapsed)
+
+    def _stream_model_response(self, state: dict, config: dict, stream_info: dict = None):
         """
         Genera streaming de respuesta del modelo LLM.
 
         :param state: Estado actual de la conversación
         :param config: Configuración de la sesión
-        :return: Generador de chunks de texto
+        :param stream_info: Dict opcional donde se deja el texto completo, el uso de tokens
+            y, con provider=auto, el proveedor ganador
+        :return: Generador de fragmentos nuevos de texto (deltas)
         """
-        chat_model = self.llm_config.get_chat_model(state["provider"])
-        prompt_template = PromptManager.get_prompt(state["prompt_type"])
+        stream_info = stream_info if stream_info is not None else {}
+        try:
+            with metrics.timed(metrics.STATE_FETCH, state["provider"], state["prompt_type"]):
+                values = self.app.get_state(config).values
+        except Exception:
+            values = {}
+        all_messages, token_counts = self._stream_history(state, values)
 
+        formatted_messages, new_counts, estimated_tokens = self._prepare_model_call(
+            state, all_messages[values.get("summary_upto") or 0:], token_counts, values.get("summary")
+        )
+
+        content_parts = []
+        usage = {}
+        started = time.perf_counter()
+        chunks = self._model_stream(state, formatted_messages, estimated_tokens, stream_info)
+        try:
+            for chunk in chunks:
+                self._accumulate_usage(usage, chunk)
+                if hasattr(chunk, 'content') and chunk.content:
+                    if not content_parts:
+                        self._observe_stream_stage(metrics.FIRST_TOKEN, started, state, stream_info)
+                    content_parts.append(chunk.content)
+                    yield chunk.content
+        except GeneratorExit:
+            # El cliente se desconectó: se corta el stream del proveedor y se guarda lo generado
+            chunks.close()
+            stream_info["truncated"] = True
+            self._save_stream_result(content_parts, usage, state, config, formatted_messages, new_counts, stream_info)
+            raise
+        self._observe_stream_stage(metrics.GENERATION, started, state, stream_info)
+        self._save_stream_result(content_parts, usage, state, config, formatted_messages, new_counts, stream_info)
+
+    def _save_stream_result(self, content_parts: list, usage: dict, state: dict, config: dict, formatted_messages,
+                            new_counts: dict, stream_info: dict):
+        """Guarda en la sesión la respuesta del stream y programa la compactación"""
         try:
-            current_state = self.app.get_state(config)
-            existing_messages = current_state.values.get("messages", [])
-            all_messages = existing_messages + state["messages"]
+            update = self._stream_result(content_parts, usage, state, formatted_messages, new_counts, stream_info)
+            if update is None:
+                return
+            with metrics.timed(metrics.STATE_UPDATE, stream_info.get("provider") or state["provider"], state["prompt_type"]):
+                self.app.update_state(config, update)
+            self._compact({**self.app.get_state(config).values, **self._turn_identity(state)})
+        except Exception as e:
+            print(f"Warning: Could not save AI message to state: {e}")
+
+    async def _astream_model_response(self, state: dict, config: dict, stream_info: dict = None):
+        """
+        Versión asíncrona de `_stream_model_response` (modo ASGI).
+        """
+        stream_info = stream_info if stream_info is not None else {}
+        try:
+            with metrics.timed(metrics.STATE_FETCH, state["provider"], state["prompt_type"]):
+                values = (await self.app.aget_state(config)).values
         except Exception:
-            all_messages = state["messages"]
+            values = {}
+        all_messages, token_counts = self._stream_history(state, values)
 
-        trimmed_messages = self._trim_messages_if_needed(all_messages, state["provider"])
-        formatted_messages = prompt_template.format_messages(messages=trimmed_messages)
+        formatted_messages, new_counts, estimated_tokens = self._prepare_model_call(
+            state, all_messages[values.get("summary_upto") or 0:], token_counts, values.get("summary")
+        )
 
-        accumulated_content = ""
-        for chunk in chat_model.stream(formatted_messages):
-            if hasattr(chunk, 'content') and chunk.content:
-                accumulated_content += chunk.content
-                yield accumulated_content
+        content_parts = []
+        usage = {}
+        started = time.perf_counter()
+        chunks = self._amodel_stream(state, formatted_messages, estimated_tokens, stream_info)
+        try:
+            async for chunk in chunks:
+                self._accumulate_usage(usage, chunk)
+                if hasattr(chunk, 'content') and chunk.content:
+                    if not content_parts:
+                        self._observe_stream_stage(metrics.FIRST_TOKEN, started, state, stream_info)
+                    content_parts.append(chunk.content)
+                    yield chunk.content
+        except (GeneratorExit, asyncio.CancelledError):
+            # Cliente desconectado (aclose del generador o cancelación de la tarea mientras
+            # se esperaba al proveedor). El guardado va en una tarea aparte para que la
+            # cancelación no lo interrumpa.
+            await chunks.aclose()
+            stream_info["truncated"] = True
+            await asyncio.shield(self._asave_stream_result(
+                content_parts, usage, state, config, formatted_messages, new_counts, stream_info
+            ))
+            raise
+        self._observe_stream_stage(metrics.GENERATION, started, state, stream_info)
+        await self._asave_stream_result(content_parts, usage, state, config, formatted_messages, new_counts, stream_info)
 
+    async def _asave_stream_result(self, content_parts: list, usage: dict, state: dict, config: dict,
+                                   formatted_messages, new_counts: dict, stream_info: dict):
+        """Versión asíncrona de `_save_stream_result`"""
         try:
-            self.app.update_state(config, {"messages": [AIMessage(content=accumulated_content)]})
+            update = self._stream_result(content_parts, usage, state, formatted_messages, new_counts, stream_info)
+            if update is None:
+                return
+            with metrics.timed(metrics.STATE_UPDATE, stream_info.get("provider") or state["provider"], state["prompt_type"]):
+                await self.app.aupdate_state(config, update)
+            self._compact({**(await self.app.aget_state(config)).values, **self._turn_identity(state)})
         except Exception as e:
             print(f"Warning: Could not save AI message to state: {e}")
 
-    def _stream_response(self, state: dict, config: dict):
+    def _done_event(self, stream_mode: str, stream_info: dict) -> str:
+        routing = self._routing_metadata(stream_info)
+        if stream_mode == "delta":
+            return sse_event({
+                'type': 'done',
+                'content': stream_info.get("content", ""),
+                'usage': stream_info.get("usage", {}),
+                **routing
+            }, ensure_ascii=False)
+        return sse_event({'type': 'done', **routing})
+
+    def _sse_events(self, state: dict, config: dict, stream_mode: str = "full", cacheable: bool = False):
         """
-        Genera respuesta streaming usando Server-Sent Events (SSE).
-        :param state: Estado inicial para LangGraph
-        :param config: Configuración de la sesión
-        :return: Response con streaming SSE
+        Generador de eventos SSE para una respuesta en streaming.
         """
-        def generate():
-            try:
-                yield f"data: {json.dumps({'type': 'start'})}\n\n"
+        try:
+            stream_info = {}
+            deltas = self._stream_model_response(state, config, stream_info)
 
-                for chunk in self._stream_model_response(state, config):
-                    if chunk:
-                        yield f"data: {json.dumps({'type': 'chunk', 'content': chunk})}\n\n"
+            # Al cerrar este generador (el servidor lo hace cuando el cliente se desconecta)
+            # `yield from` cierra los eventos, que cierran el stream del modelo
+            if stream_mode == "delta":
+                yield sse_event({'type': 'start', 'mode': 'delta'})
+                yield from delta_frames(
+                    deltas,
+                    self.llm_config.config.sse_flush_interval_ms / 1000,
+                    self.llm_config.config.sse_flush_max_chars,
+                )
+            else:
+                yield sse_event({'type': 'start'})
+                yield from full_frames(deltas)
+            yield self._done_event(stream_mode, stream_info)
+            if cacheable:
+                self._cache_store(state, stream_info.get("content"))
 
-                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+        except Exception as e:
+            yield sse_event({'type': 'error', 'error': str(e)})
 
-            except Exception as e:
-                yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+    async def asse_events(self, state: dict, config: dict, stream_mode: str = "full", cacheable: bool = False):
+        """
+        Generador asíncrono de eventos SSE (modo ASGI).
+        """
+        try:
+            stream_info = {}
+            deltas = self._astream_model_response(state, config, stream_info)
+            if stream_mode == "delta":
+                frames = adelta_frames(
+                    deltas,
+                    self.llm_config.config.sse_flush_interval_ms / 1000,
+                    self.llm_config.config.sse_flush_max_chars,
+                )
+                yield sse_event({'type': 'start', 'mode': 'delta'})
+            else:
+                frames = afull_frames(deltas)
+                yield sse_event({'type': 'start'})
+            async for frame in frames:
+                yield frame
+            yield self._done_event(stream_mode, stream_info)
+            if cacheable:
+                self._cache_store(state, stream_info.get("content"))
+
+        except GeneratorExit:
+            # Cerrar los eventos cierra el stream del modelo
+            await frames.aclose()
+            raise
+        except Exception as e:
+            yield sse_event({'type': 'error', 'error': str(e)})
 
+    def _cached_sse_events(self, content: str, stream_mode: str = "full"):
+        """
+        Eventos SSE para una respuesta servida desde la caché: un único fragmento con el texto completo.
+        """
+        if stream_mode == "delta":
+            yield sse_event({'type': 'start', 'mode': 'delta', 'cached': True})
+            yield sse_event({'type': 'delta', 'content': content}, ensure_ascii=False)
+        else:
+            yield sse_event({'type': 'start', 'cached': True})
+            yield sse_event({'type': 'chunk', 'content': content})
+        yield self._done_event(stream_mode, {"content": content, "usage": {}})
+
+    def _stream_response(self, events):
+        """
+        Genera respuesta streaming usando Server-Sent Events (SSE).
+
+        Si el cliente se desconecta, el servidor WSGI falla al escribir y cierra la
+        respuesta, que cierra `events`: el generador corta el stream del proveedor,
+        libera el worker y guarda la respuesta parcial marcada como truncada.
+
+        :param events: Generador de eventos SSE
+        :return: Response con streaming SSE
+        """
         return Response(
-            generate(),
+            events,
             mimetype='text/event-stream',
-            headers={
-                'Cache-Control': 'no-cache',
-                'Connection': 'keep-alive',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Cache-Control'
-            }
+            headers=SSE_HEADERS
         )
 
-    def chat(self, data: ChatSchema, query_params: dict):
+    def _cache_scope(self, state: dict) -> tuple:
+        model_name = self.llm_config.get_model_info(state["provider"]).get("model_name")
+        return state["messages"][-1].content, state["prompt_type"], state["provider"], model_name
+
+    def _fetch_values(self, state: dict, config: dict) -> dict:
+        with metrics.timed(metrics.STATE_FETCH, state["provider"], state["prompt_type"]):
+            return self.app.get_state(config).values
+
+    def _cache_lookup(self, state: dict, values: dict):
         """
-        Servicio para enviar mensajes al chatbot.
-        Soporta tanto respuestas normales como streaming según el parámetro 'stream'.
+        Consulta la caché de respuestas. Sólo aplica a turnos sin contexto previo en la sesión.
+
+        :param state: Estado inicial del turno
+        :param values: Valores actuales de la sesión
+        :return: (turno cacheable, respuesta en caché o None)
+        """
+        if values.get("messages"):
+            return False, None
+        return True, self.response_cache.get(*self._cache_scope(state))
+
+    def _cache_store(self, state: dict, content: str):
+        try:
+            self.response_cache.put(*self._cache_scope(state), content)
+        except Exception as e:
+            print(f"Warning: Could not cache response: {e}")
+
+    @staticmethod
+    def _cached_update(state: dict, content: str) -> dict:
+        """Actualización de estado que registra en la sesión un turno servido desde caché"""
+        return {
+            "messages": [*state["messages"], AIMessage(content=content, id=str(uuid.uuid4()))],
+            "provider": state["provider"],
+            "session_id": state["session_id"],
+            "prompt_type": state["prompt_type"],
+        }
+
+    @staticmethod
+    def _resolve_prompt_type(prompt_type: str, message: str, provider: str) -> str:
+        """
+        Con prompt_type=auto (o sin prompt_type) elige el tipo con el clasificador local. Un tipo elegido
+        por el usuario se registra como ejemplo (PROMPT_CLASSIFIER_LOG_PATH) sólo si
+        PromptManager lo conoce; uno desconocido se sustituye por el tipo por defecto.
+        """
+        if prompt_type != AUTO_PROMPT_TYPE:
+            if prompt_type not in PromptManager.PROMPT_TYPES:
+                return PromptManager.DEFAULT_TYPE
+            log_example(message, prompt_type)
+            return prompt_type
+        started = time.perf_counter()
+        prompt_type, _ = classify_prompt_type(message, PromptManager.DEFAULT_TYPE)
+        metrics.observe_stage(metrics.PROMPT_CLASSIFY, time.perf_counter() - started, provider, prompt_type)
+        return prompt_type
+
+    def prepare_chat(self, data: dict, query_params: dict):
+        """
+        Valida la petición de chat y construye el estado inicial del grafo.
+
         :param data: Datos de la petición in body
         :param query_params: Parámetros de la petición in query
-        :return: Respuesta del chatbot (JSON normal o SSE stream)
+        :return: (estado, config de la sesión, stream, stream_mode)
         """
-
         if not query_params.get("provider"):
             raise ValueError("Proveedor no especificado")
+        # Antes de crear nada por proveedor (planificador, pool del lote, métricas)
+        self.llm_config.validate_provider(query_params["provider"], allow_auto=True)
 
+        started = time.perf_counter()
         data = ChatSchema().load(data)
         session_id = data.get("session_id", "default")
-        prompt_type = data.get("prompt_type", "general")
+        prompt_type = data.get("prompt_type", AUTO_PROMPT_TYPE)
+        metrics.observe_stage(metrics.SCHEMA_LOAD, time.perf_counter() - started, query_params.get("provider"), prompt_type)
+        prompt_type = self._resolve_prompt_type(prompt_type, data["message"], query_params.get("provider"))
         stream = query_params.get("stream", "false").lower() == "true"
+        stream_mode = query_params.get("stream_mode", "full").lower()
+        if stream_mode not in STREAM_MODES:
+            raise ValueError(f"Modo de streaming no soportado: {stream_mode}")
 
         config = {"configurable": {"thread_id": session_id}}
-        user_message = HumanMessage(content=data["message"])
+        # Con id propio: el historial del stream lo reconoce como ya guardado
+        user_message = HumanMessage(content=data["message"], id=str(uuid.uuid4()))
 
         state = {
             "messages": [user_message],
@@ -160,56 +800,491 @@ class ChatServices:
             "session_id": session_id,
             "prompt_type": prompt_type
         }
+        return state, config, stream, stream_mode
+
+    @staticmethod
+    def _response_payload(content: str, cached: bool = False, routing: dict = None) -> dict:
+        payload = {"response": content.replace("\n", "").strip()}
+        if cached:
+            payload["cached"] = True
+        payload.update(routing or {})
+        return payload
+
+    def _result_routing(self, state: dict, result: dict) -> dict:
+        """Proveedor ganador de un turno con provider=auto"""
+        if state["provider"] != AUTO_PROVIDER:
+            return {}
+        return self._routing_metadata(result["messages"][-1].response_metadata)
+
+    def chat(self, data: ChatSchema, query_params: dict):
+        """
+        Servicio para enviar mensajes al chatbot.
+        Soporta tanto respuestas normales como streaming según el parámetro 'stream'.
+        :param data: Datos de la petición in body
+        :param query_params: Parámetros de la petición in query
+        :return: Respuesta del chatbot (JSON normal o SSE stream)
+        """
+        state, config, stream, stream_mode = self.prepare_chat(data, query_params)
 
         if stream:
+            cacheable, cached = False, None
+            if self.response_cache:
+                cacheable, cached = self._cache_lookup(state, self._fetch_values(state, config))
+            if cached is not None:
+                metrics.count_request(state["provider"], state["prompt_type"], "cached")
+                self.app.update_state(config, self._cached_update(state, cached))
+                return self._stream_response(self._cached_sse_events(cached, stream_mode))
+            metrics.count_request(state["provider"], state["prompt_type"], "stream")
             try:
-                self.app.update_state(config, {"messages": [user_message]})
+                self.app.update_state(config, {"messages": state["messages"]})
             except Exception as e:
                 print(f"Warning: Could not save user message: {e}")
-            return self._stream_response(state, config)
+            return self._stream_response(self._sse_events(state, config, stream_mode, cacheable))
         else:
+            content, cached, routing = self._chat_turn(state, config)
+            return jsonify(self._response_payload(content, cached=cached, routing=routing))
+
+    def _chat_turn(self, state: dict, config: dict):
+        """
+        Ejecuta un turno de chat sin streaming, pasando por la caché de respuestas.
+
+        :return: (texto de la respuesta, servida desde caché, enrutado de provider=auto)
+        """
+        cacheable, cached = False, None
+        if self.response_cache:
+            cacheable, cached = self._cache_lookup(state, self._fetch_values(state, config))
+        if cached is not None:
+            metrics.count_request(state["provider"], state["prompt_type"], "cached")
+            self.app.update_state(config, self._cached_update(state, cached))
+            return cached, True, {}
+
+        metrics.count_request(state["provider"], state["prompt_type"], "invoke")
+        with metrics.graph_turn(state["provider"], state["prompt_type"]):
             result = self.app.invoke(state, config)
-            response = result["messages"][-1].content.replace("\n", "").strip()
-            return jsonify({"response": response})
+        content = result["messages"][-1].content
+        if cacheable:
+            self._cache_store(state, content)
+        return content, False, self._result_routing(state, result)
+
+    def _batch_pool(self, provider: str) -> ThreadPoolExecutor:
+        """Pool de workers acotado por proveedor, compartido por todos los lotes"""
+        with self._batch_pools_lock:
+            pool = self._batch_pools.get(provider)
+            if pool is None:
+                pool = ThreadPoolExecutor(
+                    max_workers=self.llm_config.config.batch_max_workers_per_provider,
+                    thread_name_prefix=f"batch-{provider}",
+                )
+                self._batch_pools[provider] = pool
+            return pool
+
+    def chat_batch(self, data: dict, query_params: dict):
+        """
+        Ejecuta un lote de mensajes independientes en paralelo acotado por proveedor.
+        Los resultados se devuelven como NDJSON en orden de finalización; los mensajes
+        de una misma sesión se procesan en orden, uno tras otro.
+
+        :param data: Datos de la petición in body ({"items": [...]})
+        :param query_params: Parámetros de la petición in query
+        :return: Response NDJSON con una línea por mensaje y una línea final de resumen
+        """
+        data = ChatBatchSchema().load(data)
+        items = data["items"]
+        max_items = self.llm_config.config.batch_max_items
+        if len(items) > max_items:
+            raise ValueError(f"El lote supera el máximo de {max_items} mensajes")
+
+        turns = [self.prepare_chat(item, query_params)[:2] for item in items]
+        provider = turns[0][0]["provider"]
+
+        sessions = {}
+        for index, (state, config) in enumerate(turns):
+            sessions.setdefault(state["session_id"], []).append((index, state, config))
+
+        results = queue.Queue()
+        batch_start = time.perf_counter()
+
+        pool = self._batch_pool(provider)
+
+        def run_turn(session_turns):
+            index, state, config = session_turns.pop(0)
+            started = time.perf_counter()
+            line = {"type": "result", "index": index, "session_id": state["session_id"]}
+            try:
+                content, cached, routing = self._chat_turn(state, config)
+                line.update(self._response_payload(content, cached=cached, routing=routing))
+            except Exception as e:
+                line["error"] = str(e)
+            line["queued_ms"] = round((started - batch_start) * 1000, 1)
+            line["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            # El siguiente mensaje de la sesión vuelve a la cola del pool, detrás de las demás sesiones
+            if session_turns:
+                pool.submit(run_turn, session_turns)
+            results.put(line)
+
+        for session_turns in sessions.values():
+            pool.submit(run_turn, session_turns)
+
+        def generate():
+            failed = 0
+            for _ in range(len(turns)):
+                line = results.get()
+                failed += "error" in line
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+            yield json.dumps({
+                "type": "summary",
+                "total": len(turns),
+                "succeeded": len(turns) - failed,
+                "failed": failed,
+                "wall_time_ms": round((time.perf_counter() - batch_start) * 1000, 1)
+            }) + "\n"
+
+        return Response(generate(), mimetype="application/x-ndjson")
+
+    async def _acache_lookup(self, state: dict, config: dict):
+        if not self.response_cache:
+            return False, None
+        with metrics.timed(metrics.STATE_FETCH, state["provider"], state["prompt_type"]):
+            values = (await self.app.aget_state(config)).values
+        cacheable, cached = self._cache_lookup(state, values)
+        if cached is not None:
+            await self.app.aupdate_state(config, self._cached_update(state, cached))
+        return cacheable, cached
+
+    async def achat(self, state: dict, config: dict) -> dict:
+        """
+        Versión asíncrona del chat sin streaming (modo ASGI).
+
+        :return: Payload JSON de la respuesta
+        """
+        cacheable, cached = await self._acache_lookup(state, config)
+        if cached is not None:
+            metrics.count_request(state["provider"], state["prompt_type"], "cached")
+            return self._response_payload(cached, cached=True)
+
+        metrics.count_request(state["provider"], state["prompt_type"], "invoke")
+        with metrics.graph_turn(state["provider"], state["prompt_type"]):
+            result = await self.app.ainvoke(state, config)
+        content = result["messages"][-1].content
+        if cacheable:
+            self._cache_store(state, content)
+        return self._response_payload(content, routing=self._result_routing(state, result))
 
-    def get_history(self, session_id: str):
+    async def astream_chat(self, state: dict, config: dict, stream_mode: str = "full"):
         """
-        Obtiene el historial de una sesión específica.
+        Versión asíncrona del chat en streaming (modo ASGI).
+
+        :return: Generador asíncrono de eventos SSE
+        """
+        cacheable, cached = await self._acache_lookup(state, config)
+        if cached is not None:
+            metrics.count_request(state["provider"], state["prompt_type"], "cached")
+            for event in self._cached_sse_events(cached, stream_mode):
+                yield event
+            return
+
+        metrics.count_request(state["provider"], state["prompt_type"], "stream")
+        try:
+            await self.app.aupdate_state(config, {"messages": state["messages"]})
+        except Exception as e:
+            print(f"Warning: Could not save user message: {e}")
+        events = self.asse_events(state, config, stream_mode, cacheable)
+        try:
+            async for event in events:
+                yield event
+        finally:
+            # Al cerrar este generador (cliente desconectado) se cierra también el stream
+            await events.aclose()
+
+    def _unchanged_history_etag(self, session_id: str, params: dict, if_none_match: str):
+        """
+        ETag vigente si coincide con el que ya tiene el cliente, o None.
+        Se consulta sólo el id del último checkpoint, sin cargar ni serializar mensajes.
+        """
+        if not if_none_match:
+            return None
+        etag = history_etag(latest_checkpoint_id(self.app.checkpointer, session_id), params)
+        return etag if etag_matches(if_none_match, etag) else None
+
+    @staticmethod
+    def _history_from_state(state, params: dict):
+        checkpoint_id = state.config.get("configurable", {}).get("checkpoint_id")
+        return paginate_history(state.values.get("messages", []), **params), history_etag(checkpoint_id, params)
+
+    def _history_page(self, session_id: str, query_params: dict, if_none_match: str = None):
+        """
+        Página del historial y su ETag.
+
+        :param query_params: Parámetros since/cursor/limit
+        :param if_none_match: Cabecera If-None-Match del cliente
+        :return: (payload, o None si el cliente ya tiene esta versión; etag)
+        """
+        params = parse_history_params(query_params, self.llm_config.config.history_max_page_size)
+        etag = self._unchanged_history_etag(session_id, params, if_none_match)
+        if etag:
+            return None, etag
+        state = self.app.get_state({"configurable": {"thread_id": session_id}})
+        return self._history_from_state(state, params)
+
+    async def aget_history(self, session_id: str, query_params: dict, if_none_match: str = None):
+        """Historial de una sesión (modo ASGI); mismo resultado que `_history_page`"""
+        params = parse_history_params(query_params, self.llm_config.config.history_max_page_size)
+        etag = self._unchanged_history_etag(session_id, params, if_none_match)
+        if etag:
+            return None, etag
+        state = await self.app.aget_state({"configurable": {"thread_id": session_id}})
+        return self._history_from_state(state, params)
+
+    def get_history(self, session_id: str, query_params: dict, if_none_match: str = None):
+        """
+        Obtiene el historial de una sesión específica, paginado y con ETag.
+        Si el cliente envía el ETag de la versión actual se responde 304 sin cuerpo.
         
         :param session_id: ID de la sesión
+        :param query_params: Parámetros de la petición in query (since, cursor, limit)
+        :param if_none_match: Cabecera If-None-Match del cliente
         :return: Historial de la sesión
         """
-        config = {"configurable": {"thread_id": session_id}}
         try:
-            state = self.app.get_state(config)
-            messages = []
-            for msg in state.values.get("messages", []):
-                messages.append({
-                    "type": msg.__class__.__name__,
-                    "content": msg.content
-                })
-            return jsonify({"messages": messages})
+            payload, etag = self._history_page(session_id, query_params, if_none_match)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
+        response = Response(status=304) if payload is None else jsonify(payload)
+        response.headers.update(HISTORY_HEADERS)
+        response.headers["ETag"] = etag
+        return response
+
+    def _export_snapshot(self, session_id: str):
+        """
+        Historial actual de la sesión, su versión y la función que genera su PDF.
+        """
+        config = {"configurable": {"thread_id": session_id}}
+        values = self.app.get_state(config).values
+        messages = values.get("messages", [])
+
+        def render(output):
+            previous = values.get("report_summary")
+            summary, record = self.pdf_service.update_ai_summary(
+                messages, self.llm_config, previous=previous, session_id=session_id
+            )
+            if record is not None and record is not previous:
+                try:
+                    self.app.update_state(config, {"report_summary": record}, as_node="compact")
+                except Exception as e:
+                    print(f"Warning: Could not save report summary: {e}")
+            with metrics.timed(metrics.PDF_RENDER):
+                self.pdf_service.write_clinical_report(output, session_id, messages, self.llm_config, summary=summary)
+
+        return history_version(messages), render
+
     def export_history_pdf(self, session_id: str):
-        """Exporta historial como PDF profesional"""
+        """
+        Exporta historial como PDF profesional.
+
+        El PDF se escribe en un fichero temporal anónimo (0600, ya borrado del directorio
+        privado de exportaciones) y se envía por bloques desde él, sin copiarlo entero en
+        memoria. ReportLab sólo serializa el documento al terminar de maquetarlo, así que
+        el primer byte llega cuando el informe está completo.
+        """
+        output = None
         try:
-            config = {"configurable": {"thread_id": session_id}}
-            state = self.app.get_state(config)
-            messages = state.values.get("messages", [])
+            _, render = self._export_snapshot(session_id)
+            output = tempfile.TemporaryFile(dir=self.export_jobs.export_dir)
+            render(output)
+            output.seek(0)
+            # send_file cierra el fichero (y libera el espacio) al terminar la respuesta
+            return self.pdf_service.create_download_response(output, session_id)
 
-            buffer = self.pdf_service.generate_clinical_report(session_id, messages, self.llm_config)
-            return self.pdf_service.create_download_response(buffer, session_id)
+        except Exception as e:
+            if output is not None:
+                output.close()
+            return jsonify({"error": str(e)}), 500
 
+    def _export_job_payload(self, job: dict) -> dict:
+        payload = dict(job)
+        payload["status_url"] = f"/api/v1/export-pdf/jobs/{job['job_id']}"
+        if job["status"] == "done":
+            payload["download_url"] = f"{payload['status_url']}/download"
+        return payload
+
+    def start_pdf_export(self, session_id: str):
+        """
+        Inicia la exportación a PDF en segundo plano.
+
+        :param session_id: ID de la sesión
+        :return: Trabajo de exportación (202), ya terminado si el historial no cambió
+        """
+        try:
+            version, render = self._export_snapshot(session_id)
+            job = self.export_jobs.submit(session_id, version, render)
+            return jsonify(self._export_job_payload(job)), 202
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
+    def get_pdf_export(self, job_id: str):
+        """Estado de un trabajo de exportación"""
+        job = self.export_jobs.status(job_id)
+        if job is None:
+            return jsonify({"error": "Trabajo de exportación no encontrado"}), 404
+        return jsonify(self._export_job_payload(job))
+
+    def download_pdf_export(self, job_id: str):
+        """Descarga el PDF de un trabajo terminado"""
+        job, path = self.export_jobs.result_path(job_id)
+        if job is None:
+            return jsonify({"error": "Trabajo de exportación no encontrado"}), 404
+        if job["status"] != "done":
+            return jsonify(self._export_job_payload(job)), 409
+        if path is None:
+            return jsonify({"error": "El PDF ya no está disponible, inicia una nueva exportación"}), 410
+        return self.pdf_service.create_download_response(path, job["session_id"])
+
+    def _check_sessions_admin(self, authorization: str):
+        """
+        Exportar e importar sesiones da acceso a todas las conversaciones: sólo se
+        permite con el token SESSIONS_ADMIN_TOKEN (deshabilitado si no se configura).
+
+        :return: Respuesta de error o None si la petición está autorizada
+        """
+        token = self.llm_config.config.sessions_admin_token
+        if not token:
+            return jsonify({"error": "Exportación e importación de sesiones deshabilitadas (SESSIONS_ADMIN_TOKEN)"}), 403
+        if not hmac.compare_digest((authorization or "").encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+            return jsonify({"error": "Token de administración no válido"}), 401
+        return None
+
+    def _export_records(self, stats: dict):
+        """Genera las sesiones del checkpointer una a una y una línea final de resumen"""
+        checkpointer = self.app.checkpointer
+        for session_id in list_threads(checkpointer):
+            try:
+                with bulk_reads(checkpointer):
+                    values = self.app.get_state({"configurable": {"thread_id": session_id}}).values
+            except Exception as e:
+                print(f"Warning: Could not export session {session_id}: {e}")
+                stats["failed"].append(session_id)
+                continue
+            if values.get("messages"):
+                stats["sessions"] += 1
+                yield session_record(session_id, values)
+        yield {"type": "summary", "sessions": stats["sessions"], "failed": stats["failed"]}
+
+    def export_sessions(self, query_params: dict, authorization: str = None):
+        """
+        Exporta todas las sesiones como NDJSON (una sesión por línea) en streaming:
+        se leen de una en una del checkpointer, así que la memoria no crece con el
+        número de sesiones.
+
+        :param query_params: Parámetros de la petición in query (compress=gzip)
+        :param authorization: Cabecera Authorization ("Bearer <SESSIONS_ADMIN_TOKEN>")
+        :return: Response NDJSON, comprimida con gzip si se pide
+        """
+        error = self._check_sessions_admin(authorization)
+        if error:
+            return error
+        compress = query_params.get("compress", "").lower()
+        if compress not in ("", "gzip"):
+            return jsonify({"error": "compress debe ser 'gzip'"}), 400
+
+        body = ndjson_chunks(self._export_records({"sessions": 0, "failed": []}))
+        filename = time.strftime("sessions-%Y%m%d-%H%M%S.ndjson")
+        if compress == "gzip":
+            return Response(gzip_chunks(body), mimetype="application/gzip",
+                            headers={"Content-Disposition": f'attachment; filename="{filename}.gz"'})
+        return Response(body, mimetype="application/x-ndjson",
+                        headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+    def _import_batch(self, batch: list, overwrite: bool, result: dict):
+        """Escribe un lote de sesiones en el checkpointer dentro de una misma transacción"""
+        checkpointer = self.app.checkpointer
+        with batch_writes(checkpointer):
+            for line_number, session_id, values in batch:
+                try:
+                    if latest_checkpoint_id(checkpointer, session_id) is not None:
+                        if not overwrite:
+                            result["skipped"] += 1
+                            continue
+                        checkpointer.delete_thread(session_id)
+                    self.app.update_state({"configurable": {"thread_id": session_id}}, values, as_node="compact")
+                    result["imported"] += 1
+                except Exception as e:
+                    self._import_error(result, line_number, e)
+
+    @staticmethod
+    def _import_error(result: dict, line_number: int, error: Exception):
+        result["failed"] += 1
+        if len(result["errors"]) < 10:
+            result["errors"].append({"line": line_number, "error": str(error)})
+
+    def import_sessions(self, stream, query_params: dict, authorization: str = None):
+        """
+        Importa sesiones desde un cuerpo NDJSON (el formato de export_sessions),
+        opcionalmente comprimido con gzip. El cuerpo se lee por bloques y las sesiones
+        se escriben en lotes de SESSIONS_IMPORT_BATCH_SIZE.
+
+        :param stream: Flujo de entrada de la petición
+        :param query_params: Parámetros de la petición in query (overwrite=true reemplaza sesiones existentes)
+        :param authorization: Cabecera Authorization ("Bearer <SESSIONS_ADMIN_TOKEN>")
+        :return: Resumen con sesiones importadas, omitidas (ya existían) y fallidas
+        """
+        error = self._check_sessions_admin(authorization)
+        if error:
+            return error
+        overwrite = query_params.get("overwrite", "false").lower() == "true"
+        batch_size = max(1, self.llm_config.config.sessions_import_batch_size)
+        result = {"imported": 0, "skipped": 0, "failed": 0, "errors": []}
+
+        batch = []
+        try:
+            for line_number, line in read_ndjson_lines(stream.read):
+                try:
+                    record = json.loads(line)
+                    if isinstance(record, dict) and record.get("type") == "summary":
+                        continue
+                    session_id, values = parse_session(record)
+                except ValueError as e:
+                    self._import_error(result, line_number, e)
+                    continue
+                batch.append((line_number, session_id, values))
+                if len(batch) >= batch_size:
+                    self._import_batch(batch, overwrite, result)
+                    batch = []
+            self._import_batch(batch, overwrite, result)
+        except (ValueError, zlib.error) as e:
+            # Cuerpo ilegible: las sesiones de los lotes anteriores ya están importadas
+            self._import_batch(batch, overwrite, result)
+            return jsonify({"error": f"No se pudo leer el cuerpo: {e}", **result}), 400
+        return jsonify(result)
+
+    @staticmethod
+    def prompt_types_payload() -> dict:
+        return {
+            "prompt_types": PromptManager.get_available_types(),
+            "default": AUTO_PROMPT_TYPE,
+        }
+
     def get_prompt_types(self):
         """Obtiene los tipos de prompt disponibles"""
+        return jsonify(self.prompt_types_payload())
+
+    def get_stats(self):
+        """Obtiene estadísticas internas del worker actual"""
+        checkpointer = self.app.checkpointer
         return jsonify({
-            "prompt_types": PromptManager.get_available_types(),
-            "default": "auto"
+            "llm_clients": self.llm_config.get_registry_stats(),
+            "schedulers": get_scheduler_stats(),
+            "auto": hedge_stats.stats(),
+            "single_flight": single_flight.stats(),
+            "context_budget": context_budget.stats(),
+            "compaction": self.compactor.stats() if self.compactor else {"enabled": False},
+            "pdf_exports": self.export_jobs.stats(),
+            "checkpointer": checkpointer.stats() if hasattr(checkpointer, "stats") else {
+                "backend": checkpointer.__class__.__name__
+            },
+            "response_cache": self.response_cache.stats() if self.response_cache else {"enabled": False}
         })
 
     def test_connection(self, query_params: dict):
@@ -222,7 +1297,12 @@ class ChatServices:
         try:
             if not query_params.get("provider"):
                 raise ValueError("Proveedor no especificado")
-            result = self.llm_config.test_model_connection(query_params.get("provider"))
+            provider = query_params.get("provider")
+            # Las pruebas simultáneas del mismo proveedor comparten una sola llamada
+            result, _ = single_flight.do(
+                self._request_key("test_connection", provider, []),
+                lambda: self.llm_config.test_model_connection(provider),
+            )
             return jsonify(result)
         except Exception as e:
             return jsonify({
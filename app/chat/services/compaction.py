@@ -0,0 +1,98 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def select_compaction(messages, counts: list, trigger_tokens: int, keep_recent_tokens: int):
+    """
+    Decide qué parte del historial pendiente se resume.
+
+    Si los mensajes aún no resumidos superan `trigger_tokens`, se resume todo salvo el
+    sufijo más largo que cabe en `keep_recent_tokens` y empieza por un mensaje del usuario.
+
+    :param messages: Mensajes posteriores al resumen actual
+    :param counts: Conteo de tokens de cada mensaje
+    :return: Número de mensajes a incorporar al resumen, o None si no hace falta
+    """
+    if sum(counts) <= trigger_tokens:
+        return None
+
+    total = 0
+    start = len(messages)
+    for index in range(len(messages) - 1, -1, -1):
+        total += counts[index]
+        if total > keep_recent_tokens:
+            break
+        start = index
+    while start < len(messages) and messages[start].type != "human":
+        start += 1
+    return start or None
+
+
+def render_transcript(messages) -> str:
+    """Texto plano de la conversación para el prompt de resumen"""
+    lines = []
+    for msg in messages:
+        speaker = "Psicólogo" if msg.type == "human" else "Asistente"
+        lines.append(f"{speaker}: {msg.content}")
+    return "\n".join(lines)
+
+
+class ConversationCompactor:
+    """
+    Ejecuta en segundo plano la actualización del resumen de cada sesión.
+    Como mucho hay un resumen en curso por sesión; el resto de peticiones se descartan.
+    """
+
+    def __init__(self, max_workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="compaction")
+        self._lock = threading.Lock()
+        self._in_flight = set()
+
+        self.scheduled = 0
+        self.completed = 0
+        self.failed = 0
+        self.discarded = 0
+        self.total_seconds = 0.0
+
+    def submit(self, session_id: str, job, *args) -> bool:
+        """
+        Programa `job(*args)` si la sesión no tiene ya un resumen en curso.
+
+        :return: True si se programó
+        """
+        with self._lock:
+            if session_id in self._in_flight:
+                return False
+            self._in_flight.add(session_id)
+            self.scheduled += 1
+        self.executor.submit(self._run, session_id, job, args)
+        return True
+
+    def _run(self, session_id: str, job, args):
+        started = time.perf_counter()
+        try:
+            applied = job(*args)
+            with self._lock:
+                self.completed += 1
+                self.discarded += not applied
+        except Exception as e:
+            print(f"Warning: Conversation summary failed: {e}")
+            with self._lock:
+                self.failed += 1
+        finally:
+            with self._lock:
+                self._in_flight.discard(session_id)
+                self.total_seconds += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "in_flight": len(self._in_flight),
+                "scheduled": self.scheduled,
+                "completed": self.completed,
+                "failed": self.failed,
+                "discarded": self.discarded,
+                "avg_seconds": self.total_seconds / finished if finished else 0.0,
+            }
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.private_dir import open_private, private_directory
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def history_version(messages) -> str:
+    """Versión del historial: cambia en cuanto se añade o modifica un mensaje"""
+    digest = hashlib.sha1()
+    for msg in messages:
+        digest.update(str(msg.id).encode("utf-8"))
+        digest.update(b"\x1f")
+        digest.update(str(msg.content).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()[:16]
+
+
+class ExportJobs:
+    """
+    Trabajos de exportación a PDF en un pool en segundo plano.
+
+    Los PDF terminados se guardan en `export_dir` con clave sesión + versión del
+    historial, de modo que una sesión sin cambios se sirve sin volver a generarse.
+    El estado de cada trabajo también se guarda en disco, así que cualquier worker
+    que comparta el directorio puede consultar y descargar un trabajo terminado.
+    Los informes contienen datos clínicos: el directorio es privado (0700) y los
+    ficheros se escriben con permisos 0600.
+    """
+
+    def __init__(self, export_dir: str, max_workers: int, cache_max_bytes: int, job_ttl_seconds: float):
+        self.export_dir = private_directory(export_dir)
+        self.jobs_dir = private_directory(os.path.join(self.export_dir, "jobs"))
+        self.cache_max_bytes = cache_max_bytes
+        self.job_ttl_seconds = job_ttl_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pdf-export")
+
+        self._lock = threading.Lock()
+        # (session_id, versión) -> job_id en curso en este worker
+        self._running = {}
+
+        self.submitted = 0
+        self.cache_hits = 0
+        self.renders = 0
+        self.failures = 0
+        self.render_seconds = 0.0
+
+    # --- Ficheros ----------------------------------------------------------------------
+
+    def _pdf_path(self, session_id: str, version: str) -> str:
+        digest = hashlib.sha1(session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.export_dir, f"{digest}-{version}.pdf")
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    @staticmethod
+    def _write_atomic(path: str, write):
+        """
+        Escribe con `write(fichero)` en un fichero temporal privado y lo renombra, para
+        no servir nunca ficheros a medias
+        """
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open_private(tmp_path) as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            ExportJobs._remove(tmp_path)
+            raise
+
+    def _save_job(self, job: dict):
+        data = json.dumps(job).encode("utf-8")
+        self._write_atomic(self._job_path(job["job_id"]), lambda f: f.write(data))
+
+    @staticmethod
+    def _scan(directory: str, suffix: str):
+        """(mtime, tamaño, ruta) de los ficheros del directorio; tolera borrados concurrentes"""
+        files = []
+        if not os.path.isdir(directory):
+            return files
+        for entry in os.scandir(directory):
+            if not entry.name.endswith(suffix):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _prune(self):
+        """Borra trabajos caducados y los PDF más antiguos por encima del límite de bytes"""
+        now = time.time()
+        for mtime, _, path in self._scan(self.jobs_dir, ".json"):
+            if now - mtime > self.job_ttl_seconds:
+                self._remove(path)
+
+        pdfs = sorted(self._scan(self.export_dir, ".pdf"))
+        total = sum(size for _, size, _ in pdfs)
+        for _, size, path in pdfs:
+            if total <= self.cache_max_bytes:
+                break
+            total -= size
+            self._remove(path)
+
+    # --- Generación -------------------------------------------------------------------
+
+    def cached_path(self, session_id: str, version: str):
+        path = self._pdf_path(session_id, version)
+        return path if os.path.exists(path) else None
+
+    def _render(self, session_id: str, version: str, render) -> str:
+        started = time.perf_counter()
+        path = self._pdf_path(session_id, version)
+        self._write_atomic(path, render)
+        with self._lock:
+            self.renders += 1
+            self.render_seconds += time.perf_counter() - started
+        self._prune()
+        return path
+
+    def submit(self, session_id: str, version: str, render) -> dict:
+        """
+        Programa la generación del PDF y devuelve el trabajo.
+        Si el PDF de esta versión ya existe el trabajo nace terminado, y si ya hay uno
+        en curso para la misma versión se devuelve ese.
+
+        :param render: Callable que escribe el PDF en el fichero que recibe
+        """
+        key = (session_id, version)
+        with self._lock:
+            self.submitted += 1
+            running = self._running.get(key)
+            if running:
+                return self.status(running)
+
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "session_id": session_id,
+                "version": version,
+                "status": PENDING,
+                "cached": False,
+                "error": None,
+                "created_at": time.time(),
+                "finished_at": None,
+            }
+            if self.cached_path(session_id, version):
+                self.cache_hits += 1
+                job.update(status=DONE, cached=True, finished_at=job["created_at"])
+            else:
+                self._running[key] = job["job_id"]
+            self._save_job(job)
+
+        if job["status"] == PENDING:
+            self.executor.submit(self._run, dict(job), render)
+        return job
+
+    def _run(self, job: dict, render):
+        key = (job["session_id"], job["version"])
+        job["status"] = RUNNING
+        self._save_job(job)
+        try:
+            self._render(job["session_id"], job["version"], render)
+            job["status"] = DONE
+        except Exception as e:
+            print(f"Warning: PDF export failed: {e}")
+            job.update(status=FAILED, error=str(e))
+            with self._lock:
+                self.failures += 1
+        finally:
+            job["finished_at"] = time.time()
+            self._save_job(job)
+            with self._lock:
+                self._running.pop(key, None)
+
+    # --- Consulta ----------------------------------------------------------------------
+
+    def status(self, job_id: str):
+        """Estado de un trabajo, o None si no existe o caducó"""
+        try:
+            with open(self._job_path(job_id), "rb") as f:
+                return json.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def result_path(self, job_id: str):
+        """
+        :return: (trabajo, ruta del PDF o None si aún no está disponible)
+        """
+        job = self.status(job_id)
+        if job is None or job["status"] != DONE:
+            return job, None
+        return job, self.cached_path(job["session_id"], job["version"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "submitted": self.submitted,
+                "cache_hits": self.cache_hits,
+                "renders": self.renders,
+                "failures": self.failures,
+                "avg_render_seconds": self.render_seconds / self.renders if self.renders else 0.0,
+            }
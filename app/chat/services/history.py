@@ -0,0 +1,108 @@
+import hashlib
+
+from app.chat.models.message_log import class_name
+
+HISTORY_PARAMS = ("since", "cursor", "limit")
+
+HISTORY_HEADERS = {
+    # El cliente puede guardar la respuesta pero debe revalidarla con If-None-Match
+    'Cache-Control': 'private, no-cache',
+}
+
+
+def _non_negative_int(name: str, value) -> int:
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Parámetro '{name}' no válido: {value}")
+    if number < 0:
+        raise ValueError(f"Parámetro '{name}' no válido: {value}")
+    return number
+
+
+def parse_history_params(query_params, max_page_size: int) -> dict:
+    """
+    Valida los parámetros de paginación del historial.
+
+    :param query_params: Parámetros de la petición in query
+    :param max_page_size: Tamaño máximo de página permitido
+    :return: Dict con since, cursor y limit (None si no se indicaron)
+    """
+    since = query_params.get("since") or None
+    cursor = query_params.get("cursor")
+    limit = query_params.get("limit")
+    if since is not None and cursor is not None:
+        raise ValueError("Los parámetros 'since' y 'cursor' son excluyentes")
+
+    cursor = _non_negative_int("cursor", cursor) if cursor is not None else None
+    if limit is not None:
+        limit = _non_negative_int("limit", limit)
+        limit = min(limit, max_page_size) if limit else max_page_size
+    return {"since": since, "cursor": cursor, "limit": limit}
+
+
+def history_etag(checkpoint_id, params: dict) -> str:
+    """
+    ETag del historial: id del último checkpoint de la sesión más los parámetros de
+    paginación, ya que cada página es una representación distinta.
+    """
+    checkpoint_id = checkpoint_id or "empty"
+    query = "&".join(f"{name}={params[name]}" for name in HISTORY_PARAMS if params.get(name) is not None)
+    if not query:
+        return f'"{checkpoint_id}"'
+    return f'"{checkpoint_id}-{hashlib.sha1(query.encode("utf-8")).hexdigest()[:8]}"'
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """Comprueba una cabecera If-None-Match (admite '*', listas y etiquetas débiles)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _serialize(msg) -> dict:
+    message = {"id": msg.id, "type": class_name(msg), "content": msg.content}
+    if msg.response_metadata.get("truncated"):
+        # Respuesta parcial: el cliente se desconectó durante el stream
+        message["truncated"] = True
+    return message
+
+
+def paginate_history(messages: list, since=None, cursor=None, limit=None) -> dict:
+    """
+    Página del historial serializada.
+
+    - `since`: id de mensaje; devuelve los posteriores. Si el id ya no existe se
+      devuelve desde el principio con `reset: true`.
+    - `cursor`: posición de inicio (la `next_cursor` de la página anterior).
+    - `limit`: tamaño de página; sin él se devuelve todo desde el inicio.
+
+    :return: Dict con messages, total y next_cursor (None en la última página)
+    """
+    total = len(messages)
+    start = cursor or 0
+    reset = False
+    if since is not None:
+        # Los sondeos preguntan por mensajes recientes: se busca desde el final
+        start = None
+        for index in range(total - 1, -1, -1):
+            if messages[index].id == since:
+                start = index + 1
+                break
+        if start is None:
+            start, reset = 0, True
+
+    start = min(start, total)
+    end = total if limit is None else min(total, start + limit)
+    payload = {
+        "messages": [_serialize(msg) for msg in messages[start:end]],
+        "total": total,
+        "next_cursor": end if end < total else None,
+    }
+    if reset:
+        payload["reset"] = True
+    return payload
@@ -5,28 +5,101 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from datetime import datetime
+import hashlib
 import io
 
+class LazyStory:
+    """
+    Lista de flowables que se construye bajo demanda a partir de un iterador.
+
+    `doc.build` consume la story desde el principio (lectura, borrado e inserción en
+    las primeras posiciones), así que basta con materializar una ventana pequeña: los
+    párrafos se crean justo antes de maquetarse y se liberan al pasar a la página.
+    """
+
+    LOOKAHEAD = 8
+
+    def __init__(self, flowables):
+        self._iterator = iter(flowables)
+        self._head = []
+
+    def _fill(self, size: int):
+        while self._iterator is not None and len(self._head) < size:
+            try:
+                self._head.append(next(self._iterator))
+            except StopIteration:
+                self._iterator = None
+
+    def __len__(self):
+        # La ventana de anticipación permite agrupar los flowables con keepWithNext
+        self._fill(self.LOOKAHEAD)
+        return len(self._head)
+
+    def __getitem__(self, index):
+        self._fill((index.stop or 0) if isinstance(index, slice) else index + 1)
+        return self._head[index]
+
+    def __setitem__(self, index, value):
+        self._head[index] = value
+
+    def __delitem__(self, index):
+        self._fill((index.stop or 0) if isinstance(index, slice) else index + 1)
+        del self._head[index]
+
+    def insert(self, index, value):
+        self._head.insert(index, value)
+
+
 class PDFService:
 
-    def generate_clinical_report(self, session_id: str, messages: list, llm_config=None) -> bytes:
-        """Genera informe clínico en PDF"""
+    _styles = None
+
+    @classmethod
+    def _get_styles(cls) -> dict:
+        """Estilos del informe, creados una sola vez y compartidos entre exportaciones"""
+        if cls._styles is None:
+            styles = getSampleStyleSheet()
+            label = dict(parent=styles['Normal'], fontSize=10, fontName='Helvetica-Bold')
+            cls._styles = {
+                "title": ParagraphStyle(
+                    'CustomTitle',
+                    parent=styles['Heading1'],
+                    fontSize=18,
+                    spaceAfter=30,
+                    alignment=1,
+                    textColor=colors.darkblue
+                ),
+                "heading": styles['Heading2'],
+                "normal": styles['Normal'],
+                "human": ParagraphStyle('MessageTypeHuman', textColor=colors.darkblue, **label),
+                "ai": ParagraphStyle('MessageTypeAI', textColor=colors.darkgreen, **label),
+            }
+        return cls._styles
+
+    def generate_clinical_report(self, session_id: str, messages: list, llm_config=None, summary: str = None) -> bytes:
+        """Genera informe clínico en PDF. `summary` permite pasar un resumen ya calculado."""
         buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        styles = getSampleStyleSheet()
-        story = []
+        self.write_clinical_report(buffer, session_id, messages, llm_config, summary)
+        buffer.seek(0)
+        return buffer
+
+    def write_clinical_report(self, output, session_id: str, messages: list, llm_config=None, summary: str = None):
+        """
+        Escribe el informe clínico en `output` (ruta o fichero).
+        La story se construye de forma incremental desde los mensajes, sin tenerla entera en memoria.
+        """
+        if messages and summary is None:
+            summary = self.generate_ai_summary(messages, llm_config) if llm_config else self._generate_summary(messages)
+
+        doc = SimpleDocTemplate(output, pagesize=letter, pageCompression=1)
+        doc.build(LazyStory(self._report_flowables(session_id, messages, summary)))
+
+    def _report_flowables(self, session_id: str, messages: list, summary: str = None):
+        styles = self._get_styles()
 
         # Título
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=30,
-            alignment=1,
-            textColor=colors.darkblue
-        )
-        story.append(Paragraph("INFORME CLÍNICO PSICOLÓGICO", title_style))
-        story.append(Spacer(1, 20))
+        yield Paragraph("INFORME CLÍNICO PSICOLÓGICO", styles["title"])
+        yield Spacer(1, 20)
 
         # Datos de sesión
         session_data = [
@@ -35,44 +108,32 @@ class PDFService:
             ["Psicólogo:", "Sistema de Apoyo Clínico"],
             ["Número de intercambios:", str(len(messages))]
         ]
-        
+
         session_table = Table(session_data, colWidths=[2*inch, 3*inch])
         session_table.setStyle(self._get_table_style())
-        story.append(session_table)
-        story.append(Spacer(1, 20))
+        yield session_table
+        yield Spacer(1, 20)
 
         # Resumen ejecutivo
         if messages:
-            story.append(Paragraph("RESUMEN EJECUTIVO", styles['Heading2']))
-            summary = self.generate_ai_summary(messages, llm_config) if llm_config else self._generate_summary(messages)
-            story.append(Paragraph(summary, styles['Normal']))
-            story.append(Spacer(1, 20))
+            yield Paragraph("RESUMEN EJECUTIVO", styles["heading"])
+            yield Paragraph(summary, styles["normal"])
+            yield Spacer(1, 20)
 
         # Desarrollo de la sesión
-        story.append(Paragraph("DESARROLLO DE LA SESIÓN", styles['Heading2']))
-        story.append(Spacer(1, 12))
+        yield Paragraph("DESARROLLO DE LA SESIÓN", styles["heading"])
+        yield Spacer(1, 12)
 
         for i, msg in enumerate(messages, 1):
-            msg_type = "PSICÓLOGO" if msg.__class__.__name__ == "HumanMessage" else "ASISTENTE CLÍNICO"
-            
-            msg_style = ParagraphStyle(
-                'MessageType',
-                parent=styles['Normal'],
-                fontSize=10,
-                textColor=colors.darkblue if msg_type == "PSICÓLOGO" else colors.darkgreen,
-                fontName='Helvetica-Bold'
-            )
-            
-            story.append(Paragraph(f"{i}. {msg_type}:", msg_style))
-            story.append(Paragraph(msg.content, styles['Normal']))
-            story.append(Spacer(1, 12))
-
-        doc.build(story)
-        buffer.seek(0)
-        return buffer
+            if msg.type == "human":
+                yield Paragraph(f"{i}. PSICÓLOGO:", styles["human"])
+            else:
+                yield Paragraph(f"{i}. ASISTENTE CLÍNICO:", styles["ai"])
+            yield Paragraph(msg.content, styles["normal"])
+            yield Spacer(1, 12)
 
-    def create_download_response(self, buffer: io.BytesIO, session_id: str):
-        """Crea respuesta Flask para descarga"""
+    def create_download_response(self, buffer, session_id: str):
+        """Crea respuesta Flask para descarga (buffer en memoria o ruta del PDF)"""
         filename = f"informe_clinico_{session_id}_{datetime.now().strftime('%Y%m%d')}.pdf"
         return send_file(
             buffer,
@@ -100,31 +161,108 @@ class PDFService:
 
         return f"Sesión con {len(messages)} intercambios. Última actualización: {datetime.now().strftime('%Y-%m-%d %H:%M')}."
 
+    @staticmethod
+    def _messages_hash(messages: list) -> str:
+        digest = hashlib.sha256()
+        for msg in messages:
+            digest.update(f"{msg.type}\x1f{msg.content}\x1e".encode("utf-8"))
+        return digest.hexdigest()
+
     def generate_ai_summary(self, messages: list, llm_config) -> str:
         """Genera resumen usando IA"""
-        try:
-            if not messages:
-                return "No hay mensajes en esta sesión."
+        summary, _ = self.update_ai_summary(messages, llm_config)
+        return summary
 
-            summary_prompt = """Basándote en esta conversación clínica, genera un resumen profesional de máximo 200 palabras que incluya:
+    @staticmethod
+    def _summary_prompt(previous_summary: str, messages: list) -> str:
+        summary_prompt = """Basándote en esta conversación clínica, genera un resumen profesional de máximo 200 palabras que incluya:
             1. Principales temas tratados
             2. Síntomas o situaciones identificadas
             3. Técnicas o recomendaciones sugeridas
             4. Observaciones relevantes
+            """
+        if previous_summary:
+            summary_prompt += f"""
+            Actualiza este resumen previo integrando sólo la información nueva:
+            {previous_summary}
 
+            Nuevos mensajes:
+            """
+        else:
+            summary_prompt += """
             Conversación:
             """
 
-            for msg in messages[-10:]:
-                msg_type = "Psicólogo" if msg.__class__.__name__ == "HumanMessage" else "Asistente"
-                summary_prompt += f"\n{msg_type}: {msg.content}"
+        for msg in messages:
+            msg_type = "Psicólogo" if msg.type == "human" else "Asistente"
+            summary_prompt += f"\n{msg_type}: {msg.content}"
+        return summary_prompt
+
+    @staticmethod
+    def _invoke_summary(llm_config, summary_prompt: str, session_id: str) -> str:
+        from langchain_core.messages import HumanMessage
+        from app.core.scheduler import get_scheduler
+        from app.core.single_flight import request_key, single_flight
+        provider = llm_config.config.summary_provider
+        chat_model = llm_config.get_chat_model(provider)
+        summary_msg = HumanMessage(content=summary_prompt)
+
+        def invoke():
+            with get_scheduler(provider).slot(session_id) as ticket:
+                response = chat_model.invoke([summary_msg])
+                ticket.used_tokens = (response.usage_metadata or {}).get("total_tokens")
+            return response
+
+        # Exportaciones simultáneas de la misma sesión comparten la llamada al modelo
+        model_name = llm_config.get_model_info(provider).get("model_name")
+        response, _ = single_flight.do(request_key("pdf_summary", provider, model_name, [summary_msg], scope=session_id), invoke)
+        return response.content
+
+    def update_ai_summary(self, messages: list, llm_config, previous: dict = None, session_id: str = "pdf-summary"):
+        """
+        Genera o actualiza el resumen con IA de forma incremental.
+
+        Sin resumen previo (o si el historial resumido cambió) se resume sólo el último
+        tramo de SUMMARY_MAX_MESSAGES mensajes, con una única llamada al modelo. Con un
+        resumen previo válido, los mensajes nuevos se integran en tramos de
+        SUMMARY_MAX_MESSAGES y el registro sólo avanza sobre los tramos resumidos: si un
+        tramo falla, se conserva lo resumido hasta entonces (o el resumen previo) y el
+        resto se retoma en la siguiente exportación.
+
+        :param messages: Mensajes de la sesión
+        :param llm_config: Configuración de LLM
+        :param previous: Registro del resumen anterior ({"hash", "count", "text"})
+        :param session_id: Sesión, para el reparto del planificador del proveedor
+        :return: (texto del resumen, registro a guardar con la sesión o None si falló)
+        """
+        if not messages:
+            return "No hay mensajes en esta sesión.", None
 
-            from langchain_core.messages import HumanMessage
-            chat_model = llm_config.get_chat_model("gemini")
-            summary_msg = HumanMessage(content=summary_prompt)
-            response = chat_model.invoke([summary_msg])
+        count = len(messages)
+        if previous and previous.get("count") == count and previous.get("hash") == self._messages_hash(messages):
+            return previous["text"], previous
 
-            return response.content
+        step = max(1, llm_config.config.summary_max_messages)
+        if previous and 0 < previous.get("count", 0) < count \
+                and previous.get("hash") == self._messages_hash(messages[:previous["count"]]):
+            record = previous
+            start = previous["count"]
+        else:
+            # Primer resumen: una sola llamada con el tramo final, aunque la sesión sea larga
+            record = None
+            start = max(0, count - step)
 
-        except Exception as e:
-            return f"No se pudo generar resumen automático: {str(e)}"
+        for end in range(start + step, count + step, step):
+            end = min(end, count)
+            try:
+                text = self._invoke_summary(
+                    llm_config, self._summary_prompt(record and record["text"], messages[start:end]), session_id
+                )
+            except Exception as e:
+                if record is None:
+                    return f"No se pudo generar resumen automático: {str(e)}", None
+                print(f"Warning: Summary stopped at message {start} of {count}: {e}")
+                return record["text"], record
+            record = {"hash": self._messages_hash(messages[:end]), "count": end, "text": text}
+            start = end
+        return record["text"], record
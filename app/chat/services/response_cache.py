@@ -0,0 +1,187 @@
+import hashlib
+import random
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize_message(message: str) -> str:
+    """Normaliza un mensaje: minúsculas, sin acentos, sin puntuación y con espacios simples"""
+    text = unicodedata.normalize("NFKD", message.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+class MinHasher:
+    """
+    Firmas MinHash sobre shingles de caracteres, para detectar preguntas casi idénticas
+    sin dependencias externas.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 4, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.permutations = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+
+    def _shingles(self, text: str):
+        size = self.shingle_size
+        if len(text) <= size:
+            return {text}
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+    def signature(self, text: str) -> tuple:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+            for shingle in self._shingles(text)
+        ]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self.permutations
+        )
+
+    @staticmethod
+    def similarity(left: tuple, right: tuple) -> float:
+        return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+
+class ResponseCache:
+    """
+    Caché de respuestas para preguntas sin contexto previo.
+
+    La clave es el mensaje normalizado junto con prompt_type, proveedor y modelo.
+    Opcionalmente, una pregunta casi idéntica (similitud MinHash >= `similarity`)
+    también se sirve desde caché, buscando candidatos por bandas LSH.
+    Las entradas caducan por TTL y se expulsan por LRU al superar `max_entries`.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, near_duplicates: bool = False,
+                 similarity: float = 0.9, num_perm: int = 64, bands: int = 16):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.near_duplicates = near_duplicates
+        self.similarity = similarity
+        self.bands = bands
+        self.hasher = MinHasher(num_perm=num_perm) if near_duplicates else None
+
+        self._lock = threading.Lock()
+        # clave -> (respuesta, caduca_en, ámbito, firma)
+        self._entries = OrderedDict()
+        self._band_index = defaultdict(set)
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _key(normalized: str, scope: tuple) -> str:
+        raw = "\x1f".join((*scope, normalized))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _band_keys(self, scope: tuple, signature: tuple):
+        rows = len(signature) // self.bands
+        for band in range(self.bands):
+            yield (scope, band, signature[band * rows:(band + 1) * rows])
+
+    def _remove(self, key: str):
+        _, _, scope, signature = self._entries.pop(key)
+        if signature is not None:
+            for band_key in self._band_keys(scope, signature):
+                keys = self._band_index.get(band_key)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._band_index[band_key]
+
+    def _live_entry(self, key: str, now: float):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, message: str, prompt_type: str, provider: str, model: str):
+        """
+        Busca una respuesta en caché.
+
+        :return: Texto de la respuesta o None
+        """
+        normalized = normalize_message(message)
+        scope = (prompt_type, provider, model or "")
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live_entry(self._key(normalized, scope), now)
+            if entry is not None:
+                self.hits += 1
+                return entry[0]
+
+            if self.near_duplicates and normalized:
+                signature = self.hasher.signature(normalized)
+                candidates = set()
+                for band_key in self._band_keys(scope, signature):
+                    candidates.update(self._band_index.get(band_key, ()))
+                best, best_score = None, self.similarity
+                for candidate in candidates:
+                    candidate_entry = self._live_entry(candidate, now)
+                    if candidate_entry is None:
+                        continue
+                    score = MinHasher.similarity(signature, candidate_entry[3])
+                    if score >= best_score:
+                        best, best_score = candidate_entry, score
+                if best is not None:
+                    self.near_hits += 1
+                    return best[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, message: str, prompt_type: str, provider: str, model: str, response: str):
+        """Guarda una respuesta en caché"""
+        if not response:
+            return
+        normalized = normalize_message(message)
+        scope = (prompt_type, provider, model or "")
+        key = self._key(normalized, scope)
+        signature = self.hasher.signature(normalized) if self.near_duplicates and normalized else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (response, time.monotonic() + self.ttl_seconds, scope, signature)
+            if signature is not None:
+                for band_key in self._band_keys(scope, signature):
+                    self._band_index[band_key].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "near_duplicates": self.near_duplicates,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,147 @@
+import json
+import uuid
+import zlib
+
+from app.chat.models.message_log import MessageLog, StoredMessage
+
+GZIP_MAGIC = b"\x1f\x8b"
+CHUNK_SIZE = 64 * 1024
+# Una sesión ocupa una línea; el límite evita acumular sin fin una entrada sin saltos de línea
+MAX_LINE_BYTES = 64 * 1024 * 1024
+
+MESSAGE_TYPES = ("human", "ai", "system")
+# Campos del estado que se exportan además de los mensajes (token_counts se recalcula)
+EXPORTED_FIELDS = {
+    "provider": str,
+    "prompt_type": str,
+    "summary": str,
+    "summary_upto": int,
+    "report_summary": dict,
+}
+
+
+def session_record(session_id: str, values: dict) -> dict:
+    """Línea de exportación de una sesión a partir de los valores de su estado"""
+    messages = []
+    for msg in values.get("messages", []):
+        message = {"id": msg.id, "type": msg.type, "content": msg.content}
+        if msg.response_metadata:
+            message["response_metadata"] = dict(msg.response_metadata)
+        messages.append(message)
+    record = {"type": "session", "session_id": session_id, "messages": messages}
+    for name in EXPORTED_FIELDS:
+        if values.get(name) is not None:
+            record[name] = values[name]
+    return record
+
+
+def parse_session(record) -> tuple:
+    """
+    Valida una línea de importación.
+
+    :return: (session_id, valores para update_state)
+    :raises ValueError: Si la línea no es una sesión válida
+    """
+    if not isinstance(record, dict):
+        raise ValueError("La línea no es un objeto JSON")
+    session_id = record.get("session_id")
+    if not isinstance(session_id, str) or not session_id:
+        raise ValueError("Falta 'session_id'")
+    messages = record.get("messages")
+    if not isinstance(messages, list) or not messages:
+        raise ValueError("Falta 'messages' o está vacío")
+
+    stored = []
+    for index, message in enumerate(messages):
+        if not isinstance(message, dict) or message.get("type") not in MESSAGE_TYPES:
+            raise ValueError(f"Mensaje {index} no válido: 'type' debe ser uno de {', '.join(MESSAGE_TYPES)}")
+        if not isinstance(message.get("content"), (str, list)):
+            raise ValueError(f"Mensaje {index} no válido: falta 'content'")
+        metadata = message.get("response_metadata")
+        stored.append(StoredMessage(
+            str(message.get("id") or uuid.uuid4()),
+            message["type"],
+            message["content"],
+            metadata if isinstance(metadata, dict) else None,
+        ))
+
+    values = {"messages": MessageLog.from_messages(stored), "session_id": session_id}
+    for name, expected in EXPORTED_FIELDS.items():
+        if record.get(name) is not None:
+            if not isinstance(record[name], expected):
+                raise ValueError(f"Campo '{name}' no válido")
+            values[name] = record[name]
+    return session_id, values
+
+
+def ndjson_chunks(records, chunk_size: int = CHUNK_SIZE):
+    """Serializa los registros como NDJSON agrupando líneas en bloques de ~chunk_size bytes"""
+    buffer = bytearray()
+    for record in records:
+        buffer += json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def gzip_chunks(chunks, level: int = 6):
+    """Comprime un flujo de bloques en formato gzip sin acumularlo"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _raw_chunks(read, chunk_size: int):
+    """Bloques del cuerpo, descomprimidos si empieza por la cabecera gzip"""
+    chunk = read(chunk_size)
+    if chunk[:2] != GZIP_MAGIC:
+        while chunk:
+            yield chunk
+            chunk = read(chunk_size)
+        return
+
+    decompressor = zlib.decompressobj(31)
+    while chunk:
+        pending = chunk
+        while pending:
+            # max_length acota la memoria aunque el bloque comprimido se expanda mucho
+            data = decompressor.decompress(pending, chunk_size)
+            pending = decompressor.unconsumed_tail
+            if data:
+                yield data
+        chunk = read(chunk_size)
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def read_ndjson_lines(read, chunk_size: int = CHUNK_SIZE, max_line_bytes: int = MAX_LINE_BYTES):
+    """
+    Lee un cuerpo NDJSON (opcionalmente gzip) por bloques.
+
+    :param read: Función read(n) del flujo de entrada
+    :return: Generador de (número de línea, bytes de la línea) sin líneas vacías
+    :raises ValueError: Si una línea supera max_line_bytes
+    """
+    buffer = bytearray()
+    line_number = 0
+    for chunk in _raw_chunks(read, chunk_size):
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            line_number += 1
+            line = bytes(buffer[start:end]).strip()
+            if line:
+                yield line_number, line
+            start = end + 1
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"La línea {line_number + 1} supera {max_line_bytes} bytes")
+    line = bytes(buffer).strip()
+    if line:
+        yield line_number + 1, line
@@ -0,0 +1,203 @@
+import asyncio
+import contextvars
+import json
+import queue
+import threading
+import time
+
+from app.core.hedging import CancelScope, enter_scope, on_cancel
+
+STREAM_MODES = ("full", "delta")
+
+_END = object()
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Cache-Control'
+}
+
+
+def sse_event(payload: dict, ensure_ascii: bool = True) -> str:
+    """Serializa un evento Server-Sent Events"""
+    return f"data: {json.dumps(payload, ensure_ascii=ensure_ascii)}\n\n"
+
+
+def _close(iterator):
+    close = getattr(iterator, "close", None)
+    if close:
+        close()
+
+
+async def _aclose(iterator):
+    aclose = getattr(iterator, "aclose", None)
+    if aclose:
+        await aclose()
+
+
+def _read_deltas(deltas, items: queue.Queue, stop: threading.Event, scope: CancelScope):
+    """
+    Lee `deltas` en un hilo aparte y deja cada fragmento en `items`.
+    Al pedir parada cierra el iterador tras el fragmento en curso; las conexiones
+    que el proveedor registra con `on_cancel` quedan en `scope`, para cortarlas sin
+    esperar a ese fragmento.
+    """
+    enter_scope(scope)
+    try:
+        for delta in deltas:
+            if stop.is_set():
+                break
+            items.put((delta, None))
+        else:
+            items.put((_END, None))
+    except Exception as e:
+        items.put((_END, e))
+    finally:
+        _close(deltas)
+
+
+def coalesce_deltas(deltas, interval_seconds: float, max_chars: int):
+    """
+    Agrupa los fragmentos pequeños del modelo en ventanas de tiempo/tamaño.
+    El primer fragmento se emite inmediatamente para no retrasar el primer token, y
+    el texto en el buffer se emite como muy tarde `interval_seconds` después del
+    envío anterior aunque el modelo haga una pausa (el modelo se lee en otro hilo).
+
+    :param deltas: Iterable de fragmentos de texto; se cierra al cerrar este generador
+    :param interval_seconds: Tiempo máximo que un fragmento espera en el buffer
+    :param max_chars: Tamaño a partir del cual se emite el buffer
+    :return: Generador de fragmentos agrupados
+    """
+    items = queue.Queue()
+    stop = threading.Event()
+    scope = CancelScope()
+    # Si se cancela la petición que consume este generador, también se corta la lectura
+    on_cancel(scope.cancel)
+    threading.Thread(
+        target=contextvars.copy_context().run, args=(_read_deltas, deltas, items, stop, scope),
+        name="sse-coalesce", daemon=True,
+    ).start()
+
+    finished = False
+
+    buffer = []
+    size = 0
+    last_flush = None
+    try:
+        while True:
+            timeout = max(0.0, last_flush + interval_seconds - time.monotonic()) if buffer else None
+            try:
+                delta, error = items.get(timeout=timeout)
+            except queue.Empty:
+                delta, error = None, None
+            if delta is _END:
+                finished = True
+                if error is not None:
+                    raise error
+                break
+            if delta is not None:
+                buffer.append(delta)
+                size += len(delta)
+            now = time.monotonic()
+            if buffer and (last_flush is None or size >= max_chars or now - last_flush >= interval_seconds):
+                yield "".join(buffer)
+                buffer = []
+                size = 0
+                last_flush = now
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        # Cliente desconectado (o fin del stream): el hilo lector cierra `deltas`
+        stop.set()
+        if not finished:
+            # El lector puede estar bloqueado esperando al proveedor: se corta ya su conexión
+            scope.cancel()
+
+
+def full_frames(deltas):
+    """Protocolo original: cada evento lleva el texto acumulado completo"""
+    accumulated = ""
+    try:
+        for delta in deltas:
+            accumulated += delta
+            yield sse_event({"type": "chunk", "content": accumulated})
+    finally:
+        _close(deltas)
+
+
+def delta_frames(deltas, interval_seconds: float, max_chars: int):
+    """Protocolo delta: cada evento lleva sólo el texto nuevo desde el anterior"""
+    texts = coalesce_deltas(deltas, interval_seconds, max_chars)
+    try:
+        for text in texts:
+            yield sse_event({"type": "delta", "content": text}, ensure_ascii=False)
+    finally:
+        texts.close()
+
+
+async def _anext(deltas):
+    try:
+        return await deltas.__anext__()
+    except StopAsyncIteration:
+        return _END
+
+
+async def acoalesce_deltas(deltas, interval_seconds: float, max_chars: int):
+    """
+    Versión asíncrona de `coalesce_deltas`: el siguiente fragmento se espera en una
+    tarea, sin cancelarla cuando vence la ventana y hay que emitir el buffer.
+    """
+    buffer = []
+    size = 0
+    last_flush = None
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(_anext(deltas))
+            timeout = max(0.0, last_flush + interval_seconds - time.monotonic()) if buffer else None
+            done, _ = await asyncio.wait((pending,), timeout=timeout)
+            delta = None
+            if done:
+                delta, pending = pending.result(), None
+                if delta is _END:
+                    break
+                buffer.append(delta)
+                size += len(delta)
+            now = time.monotonic()
+            if buffer and (last_flush is None or size >= max_chars or now - last_flush >= interval_seconds):
+                yield "".join(buffer)
+                buffer = []
+                size = 0
+                last_flush = now
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if pending is not None:
+            # Cliente desconectado mientras se esperaba al modelo: se cancela la lectura
+            pending.cancel()
+            await asyncio.wait((pending,))
+        else:
+            await _aclose(deltas)
+
+
+async def afull_frames(deltas):
+    """Versión asíncrona de `full_frames`"""
+    accumulated = ""
+    try:
+        async for delta in deltas:
+            accumulated += delta
+            yield sse_event({"type": "chunk", "content": accumulated})
+    finally:
+        await _aclose(deltas)
+
+
+async def adelta_frames(deltas, interval_seconds: float, max_chars: int):
+    """Versión asíncrona de `delta_frames`"""
+    texts = acoalesce_deltas(deltas, interval_seconds, max_chars)
+    try:
+        async for text in texts:
+            yield sse_event({"type": "delta", "content": text}, ensure_ascii=False)
+    finally:
+        await texts.aclose()
@@ -1,5 +1,6 @@
 import abc
 import os
+import tempfile
 
 
 class Singleton(abc.ABCMeta, type):
@@ -38,6 +39,123 @@ class Config(metaclass=Singleton):
         # Gemini
         self.gemini_api_key = os.getenv("GEMINI_API_KEY")
         self.gemini_model = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+        # Proveedor local simulado (provider=fake) para pruebas y benchmarks sin coste
+        self.fake_provider_enabled = os.getenv("FAKE_PROVIDER_ENABLED", "false").lower() == "true"
+        self.fake_latency_ms = float(os.getenv("FAKE_LATENCY_MS", "50"))
+        self.fake_tokens_per_second = float(os.getenv("FAKE_TOKENS_PER_SECOND", "0"))
+        self.fake_response_tokens = int(os.getenv("FAKE_RESPONSE_TOKENS", "60"))
+
+        # Pool HTTP compartido por los clientes LLM
+        self.llm_http_max_connections = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+        self.llm_http_keepalive_seconds = float(os.getenv("LLM_HTTP_KEEPALIVE_SECONDS", "60"))
+
+        # Conteo local de tokens (caracteres por token para los estimadores)
+        self.openai_chars_per_token = float(os.getenv("OPENAI_CHARS_PER_TOKEN", "4.0"))
+        self.gemini_chars_per_token = float(os.getenv("GEMINI_CHARS_PER_TOKEN", "4.0"))
+
+        # Agrupación de fragmentos en el streaming SSE delta
+        self.sse_flush_interval_ms = float(os.getenv("SSE_FLUSH_INTERVAL_MS", "50"))
+        self.sse_flush_max_chars = int(os.getenv("SSE_FLUSH_MAX_CHARS", "256"))
+
+        # Caché de respuestas para preguntas sin contexto previo
+        self.response_cache_enabled = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+        self.response_cache_max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+        self.response_cache_ttl_seconds = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+        self.response_cache_near_duplicates = os.getenv("RESPONSE_CACHE_NEAR_DUPLICATES", "false").lower() == "true"
+        self.response_cache_similarity = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.9"))
+
+        # Compactación del historial: resumen acumulado de los turnos antiguos. Opcional:
+        # cada actualización del resumen es una llamada más al proveedor
+        self.compaction_enabled = os.getenv("COMPACTION_ENABLED", "false").lower() == "true"
+        self.compaction_trigger_tokens = int(os.getenv("COMPACTION_TRIGGER_TOKENS", "3000"))
+        self.compaction_keep_recent_tokens = int(os.getenv("COMPACTION_KEEP_RECENT_TOKENS", "1000"))
+        self.compaction_workers = int(os.getenv("COMPACTION_WORKERS", "2"))
+
+        # provider=auto: primario, secundario y espera del primer token antes de cubrir
+        self.auto_primary_provider = os.getenv("AUTO_PRIMARY_PROVIDER", "openai")
+        self.auto_secondary_provider = os.getenv("AUTO_SECONDARY_PROVIDER", "gemini")
+        self.hedge_delay_ms = int(os.getenv("HEDGE_DELAY_MS", "2000"))
+
+        # Planificador por proveedor: concurrencia y tokens por minuto (0 = sin límite)
+        self.scheduler_max_concurrency = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "8"))
+        self.openai_max_concurrency = int(os.getenv("OPENAI_MAX_CONCURRENCY", str(self.scheduler_max_concurrency)))
+        self.openai_tokens_per_minute = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "0"))
+        self.gemini_max_concurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", str(self.scheduler_max_concurrency)))
+        self.gemini_tokens_per_minute = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "0"))
+        self.scheduler_queue_timeout_seconds = float(os.getenv("SCHEDULER_QUEUE_TIMEOUT_SECONDS", "60"))
+        self.scheduler_completion_tokens = int(os.getenv("SCHEDULER_COMPLETION_TOKENS", "512"))
+
+        # prompt_type=auto: clasificador local del tipo de consulta (TF-IDF + regresión logística)
+        self.prompt_classifier_enabled = os.getenv("PROMPT_CLASSIFIER_ENABLED", "true").lower() == "true"
+        self.prompt_classifier_path = os.getenv("PROMPT_CLASSIFIER_PATH", "")  # vacío: ejemplos incluidos
+        self.prompt_classifier_min_confidence = float(os.getenv("PROMPT_CLASSIFIER_MIN_CONFIDENCE", "0.4"))
+        # Registro de mensajes con el prompt_type elegido por el usuario, para reentrenar (vacío = desactivado)
+        self.prompt_classifier_log_path = os.getenv("PROMPT_CLASSIFIER_LOG_PATH", "")
+
+        # Presupuesto de contexto: tokens máximos de historial por llamada según prompt_type
+        self.context_budget_tokens = int(os.getenv("CONTEXT_BUDGET_TOKENS", "4000"))
+        self.context_budget_general = int(os.getenv("CONTEXT_BUDGET_GENERAL", str(self.context_budget_tokens)))
+        self.context_budget_case_analysis = int(os.getenv("CONTEXT_BUDGET_CASE_ANALYSIS", "16000"))
+        self.context_budget_documentation = int(os.getenv("CONTEXT_BUDGET_DOCUMENTATION", "8000"))
+        self.context_budget_resources = int(os.getenv("CONTEXT_BUDGET_RESOURCES", "2000"))
+        # Parte de la ventana de contexto del modelo que puede ocupar el historial
+        self.context_window_fraction = float(os.getenv("CONTEXT_WINDOW_FRACTION", "0.5"))
+        # Ventana de contexto por proveedor (0 = según el modelo configurado)
+        self.openai_context_window = int(os.getenv("OPENAI_CONTEXT_WINDOW", "0"))
+        self.gemini_context_window = int(os.getenv("GEMINI_CONTEXT_WINDOW", "0"))
+        # Reducción del presupuesto cuando la latencia del modelo supera el SLO (0 = desactivado)
+        self.context_latency_slo_ms = float(os.getenv("CONTEXT_LATENCY_SLO_MS", "0"))
+        self.context_budget_min_tokens = int(os.getenv("CONTEXT_BUDGET_MIN_TOKENS", "1000"))
+        self.context_budget_decrease = float(os.getenv("CONTEXT_BUDGET_DECREASE", "0.8"))
+        self.context_budget_recovery = float(os.getenv("CONTEXT_BUDGET_RECOVERY", "0.05"))
+
+        # Agrupación de peticiones idénticas simultáneas al proveedor (single-flight)
+        self.single_flight_enabled = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+        # Endpoint de lotes (/chat/batch)
+        self.batch_max_items = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+        self.batch_max_workers_per_provider = int(os.getenv("BATCH_MAX_WORKERS_PER_PROVIDER", "4"))
+
+        # Exportación e importación de sesiones (/sessions/export, /sessions/import)
+        self.sessions_admin_token = os.getenv("SESSIONS_ADMIN_TOKEN", "")
+        self.sessions_import_batch_size = int(os.getenv("SESSIONS_IMPORT_BATCH_SIZE", "100"))
+
+        # Documentación Swagger en /apidocs (flasgger)
+        self.swagger_enabled = os.getenv("SWAGGER_ENABLED", "true").lower() == "true"
+
+        # Métricas de Prometheus en /metrics
+        self.metrics_enabled = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+        # Paginación de /history (tamaño máximo de página cuando se indica limit)
+        self.history_max_page_size = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "200"))
+
+        # Persistencia de sesiones: "memory" (por proceso) o "sqlite" (compartida entre workers)
+        self.checkpointer = os.getenv("CHECKPOINTER", "memory")
+        self.checkpoint_db_path = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.sqlite3")
+        # Escrituras por commit dentro de un lote (importación de sesiones)
+        self.checkpoint_batch_size = int(os.getenv("CHECKPOINT_BATCH_SIZE", "64"))
+
+        # Memoria acotada de sesiones (CHECKPOINTER=tiered)
+        self.session_max_bytes = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+        self.session_max_in_memory = int(os.getenv("SESSION_MAX_IN_MEMORY", "5000"))
+        self.session_ttl_seconds = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+        # Vacío: directorio temporal privado (0700) creado al arrancar
+        self.session_spill_dir = os.getenv("SESSION_SPILL_DIR", "")
+        self.session_spill_compress_level = int(os.getenv("SESSION_SPILL_COMPRESS_LEVEL", "6"))
+
+        # Resumen con IA del informe PDF
+        self.summary_provider = os.getenv("SUMMARY_PROVIDER", "gemini")
+        self.summary_max_messages = int(os.getenv("SUMMARY_MAX_MESSAGES", "40"))
+
+        # Exportación a PDF en segundo plano y caché de PDF generados
+        # Directorio privado (0700) del usuario del proceso, compartido por sus workers
+        self.export_dir = os.getenv("EXPORT_DIR") or os.path.join(
+            tempfile.gettempdir(), f"chatbot-exports-{os.geteuid()}"
+        )
+        self.export_workers = int(os.getenv("EXPORT_WORKERS", "2"))
+        self.export_cache_max_bytes = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        self.export_job_ttl_seconds = float(os.getenv("EXPORT_JOB_TTL_SECONDS", "3600"))
         
 
 config = Config()
\ No newline at end of file
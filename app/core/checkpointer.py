@@ -0,0 +1,498 @@
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Any, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from ..config.config import config
+from .private_dir import private_file
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_thread ON checkpoints (thread_id, checkpoint_ns, checkpoint_id DESC);
+CREATE INDEX IF NOT EXISTS idx_blobs_thread ON blobs (thread_id);
+CREATE INDEX IF NOT EXISTS idx_writes_thread ON writes (thread_id, checkpoint_ns, checkpoint_id);
+"""
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    Checkpointer de LangGraph sobre SQLite en modo WAL.
+
+    Es seguro entre procesos (varios workers de gunicorn comparten el mismo
+    fichero) y sobrevive a reinicios. Cada escritura se confirma al terminar, para
+    no retener el bloqueo de escritura de SQLite entre llamadas (un nodo que falla
+    no deja una transacción abierta que bloquee a los demás workers). Dentro de
+    `batch()` los commits se agrupan cada `batch_size` escrituras.
+    """
+
+    def __init__(self, path: str, *, batch_size: int = 64, busy_timeout_ms: int = 5000, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.batch_size = batch_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self._lock = threading.RLock()
+        self._conn = None
+        self._pid = None
+        self._pending_writes = 0
+        self._batch_depth = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Cada proceso (worker tras el fork) abre su propia conexión
+        if self._conn is None or self._pid != os.getpid():
+            # Contiene el historial completo de las conversaciones: sólo para el usuario del proceso
+            for path in (self.path, f"{self.path}-wal", f"{self.path}-shm"):
+                if path == self.path or os.path.exists(path):
+                    private_file(path)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._pid = os.getpid()
+            self._pending_writes = 0
+        return self._conn
+
+    def _begin(self, conn: sqlite3.Connection):
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+
+    @contextmanager
+    def _write(self):
+        """
+        Transacción de una escritura: se confirma al salir del bloque y se deshace si falla.
+        Dentro de `batch()` un fallo sólo deshace esta escritura (savepoint) y el commit
+        se aplaza hasta acumular `batch_size` escrituras o terminar el lote.
+        """
+        with self._lock:
+            conn = self._connection()
+            self._begin(conn)
+            batching = self._batch_depth > 0
+            if batching:
+                conn.execute("SAVEPOINT checkpoint_write")
+            try:
+                yield conn
+            except BaseException:
+                if conn.in_transaction:
+                    if batching:
+                        conn.execute("ROLLBACK TO checkpoint_write")
+                        conn.execute("RELEASE checkpoint_write")
+                    else:
+                        conn.execute("ROLLBACK")
+                raise
+            if batching:
+                conn.execute("RELEASE checkpoint_write")
+                self._pending_writes += 1
+                if self._pending_writes >= self.batch_size:
+                    self.flush()
+            else:
+                conn.execute("COMMIT")
+
+    @contextmanager
+    def batch(self):
+        """
+        Agrupa en transacciones de `batch_size` escrituras los checkpoints escritos
+        dentro del bloque (importación masiva de sesiones). Lo pendiente se confirma
+        al salir del bloque.
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self.flush()
+
+    def flush(self):
+        """Confirma las escrituras pendientes de la transacción en curso"""
+        with self._lock:
+            conn = self._connection()
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+            self._pending_writes = 0
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", "path": self.path, "batch_size": self.batch_size}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self.flush()
+                self._conn.close()
+            self._conn = None
+
+    def _load_blobs(self, conn, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> dict:
+        if not versions:
+            return {}
+        pairs = [value for channel, version in versions.items() for value in (channel, str(version))]
+        rows = conn.execute(
+            "SELECT channel, version, type, blob FROM blobs "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND (channel, version) IN (VALUES %s)"
+            % ",".join("(?, ?)" for _ in versions),
+            (thread_id, checkpoint_ns, *pairs),
+        ).fetchall()
+        values = {}
+        for channel, version, type_, blob in rows:
+            if type_ == "empty":
+                continue
+            values[channel] = self.serde.loads_typed((type_, blob))
+        return values
+
+    def _load_writes(self, conn, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> list:
+        rows = conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [(task_id, channel, self.serde.loads_typed((type_, value))) for task_id, channel, type_, value in rows]
+
+    def _to_tuple(self, conn, row) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint_b, metadata_type, metadata_b = row
+        checkpoint = self.serde.loads_typed((type_, checkpoint_b))
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_blobs(
+                    conn, thread_id, checkpoint_ns, checkpoint["channel_versions"]
+                ),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata_b)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=self._load_writes(conn, thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = (
+            "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata"
+        )
+        with self._lock:
+            conn = self._connection()
+            if checkpoint_id := get_checkpoint_id(config):
+                row = conn.execute(
+                    f"SELECT {columns} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            return self._to_tuple(conn, row)
+
+    def latest_checkpoint_id(self, thread_id: str, checkpoint_ns: str = "") -> Optional[str]:
+        """Id del último checkpoint de la sesión sin cargar su estado"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            ).fetchone()
+        return row[0] if row else None
+
+    def list_threads(self, page_size: int = 500) -> Iterator[str]:
+        """
+        Ids de todas las sesiones guardadas, por páginas ordenadas por thread_id.
+        El lock se libera entre páginas para no bloquear al resto de peticiones.
+        """
+        last = ""
+        while True:
+            with self._lock:
+                rows = self._connection().execute(
+                    "SELECT DISTINCT thread_id FROM checkpoints WHERE thread_id > ? ORDER BY thread_id LIMIT ?",
+                    (last, page_size),
+                ).fetchall()
+            for (thread_id,) in rows:
+                yield thread_id
+            if len(rows) < page_size:
+                return
+            last = rows[-1][0]
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata FROM checkpoints"
+        )
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(query, params).fetchall()
+            results = []
+            for row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                if filter:
+                    metadata = self.serde.loads_typed((row[6], row[7]))
+                    if not all(metadata.get(key) == value for key, value in filter.items()):
+                        continue
+                results.append(self._to_tuple(conn, row))
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        c = checkpoint.copy()
+        values: dict = c.pop("channel_values")
+        blob_rows = []
+        for channel, version in new_versions.items():
+            type_, blob = self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")
+            blob_rows.append((thread_id, checkpoint_ns, channel, str(version), type_, blob))
+        type_, checkpoint_b = self.serde.dumps_typed(c)
+        metadata_type, metadata_b = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self._write() as conn:
+            conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blob_rows)
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id, checkpoint_ns, checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_, checkpoint_b, metadata_type, metadata_b,
+                ),
+            )
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        replace_rows, insert_rows = [], []
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self.serde.dumps_typed(value)
+            row = (
+                thread_id, checkpoint_ns, checkpoint_id, task_id,
+                WRITES_IDX_MAP.get(channel, idx), channel, type_, blob, task_path,
+            )
+            # Las escrituras especiales (índice negativo) se reemplazan; las normales no se duplican
+            (replace_rows if channel in WRITES_IDX_MAP else insert_rows).append(row)
+
+        with self._write() as conn:
+            conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", replace_rows)
+            conn.executemany("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", insert_rows)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._write() as conn:
+            for table in ("checkpoints", "blobs", "writes"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    # Versiones asíncronas (modo ASGI): SQLite bloquea, así que se ejecutan en un hilo
+    # para no parar el event loop mientras se espera el lock o el disco
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = "") -> None:
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+def latest_checkpoint_id(checkpointer: BaseCheckpointSaver, thread_id: str, checkpoint_ns: str = "") -> Optional[str]:
+    """
+    Id del último checkpoint de una sesión, sin deserializar el estado cuando el
+    backend lo permite (sirve para validar ETags de forma barata).
+
+    :return: Id del checkpoint o None si la sesión no existe
+    """
+    if hasattr(checkpointer, "latest_checkpoint_id"):
+        return checkpointer.latest_checkpoint_id(thread_id, checkpoint_ns)
+    from langgraph.checkpoint.memory import InMemorySaver
+    if isinstance(checkpointer, InMemorySaver):
+        checkpoints = checkpointer.storage.get(thread_id, {}).get(checkpoint_ns)
+        return max(checkpoints) if checkpoints else None
+    saved = checkpointer.get_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}})
+    return saved.config["configurable"]["checkpoint_id"] if saved else None
+
+
+def list_threads(checkpointer: BaseCheckpointSaver) -> Iterator[str]:
+    """Ids de todas las sesiones del checkpointer (para exportarlas)"""
+    if hasattr(checkpointer, "list_threads"):
+        return checkpointer.list_threads()
+    from langgraph.checkpoint.memory import InMemorySaver
+    if isinstance(checkpointer, InMemorySaver):
+        return iter([thread_id for thread_id, namespaces in list(checkpointer.storage.items()) if namespaces])
+    return iter(dict.fromkeys(item.config["configurable"]["thread_id"] for item in checkpointer.list(None)))
+
+
+def bulk_reads(checkpointer: BaseCheckpointSaver):
+    """Contexto para leer muchas sesiones seguidas sin alterar las cachés del backend"""
+    return checkpointer.bulk_reads() if hasattr(checkpointer, "bulk_reads") else nullcontext()
+
+
+def batch_writes(checkpointer: BaseCheckpointSaver):
+    """Contexto que agrupa las escrituras del bloque cuando el backend lo permite"""
+    return checkpointer.batch() if hasattr(checkpointer, "batch") else nullcontext()
+
+
+def checkpoint_serde(allowed_types: Sequence[type]):
+    """
+    Serializador que sólo deserializa los tipos seguros de LangGraph más `allowed_types`.
+    Sin lista explícita LangGraph acepta cualquier tipo, avisando en cada proceso.
+    """
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+    return JsonPlusSerializer(allowed_msgpack_modules=[(cls.__module__, cls.__name__) for cls in allowed_types])
+
+
+def create_checkpointer(backend: str = None, allowed_types: Sequence[type] = ()):
+    """
+    Crea el checkpointer configurado para el grafo de chat.
+
+    :param backend: "memory", "tiered" o "sqlite" (por defecto, CHECKPOINTER)
+    :param allowed_types: Tipos propios que se guardan en el estado (p. ej. MessageLog)
+    :return: Instancia de BaseCheckpointSaver
+    """
+    backend = (backend or config.checkpointer).lower()
+    serde = checkpoint_serde(allowed_types)
+    if backend == "memory":
+        from langgraph.checkpoint.memory import MemorySaver
+        return MemorySaver(serde=serde)
+    if backend == "tiered":
+        from .session_store import TieredMemorySaver
+        return TieredMemorySaver(
+            config.session_spill_dir,
+            max_bytes=config.session_max_bytes,
+            max_sessions=config.session_max_in_memory,
+            ttl_seconds=config.session_ttl_seconds,
+            compress_level=config.session_spill_compress_level,
+            serde=serde,
+        )
+    if backend == "sqlite":
+        return SQLiteCheckpointSaver(
+            config.checkpoint_db_path, batch_size=config.checkpoint_batch_size, serde=serde
+        )
+    raise ValueError(f"Checkpointer no soportado: {backend}")
@@ -0,0 +1,102 @@
+import threading
+
+from ..config.config import config
+from .metrics import registry
+
+
+class ContextBudget:
+    """
+    Presupuesto de tokens de historial por llamada al modelo.
+
+    El límite es el menor entre el presupuesto del prompt_type
+    (CONTEXT_BUDGET_<PROMPT_TYPE>, o CONTEXT_BUDGET_TOKENS si no tiene uno propio)
+    y la parte de la ventana de contexto del modelo reservada al historial.
+
+    Con CONTEXT_LATENCY_SLO_MS, cada proveedor tiene un factor que reduce el
+    presupuesto: mientras la latencia media de sus llamadas supera el SLO se
+    multiplica por CONTEXT_BUDGET_DECREASE, y cuando vuelve a cumplirse se
+    recupera poco a poco (CONTEXT_BUDGET_RECOVERY por llamada) hasta 1.
+    """
+
+    # Peso de la última llamada en la latencia media (media móvil exponencial)
+    SMOOTHING = 0.2
+    # Factor mínimo, para que el presupuesto pueda recuperarse en un número razonable de llamadas
+    MIN_FACTOR = 0.1
+
+    def __init__(self, settings=config):
+        self.settings = settings
+        self._lock = threading.Lock()
+        # proveedor -> {"factor", "latency", "shrunk"}
+        self._providers = {}
+
+    def base_limit(self, prompt_type: str, context_window: int = None) -> int:
+        """Presupuesto sin ajuste por latencia"""
+        settings = self.settings
+        budget = getattr(settings, f"context_budget_{prompt_type}", settings.context_budget_tokens)
+        if context_window:
+            available = int(context_window * settings.context_window_fraction) - settings.scheduler_completion_tokens
+            budget = min(budget, max(available, 0))
+        return budget
+
+    def limit(self, provider: str, prompt_type: str, context_window: int = None) -> int:
+        """
+        Tokens máximos de historial para una llamada.
+
+        :param provider: Proveedor cuyo contador de tokens recorta el historial
+        :param prompt_type: Tipo de consulta
+        :param context_window: Ventana de contexto del modelo (None si se desconoce)
+        """
+        budget = self.base_limit(prompt_type, context_window)
+        with self._lock:
+            state = self._providers.get(provider)
+            factor = state["factor"] if state else 1.0
+            if factor < 1.0:
+                state["shrunk"] += 1
+        if factor >= 1.0:
+            return budget
+        return max(min(budget, self.settings.context_budget_min_tokens), int(budget * factor))
+
+    def observe_latency(self, provider: str, seconds: float):
+        """Registra la latencia de una llamada al modelo y ajusta el factor del proveedor"""
+        settings = self.settings
+        if not settings.context_latency_slo_ms:
+            return
+        with self._lock:
+            state = self._providers.setdefault(provider, {"factor": 1.0, "latency": None, "shrunk": 0})
+            latency = state["latency"]
+            latency = seconds if latency is None else latency + self.SMOOTHING * (seconds - latency)
+            state["latency"] = latency
+            if latency * 1000 > settings.context_latency_slo_ms:
+                state["factor"] = max(self.MIN_FACTOR, state["factor"] * settings.context_budget_decrease)
+            else:
+                state["factor"] = min(1.0, state["factor"] + settings.context_budget_recovery)
+
+    def stats(self) -> dict:
+        with self._lock:
+            providers = {
+                provider: {
+                    "factor": round(state["factor"], 3),
+                    "latency_ms": round(state["latency"] * 1000, 1) if state["latency"] is not None else None,
+                    "shrunk_requests": state["shrunk"],
+                }
+                for provider, state in self._providers.items()
+            }
+        return {
+            "slo_ms": self.settings.context_latency_slo_ms,
+            "window_fraction": self.settings.context_window_fraction,
+            "providers": providers,
+        }
+
+
+context_budget = ContextBudget()
+
+
+def _budget_gauges():
+    providers = context_budget.stats()["providers"]
+    return [
+        ("chatbot_context_budget_factor", "Factor de reducción del presupuesto de contexto por latencia",
+         ("provider",), [((provider,), values["factor"]) for provider, values in providers.items()]),
+    ]
+
+
+registry.add_collector(_budget_gauges)
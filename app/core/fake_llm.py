@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_WORDS = (
+    "la", "terapia", "cognitiva", "ayuda", "a", "identificar", "pensamientos", "automáticos", "y",
+    "reestructurarlos", "con", "registros", "semanales", "el", "paciente", "practica", "respiración",
+    "diafragmática", "antes", "de", "dormir", "se", "revisan", "los", "avances", "en", "sesión",
+)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Modelo de chat local para pruebas y benchmarks (provider=fake).
+
+    La respuesta es determinista (depende sólo del último mensaje), tarda
+    `latency_ms` hasta el primer token y después emite `tokens_per_second`
+    palabras por segundo (0 = sin espera). Informa `usage_metadata` como los
+    proveedores reales, estimando la entrada a ~4 caracteres por token.
+    """
+
+    latency_ms: float = 50.0
+    tokens_per_second: float = 0.0
+    response_tokens: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        seed = hashlib.sha1(str(messages[-1].content if messages else "").encode("utf-8")).digest()
+        offset = int.from_bytes(seed[:4], "little")
+        return [
+            ("" if index == 0 else " ") + _WORDS[(offset + index * 7) % len(_WORDS)]
+            for index in range(self.response_tokens)
+        ]
+
+    def _usage(self, messages: List[BaseMessage], output_tokens: int) -> dict:
+        input_tokens = max(1, sum(len(str(msg.content)) for msg in messages) // 4)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _result(self, messages: List[BaseMessage], tokens: List[str]) -> ChatResult:
+        message = AIMessage(content="".join(tokens), usage_metadata=self._usage(messages, len(tokens)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(self.latency_ms / 1000 + self._token_delay() * len(tokens))
+        return self._result(messages, tokens)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.latency_ms / 1000 + self._token_delay() * len(tokens))
+        return self._result(messages, tokens)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        tokens = self._tokens(messages)
+        delay = self._token_delay()
+        time.sleep(self.latency_ms / 1000)
+        for index, token in enumerate(tokens):
+            if index and delay:
+                time.sleep(delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, len(tokens))))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self._tokens(messages)
+        delay = self._token_delay()
+        await asyncio.sleep(self.latency_ms / 1000)
+        for index, token in enumerate(tokens):
+            if index and delay:
+                await asyncio.sleep(delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, len(tokens))))
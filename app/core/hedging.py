@@ -0,0 +1,313 @@
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+from collections import deque
+
+AUTO_PROVIDER = "auto"
+
+_DONE = object()
+
+
+def _has_content(chunk) -> bool:
+    return bool(getattr(chunk, "content", None))
+
+
+class HedgeStats:
+    """Contadores del modo provider=auto en este worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.failovers = 0
+        self.errors = 0
+        self.wins = {}
+        self._first_token = {}
+
+    def record(self, info: dict):
+        with self._lock:
+            self.requests += 1
+            self.hedged += bool(info.get("hedged"))
+            self.failovers += bool(info.get("failover"))
+            provider = info.get("provider")
+            if provider is None:
+                self.errors += 1
+                return
+            self.wins[provider] = self.wins.get(provider, 0) + 1
+            if info.get("first_token_ms") is not None:
+                self._first_token.setdefault(provider, deque(maxlen=1024)).append(info["first_token_ms"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            first_token = {}
+            for provider, values in self._first_token.items():
+                ordered = sorted(values)
+                first_token[provider] = {
+                    "p50": ordered[len(ordered) // 2],
+                    "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+                }
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+                "failovers": self.failovers,
+                "errors": self.errors,
+                "wins": dict(self.wins),
+                "first_token_ms": first_token,
+            }
+
+
+hedge_stats = HedgeStats()
+
+
+class CancelScope:
+    """
+    Cancelación de una petición desde otro hilo. Además de marcar la petición como
+    cancelada, ejecuta las acciones registradas con `on_cancel` (p. ej. cortar la
+    conexión HTTP), de modo que una lectura bloqueada termina sin esperar al
+    siguiente fragmento.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.cancelled = False
+
+    def add(self, callback):
+        """Registra una acción; si ya está cancelado, se ejecuta en el momento"""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        _run(callback)
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            _run(callback)
+
+
+def _run(callback):
+    try:
+        callback()
+    except Exception as e:
+        print(f"Warning: Cancel callback failed: {e}")
+
+
+_cancel_scope = contextvars.ContextVar("hedge_cancel_scope", default=None)
+
+
+def current_scope():
+    """Ámbito de cancelación de la petición en curso en este hilo, o None"""
+    return _cancel_scope.get()
+
+
+def enter_scope(scope):
+    """Activa `scope` en el contexto actual; devuelve el token para `exit_scope`"""
+    return _cancel_scope.set(scope)
+
+
+def exit_scope(token):
+    _cancel_scope.reset(token)
+
+
+def on_cancel(callback):
+    """
+    Registra una acción a ejecutar si se cancela la petición en curso (p. ej. el
+    perdedor de una carrera). Sin ámbito de cancelación no hace nada.
+    """
+    scope = _cancel_scope.get()
+    if scope is not None:
+        scope.add(callback)
+
+
+def cancelled() -> bool:
+    """True si la petición en curso ya se ha cancelado"""
+    scope = _cancel_scope.get()
+    return scope is not None and scope.cancelled
+
+
+class _Race:
+    """
+    Estado compartido de una carrera entre proveedores: decide el ganador con el
+    primer fragmento con contenido (o la primera respuesta completa) y rellena `info`.
+    """
+
+    def __init__(self, providers: tuple, hedge_delay: float, info: dict):
+        self.primary, self.secondary = providers
+        self.hedge_delay = hedge_delay
+        self.info = info
+        self.started_at = time.monotonic()
+        self.started = []
+        self.failed = {}
+        self.buffers = {}
+        self.winner = None
+        info.update({"provider": None, "hedged": False, "failover": False, "first_token_ms": None})
+
+    def hedge_timeout(self):
+        """Segundos hasta lanzar la petición de cobertura, o None si ya se lanzó"""
+        if len(self.started) > 1:
+            return None
+        return max(0.0, self.hedge_delay - (time.monotonic() - self.started_at))
+
+    def on_error(self, provider: str, error: Exception) -> bool:
+        """Registra el fallo de un proveedor; devuelve True si hay que pasar al secundario"""
+        self.failed[provider] = error
+        if self.secondary not in self.started:
+            self.info["failover"] = True
+            return True
+        if len(self.failed) == len(self.started):
+            raise error
+        return False
+
+    def on_item(self, provider: str, chunk) -> bool:
+        """Acumula un fragmento; devuelve True si el proveedor acaba de ganar"""
+        if chunk is not _DONE:
+            self.buffers.setdefault(provider, []).append(chunk)
+        if chunk is _DONE or _has_content(chunk):
+            self.winner = provider
+            self.info["provider"] = provider
+            self.info["first_token_ms"] = round((time.monotonic() - self.started_at) * 1000, 1)
+            return True
+        return False
+
+
+def _pump(stream_factory, provider: str, out: queue.Queue, cancel: CancelScope):
+    enter_scope(cancel)
+    try:
+        stream = stream_factory(provider)
+        try:
+            for chunk in stream:
+                if cancel.cancelled:
+                    return
+                out.put((provider, chunk, None))
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+        out.put((provider, _DONE, None))
+    except Exception as e:
+        out.put((provider, None, e))
+
+
+def hedged_stream(stream_factory, providers: tuple, hedge_delay: float, info: dict):
+    """
+    Stream con cobertura entre dos proveedores.
+
+    Empieza con el primario; si no llega el primer token en `hedge_delay` segundos
+    (o el primario falla), lanza la misma petición en el secundario y se queda con el
+    que responda antes. El perdedor se cancela desde el hilo del ganador: se cortan
+    sus conexiones registradas con `on_cancel` y se cierra su stream.
+
+    :param stream_factory: Callable(provider) que devuelve un iterador de fragmentos
+    :param providers: (primario, secundario)
+    :param hedge_delay: Segundos de espera del primer token antes de cubrir
+    :param info: Dict donde se deja el proveedor ganador y si hubo cobertura o failover
+    :return: Generador de fragmentos del proveedor ganador
+    """
+    race = _Race(providers, hedge_delay, info)
+    out = queue.Queue()
+    cancels = {}
+
+    def start(provider):
+        race.started.append(provider)
+        cancels[provider] = CancelScope()
+        threading.Thread(
+            target=_pump, args=(stream_factory, provider, out, cancels[provider]),
+            name=f"hedge-{provider}", daemon=True,
+        ).start()
+
+    try:
+        start(race.primary)
+        while race.winner is None:
+            try:
+                provider, chunk, error = out.get(timeout=race.hedge_timeout())
+            except queue.Empty:
+                info["hedged"] = True
+                start(race.secondary)
+                continue
+            if error is not None:
+                if race.on_error(provider, error):
+                    start(race.secondary)
+            else:
+                race.on_item(provider, chunk)
+
+        for provider, scope in cancels.items():
+            if provider != race.winner:
+                scope.cancel()
+        yield from race.buffers.get(race.winner, [])
+
+        while True:
+            provider, chunk, error = out.get()
+            if provider != race.winner:
+                continue
+            if error is not None:
+                raise error
+            if chunk is _DONE:
+                break
+            yield chunk
+    finally:
+        for scope in cancels.values():
+            scope.cancel()
+        hedge_stats.record(info)
+
+
+async def _apump(stream_factory, provider: str, out: asyncio.Queue):
+    try:
+        async for chunk in stream_factory(provider):
+            out.put_nowait((provider, chunk, None))
+        out.put_nowait((provider, _DONE, None))
+    except Exception as e:
+        out.put_nowait((provider, None, e))
+
+
+async def ahedged_stream(stream_factory, providers: tuple, hedge_delay: float, info: dict):
+    """Versión asíncrona de `hedged_stream`; el perdedor se cancela como tarea"""
+    race = _Race(providers, hedge_delay, info)
+    out = asyncio.Queue()
+    tasks = {}
+
+    def start(provider):
+        race.started.append(provider)
+        tasks[provider] = asyncio.create_task(_apump(stream_factory, provider, out))
+
+    try:
+        start(race.primary)
+        while race.winner is None:
+            try:
+                provider, chunk, error = await asyncio.wait_for(out.get(), race.hedge_timeout())
+            except asyncio.TimeoutError:
+                info["hedged"] = True
+                start(race.secondary)
+                continue
+            if error is not None:
+                if race.on_error(provider, error):
+                    start(race.secondary)
+            else:
+                race.on_item(provider, chunk)
+
+        for provider, task in tasks.items():
+            if provider != race.winner:
+                task.cancel()
+        for chunk in race.buffers.get(race.winner, []):
+            yield chunk
+
+        while True:
+            provider, chunk, error = await out.get()
+            if provider != race.winner:
+                continue
+            if error is not None:
+                raise error
+            if chunk is _DONE:
+                break
+            yield chunk
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        hedge_stats.record(info)
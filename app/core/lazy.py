@@ -0,0 +1,41 @@
+import threading
+
+
+class LazyInstance:
+    """
+    Objeto que se construye en su primer uso.
+
+    Permite declarar singletons a nivel de módulo (como `chat_services`) sin
+    importar sus dependencias pesadas al arrancar: la fábrica se ejecuta una
+    sola vez, en el primer acceso a un atributo, y después todos los accesos
+    se delegan en la instancia creada.
+    """
+
+    def __init__(self, factory):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def get(self):
+        """Devuelve la instancia, construyéndola si aún no existe"""
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    instance = self._factory()
+                    object.__setattr__(self, "_instance", instance)
+        return instance
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self.get(), name)
@@ -1,17 +1,162 @@
+import os
+import socket
+import threading
+import hashlib
+import importlib
 from ..config.config import config
+from .hedging import AUTO_PROVIDER, on_cancel
+from .metrics import register_label_values
 from langchain_core.messages import HumanMessage
 
+# Ventana de contexto (tokens) por prefijo del nombre del modelo; gana el prefijo más largo
+CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-5": 400000,
+    "o1": 200000,
+    "o3": 200000,
+    "o4-mini": 200000,
+    "gemini-1.5-flash": 1048576,
+    "gemini-1.5-pro": 2097152,
+    "gemini-2.0": 1048576,
+    "gemini-2.5": 1048576,
+    "fake-chat": 8192,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Proveedores con cliente en `get_chat_model` ("fake" sólo con FAKE_PROVIDER_ENABLED)
+PROVIDERS = ("openai", "gemini", "fake")
+
+register_label_values("provider", *PROVIDERS, AUTO_PROVIDER)
+
+
+def context_window(model_name: str) -> int:
+    """Ventana de contexto conocida del modelo (DEFAULT_CONTEXT_WINDOW si no está en la tabla)"""
+    matches = [prefix for prefix in CONTEXT_WINDOWS if (model_name or "").startswith(prefix)]
+    return CONTEXT_WINDOWS[max(matches, key=len)] if matches else DEFAULT_CONTEXT_WINDOW
+
+
+class ChatModelRegistry:
+    """
+    Registro de clientes de chat compartidos a nivel de proceso.
+
+    Los clientes se indexan por (proveedor, modelo, temperatura) y se reutilizan
+    entre peticiones, de modo que el pool de conexiones HTTP y el keep-alive se
+    conservan. Si cambia la configuración (API key, modelo, etc.) el cliente se
+    reconstruye. Tras un fork (workers de gunicorn) el registro se vacía, ya que
+    los pools HTTP no deben compartirse entre procesos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._pid = os.getpid()
+        self.hits = 0
+        self.misses = 0
+        self.creations = 0
+
+    def _reset_after_fork(self):
+        if self._pid != os.getpid():
+            self._clients = {}
+            self._pid = os.getpid()
+            self.hits = self.misses = self.creations = 0
+
+    def get_or_create(self, key: tuple, fingerprint: str, factory):
+        """
+        Devuelve el cliente registrado para `key` o lo crea con `factory`.
+
+        :param key: Clave (proveedor, modelo, temperatura)
+        :param fingerprint: Huella de la configuración usada para construir el cliente
+        :param factory: Callable que construye un cliente nuevo
+        :return: Cliente de chat compartido
+        """
+        with self._lock:
+            self._reset_after_fork()
+            entry = self._clients.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            client = factory()
+            self.creations += 1
+            self._clients[key] = (fingerprint, client)
+            return client
+
+    def clear(self):
+        with self._lock:
+            self._clients = {}
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._reset_after_fork()
+            return {
+                "pid": self._pid,
+                "hits": self.hits,
+                "misses": self.misses,
+                "creations": self.creations,
+                "clients": [
+                    {"provider": key[0], "model": key[1], "temperature": key[2]}
+                    for key in self._clients
+                ],
+            }
+
+
+chat_model_registry = ChatModelRegistry()
+
+
+def _shutdown_response(response):
+    """
+    Corta la conexión de una respuesta en curso. Cerrar la respuesta no desbloquea
+    una lectura pendiente en otro hilo; cerrar el socket sí (la lectura falla).
+    """
+    if response.is_closed:
+        return
+    stream = response.extensions.get("network_stream")
+    sock = stream.get_extra_info("socket") if stream is not None else None
+    if sock is not None:
+        sock.shutdown(socket.SHUT_RDWR)
+
+
+def _abort_on_cancel(response):
+    """Hook de httpx: si se cancela la petición (p. ej. pierde la carrera), se corta su conexión"""
+    on_cancel(lambda: _shutdown_response(response))
+
 
 class LLMConfig:
     def __init__(self):
         self.config = config
+        self.registry = chat_model_registry
+
+    # Módulos de los proveedores; se importan al crear el primer cliente
+    PROVIDER_MODULES = ("httpx", "langchain_openai", "langchain_google_genai")
+
+    def import_providers(self):
+        """Importa los módulos de los proveedores sin crear clientes (precarga antes del fork)"""
+        for module in self.PROVIDER_MODULES:
+            try:
+                importlib.import_module(module)
+            except ImportError as e:
+                print(f"Warning: Could not preload {module}: {e}")
 
     def _init_openai(self):
+        import httpx
         from langchain_openai import ChatOpenAI
+        limits = httpx.Limits(
+            max_connections=self.config.llm_http_max_connections,
+            max_keepalive_connections=self.config.llm_http_max_connections,
+            keepalive_expiry=self.config.llm_http_keepalive_seconds,
+        )
         return ChatOpenAI(
             api_key=self.config.openai_api_key,
             model=self.config.openai_model,
             temperature=self.config.temperature,
+            http_client=httpx.Client(limits=limits, event_hooks={"response": [_abort_on_cancel]}),
+            http_async_client=httpx.AsyncClient(limits=limits),
+            stream_usage=True,
         )
 
     def _init_gemini(self):
@@ -22,14 +167,59 @@ class LLMConfig:
             temperature=self.config.temperature,
         )
 
+    def _init_fake(self):
+        from .fake_llm import FakeChatModel
+        return FakeChatModel(
+            latency_ms=self.config.fake_latency_ms,
+            tokens_per_second=self.config.fake_tokens_per_second,
+            response_tokens=self.config.fake_response_tokens,
+        )
+
+    def _fingerprint(self, *values) -> str:
+        raw = "|".join(str(value) for value in values)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def available_providers(self) -> tuple:
+        """Proveedores que se pueden usar con la configuración actual"""
+        return tuple(name for name in PROVIDERS if name != "fake" or self.config.fake_provider_enabled)
+
+    def validate_provider(self, provider: str, allow_auto: bool = False):
+        """Lanza ValueError si el proveedor no existe (o no está habilitado)"""
+        if allow_auto and provider == AUTO_PROVIDER:
+            return
+        if provider not in self.available_providers():
+            raise ValueError(f"Proveedor no soportado: {provider}")
+
     def get_chat_model(self, provider: str):
         models = {
-            "openai": self._init_openai,
-            "gemini": self._init_gemini
+            "openai": (
+                self._init_openai,
+                self.config.openai_model,
+                (self.config.openai_api_key, self.config.llm_http_max_connections,
+                 self.config.llm_http_keepalive_seconds),
+            ),
+            "gemini": (
+                self._init_gemini,
+                self.config.gemini_model,
+                (self.config.gemini_api_key,),
+            ),
         }
+        if self.config.fake_provider_enabled:
+            models["fake"] = (
+                self._init_fake,
+                "fake-chat",
+                (self.config.fake_latency_ms, self.config.fake_tokens_per_second, self.config.fake_response_tokens),
+            )
         if provider not in models:
             raise ValueError(f"Proveedor no soportado: {provider}")
-        return models[provider]()
+
+        factory, model_name, settings = models[provider]
+        key = (provider, model_name, self.config.temperature)
+        return self.registry.get_or_create(key, self._fingerprint(*settings), factory)
+
+    def get_registry_stats(self):
+        """Estadísticas de reutilización de clientes de chat en este proceso"""
+        return self.registry.stats()
 
     def get_model_info(self, provider: str):
         info_map = {
@@ -40,10 +230,18 @@ class LLMConfig:
             "gemini": {
                 "provider": "gemini",
                 "model_name": self.config.gemini_model,
+            },
+            "fake": {
+                "provider": "fake",
+                "model_name": "fake-chat",
             }
         }
         base_info = info_map.get(provider, {})
         base_info["temperature"] = self.config.temperature
+        if "model_name" in base_info:
+            base_info["context_window"] = (
+                getattr(self.config, f"{provider}_context_window", 0) or context_window(base_info["model_name"])
+            )
         return base_info
 
     def test_model_connection(self, provider: str):
@@ -0,0 +1,281 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from ..config.config import config
+
+# Segundos; cubren desde la carga del schema (sub-ms) hasta respuestas largas del LLM
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Tokens de historial por llamada (presupuesto de contexto)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000, 256000, 1048576)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Etapas de una petición de chat
+SCHEMA_LOAD = "schema_load"
+STATE_FETCH = "state_fetch"
+TRIM = "trim"
+PROMPT_CLASSIFY = "prompt_classify"
+PROMPT_FORMAT = "prompt_format"
+FIRST_TOKEN = "first_token"
+GENERATION = "generation"
+STATE_UPDATE = "state_update"
+PDF_RENDER = "pdf_render"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Contador monótono con etiquetas"""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """
+    Histograma de cubetas fijas con etiquetas.
+    Cada observación es una búsqueda binaria y un incremento bajo lock.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # etiquetas -> [conteos por cubeta (+Inf al final), suma]
+        self._values = {}
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def expose(self):
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = 'le="{}"'.format(bound if bound == "+Inf" else _format_value(bound))
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    Métricas del worker en formato de exposición de Prometheus.
+
+    Como el resto de estadísticas, son por proceso: con varios workers cada uno
+    expone las suyas y Prometheus las agrega.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """
+        Registra un callable que devuelve gauges calculados al exponer:
+        lista de (nombre, ayuda, nombres de etiquetas, [(etiquetas, valor)]).
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        for collector in self._collectors:
+            try:
+                gauges = collector()
+            except Exception as e:
+                print(f"Warning: Metrics collector failed: {e}")
+                continue
+            for name, documentation, labelnames, samples in gauges:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} gauge")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "chatbot_stage_seconds", "Duración de cada etapa de una petición",
+    ("stage", "provider", "prompt_type"),
+)
+TOKENS = registry.counter(
+    "chatbot_tokens_total", "Tokens consumidos según el proveedor",
+    ("provider", "prompt_type", "direction"),
+)
+CHAT_REQUESTS = registry.counter(
+    "chatbot_chat_requests_total", "Turnos de chat atendidos",
+    ("provider", "prompt_type", "mode"),
+)
+CONTEXT_TOKENS = registry.histogram(
+    "chatbot_context_tokens", "Tokens de historial enviados al modelo (history) y presupuesto aplicado (budget)",
+    ("provider", "prompt_type", "kind"), TOKEN_BUCKETS,
+)
+CANCELLED_STREAMS = registry.counter(
+    "chatbot_cancelled_streams_total", "Streams cortados porque el cliente se desconectó",
+    ("provider", "prompt_type"),
+)
+CANCELLED_STREAM_TOKENS = registry.counter(
+    "chatbot_cancelled_stream_tokens_total",
+    "Tokens de salida de los streams cortados: generados antes del corte (generated) y estimación de los ahorrados (saved)",
+    ("provider", "prompt_type", "kind"),
+)
+
+# Valores admitidos en las etiquetas que llegan de la petición (proveedor y tipo de
+# consulta); cualquier otro se agrupa en "other" para que un cliente no pueda crear
+# series nuevas sin límite
+OTHER_LABEL = "other"
+_known_labels = {"provider": set(), "prompt_type": set()}
+
+
+def register_label_values(label: str, *values: str):
+    """Admite `values` como valores propios de la etiqueta `label` ("provider" o "prompt_type")"""
+    _known_labels[label].update(values)
+
+
+def bounded_label(label: str, value: str) -> str:
+    """Valor a exponer en la etiqueta `label`: el propio si es conocido, si no OTHER_LABEL"""
+    value = value or ""
+    return value if not value or value in _known_labels[label] else OTHER_LABEL
+
+
+def _labels(provider: str, prompt_type: str) -> tuple:
+    return bounded_label("provider", provider), bounded_label("prompt_type", prompt_type)
+
+
+# Tiempos de un turno que atraviesan el grafo (se rellenan desde los nodos)
+_turn_marks = ContextVar("turn_marks", default=None)
+
+
+def observe_stage(stage: str, seconds: float, provider: str = "", prompt_type: str = ""):
+    if config.metrics_enabled:
+        STAGE_SECONDS.observe((stage, *_labels(provider, prompt_type)), seconds)
+
+
+@contextmanager
+def timed(stage: str, provider: str = "", prompt_type: str = ""):
+    """Mide el bloque como la etapa `stage`"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started, provider, prompt_type)
+
+
+def count_tokens(usage: dict, provider: str, prompt_type: str):
+    """Suma a los contadores los tokens de entrada y salida de un `usage_metadata`"""
+    if not config.metrics_enabled or not usage:
+        return
+    labels = _labels(provider, prompt_type)
+    for direction, key in (("input", "input_tokens"), ("output", "output_tokens")):
+        if usage.get(key):
+            TOKENS.inc((*labels, direction), usage[key])
+
+
+def observe_context(provider: str, prompt_type: str, history_tokens: int, budget: int):
+    """Registra los tokens de historial de una llamada y el presupuesto con el que se recortó"""
+    if config.metrics_enabled:
+        labels = _labels(provider, prompt_type)
+        CONTEXT_TOKENS.observe((*labels, "history"), history_tokens)
+        CONTEXT_TOKENS.observe((*labels, "budget"), budget)
+
+
+def count_cancelled_stream(provider: str, prompt_type: str, generated_tokens: int, saved_tokens: int):
+    """Registra un stream cortado por desconexión del cliente"""
+    if config.metrics_enabled:
+        labels = _labels(provider, prompt_type)
+        CANCELLED_STREAMS.inc(labels)
+        CANCELLED_STREAM_TOKENS.inc((*labels, "generated"), generated_tokens)
+        CANCELLED_STREAM_TOKENS.inc((*labels, "saved"), saved_tokens)
+
+
+def count_request(provider: str, prompt_type: str, mode: str):
+    if config.metrics_enabled:
+        CHAT_REQUESTS.inc((*_labels(provider, prompt_type), mode))
+
+
+@contextmanager
+def graph_turn(provider: str, prompt_type: str):
+    """
+    Mide las etapas que ocurren dentro de `invoke`: la carga del estado (hasta que
+    entra el nodo del modelo) y el guardado (desde que sale hasta que termina).
+    El nodo marca su entrada y salida con `mark_model_start` / `mark_model_end`.
+    """
+    marks = {"started": time.perf_counter()}
+    token = _turn_marks.set(marks)
+    try:
+        yield
+    finally:
+        _turn_marks.reset(token)
+    if "model_end" in marks:
+        observe_stage(STATE_UPDATE, time.perf_counter() - marks["model_end"], provider, prompt_type)
+
+
+def mark_model_start(provider: str, prompt_type: str):
+    marks = _turn_marks.get()
+    if marks is not None and "model_start" not in marks:
+        marks["model_start"] = time.perf_counter()
+        observe_stage(STATE_FETCH, marks["model_start"] - marks["started"], provider, prompt_type)
+
+
+def mark_model_end():
+    marks = _turn_marks.get()
+    if marks is not None:
+        marks["model_end"] = time.perf_counter()
@@ -0,0 +1,52 @@
+import os
+import stat
+import tempfile
+
+
+def private_directory(path: str = None, prefix: str = "chatbot-") -> str:
+    """
+    Directorio accesible sólo por el usuario del proceso, para ficheros con datos de
+    sesiones (que además se deserializan al leerlos).
+
+    Sin `path` se crea uno nuevo con `tempfile.mkdtemp` (permisos 0700). Un `path`
+    configurado se crea con 0700 si no existe; si existe, debe ser un directorio (no un
+    enlace) del mismo usuario y sin permiso de escritura para otros, y se le quitan los
+    permisos de grupo y de otros.
+
+    :param path: Directorio configurado (None o vacío para uno temporal)
+    :param prefix: Prefijo del directorio temporal
+    :return: Ruta del directorio
+    """
+    if not path:
+        return tempfile.mkdtemp(prefix=prefix)
+
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{path} no es un directorio")
+    if info.st_uid != os.geteuid():
+        raise PermissionError(f"{path} pertenece a otro usuario")
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"{path} tiene permiso de escritura para otros usuarios")
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+def open_private(path: str, mode: str = "wb", encoding: str = None):
+    """Abre un fichero para escribir con permisos 0600 (si lo crea)"""
+    return open(path, mode, encoding=encoding, opener=lambda name, flags: os.open(name, flags, 0o600))
+
+
+def private_file(path: str) -> str:
+    """
+    Crea el fichero vacío con permisos 0600 si no existe; si existe, le quita los
+    permisos de grupo y de otros. SQLite crea sus ficheros -wal y -shm con los
+    mismos permisos que la base de datos.
+    """
+    try:
+        os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+    except FileExistsError:
+        if stat.S_IMODE(os.stat(path).st_mode) & 0o077:
+            os.chmod(path, 0o600)
+    return path
@@ -0,0 +1,284 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+from ..config.config import config
+from .llm_config import PROVIDERS
+from .metrics import bounded_label, registry
+
+
+class Ticket:
+    """Turno de una petición en la cola de un proveedor"""
+
+    __slots__ = ("session_id", "tokens", "enqueued_at", "wait_seconds", "granted", "event", "future", "loop",
+                 "used_tokens")
+
+    def __init__(self, session_id: str, tokens: int, future=None):
+        self.session_id = session_id
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+        self.wait_seconds = 0.0
+        self.granted = False
+        self.event = threading.Event()
+        self.future = future
+        self.loop = future.get_loop() if future is not None else None
+        # Tokens reales consumidos; si se informa, se ajusta la cubeta al liberar el turno
+        self.used_tokens = None
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class ProviderScheduler:
+    """
+    Planificador de llamadas a un proveedor LLM.
+
+    Limita las llamadas simultáneas (`max_concurrency`) y los tokens por minuto
+    (`tokens_per_minute`, con una cubeta que se rellena de forma continua). Las
+    peticiones que no caben esperan en una cola local repartida por turnos entre
+    session_id (round-robin), de modo que una sesión con ráfagas no deja sin turno
+    a las demás. Si la espera supera `queue_timeout` se lanza TimeoutError.
+
+    Los límites son por proceso: con varios workers, cada uno aplica los suyos.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, tokens_per_minute: int = 0, queue_timeout: float = 60.0):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.tokens_per_minute = tokens_per_minute
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        # session_id -> cola de turnos; el orden del dict es el orden de reparto
+        self._queues = OrderedDict()
+        self._queued = 0
+        self.active = 0
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+
+        self._waits = deque(maxlen=1024)
+        self.granted = 0
+        self.queued_total = 0
+        self.timeouts = 0
+        self.max_wait = 0.0
+
+    # --- Reparto de turnos (siempre con el lock tomado) ---------------------------
+
+    def _refill(self, now: float):
+        if not self.tokens_per_minute:
+            return
+        elapsed = now - self._refilled_at
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60.0)
+        self._refilled_at = now
+
+    def _grant(self, ticket: Ticket, now: float):
+        ticket.granted = True
+        ticket.wait_seconds = now - ticket.enqueued_at
+        self.active += 1
+        self.granted += 1
+        self._waits.append(ticket.wait_seconds)
+        self.max_wait = max(self.max_wait, ticket.wait_seconds)
+        if ticket.future is not None:
+            ticket.loop.call_soon_threadsafe(_resolve, ticket.future)
+        else:
+            ticket.event.set()
+
+    def _dispatch(self):
+        now = time.monotonic()
+        self._refill(now)
+        while self._queues and self.active < self.max_concurrency:
+            session_id, tickets = next(iter(self._queues.items()))
+            ticket = tickets[0]
+            if self.tokens_per_minute:
+                # Una petición mayor que el presupuesto completo espera a la cubeta llena
+                if self._tokens < min(ticket.tokens, self.tokens_per_minute):
+                    break
+                self._tokens -= ticket.tokens
+
+            tickets.popleft()
+            self._queued -= 1
+            if tickets:
+                self._queues.move_to_end(session_id)
+            else:
+                del self._queues[session_id]
+            self._grant(ticket, now)
+
+    def _enqueue(self, ticket: Ticket):
+        with self._lock:
+            self._queues.setdefault(ticket.session_id, deque()).append(ticket)
+            self._queued += 1
+            self._dispatch()
+            if not ticket.granted:
+                self.queued_total += 1
+
+    def _cancel(self, ticket: Ticket):
+        tickets = self._queues.get(ticket.session_id)
+        if tickets is not None and ticket in tickets:
+            tickets.remove(ticket)
+            self._queued -= 1
+            if not tickets:
+                del self._queues[ticket.session_id]
+
+    def _poll(self, ticket: Ticket, deadline: float) -> bool:
+        """Reintenta el reparto tras una espera; lanza TimeoutError si vence el plazo"""
+        with self._lock:
+            if not ticket.granted:
+                self._dispatch()
+            if ticket.granted:
+                return True
+            if time.monotonic() >= deadline:
+                self._cancel(ticket)
+                self.timeouts += 1
+                raise TimeoutError(
+                    f"Tiempo de espera agotado en la cola de {self.name} ({self.queue_timeout:g}s)"
+                )
+            return False
+
+    def _wait_step(self, deadline: float) -> float:
+        remaining = max(0.0, deadline - time.monotonic())
+        # Sin límite de tokens sólo se libera turno al terminar otra llamada (se avisa);
+        # con límite, la cubeta se rellena con el tiempo y hay que volver a comprobar
+        return min(remaining, 0.1) if self.tokens_per_minute else remaining
+
+    # --- API -----------------------------------------------------------------------
+
+    def acquire(self, session_id: str, tokens: int = 0) -> Ticket:
+        """
+        Espera turno para una llamada.
+
+        :param session_id: Sesión que hace la petición (unidad de reparto)
+        :param tokens: Tokens estimados de la llamada (entrada + salida)
+        :return: Ticket a devolver con `release`
+        """
+        ticket = Ticket(session_id, tokens)
+        self._enqueue(ticket)
+        deadline = ticket.enqueued_at + self.queue_timeout
+        while not ticket.event.wait(self._wait_step(deadline)):
+            if self._poll(ticket, deadline):
+                break
+        return ticket
+
+    async def aacquire(self, session_id: str, tokens: int = 0) -> Ticket:
+        """Versión asíncrona de `acquire`; no bloquea el event loop mientras espera"""
+        ticket = Ticket(session_id, tokens, asyncio.get_running_loop().create_future())
+        self._enqueue(ticket)
+        deadline = ticket.enqueued_at + self.queue_timeout
+        try:
+            while not ticket.future.done():
+                try:
+                    await asyncio.wait_for(asyncio.shield(ticket.future), self._wait_step(deadline))
+                except asyncio.TimeoutError:
+                    if self._poll(ticket, deadline):
+                        break
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = ticket.granted
+                if not granted:
+                    self._cancel(ticket)
+            if granted:
+                self.release(ticket)
+            raise
+        return ticket
+
+    def release(self, ticket: Ticket):
+        """Devuelve el turno y ajusta la cubeta con los tokens reales, si se conocen"""
+        with self._lock:
+            self.active -= 1
+            if self.tokens_per_minute and ticket.used_tokens is not None:
+                self._tokens = min(self.tokens_per_minute, self._tokens + ticket.tokens - ticket.used_tokens)
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, session_id: str, tokens: int = 0):
+        ticket = self.acquire(session_id, tokens)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def aslot(self, session_id: str, tokens: int = 0):
+        ticket = await self.aacquire(session_id, tokens)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refill(time.monotonic())
+            waits = sorted(self._waits)
+
+            def percentile(q):
+                return round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 1) if waits else 0.0
+
+            return {
+                "max_concurrency": self.max_concurrency,
+                "tokens_per_minute": self.tokens_per_minute,
+                "tokens_available": int(self._tokens) if self.tokens_per_minute else None,
+                "active": self.active,
+                "queue_depth": self._queued,
+                "sessions_waiting": len(self._queues),
+                "granted": self.granted,
+                "queued": self.queued_total,
+                "timeouts": self.timeouts,
+                "wait_ms": {
+                    "avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                    "p50": percentile(0.5),
+                    "p95": percentile(0.95),
+                    "max": round(self.max_wait * 1000, 1),
+                },
+            }
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(provider: str) -> ProviderScheduler:
+    """
+    Planificador del proveedor, creado con sus límites de configuración
+    (<PROVIDER>_MAX_CONCURRENCY y <PROVIDER>_TOKENS_PER_MINUTE). Sólo existen
+    planificadores de los proveedores conocidos: un nombre arbitrario lanza ValueError.
+    """
+    scheduler = _schedulers.get(provider)
+    if scheduler is None:
+        if provider not in PROVIDERS:
+            raise ValueError(f"Proveedor no soportado: {provider}")
+        with _schedulers_lock:
+            scheduler = _schedulers.get(provider)
+            if scheduler is None:
+                scheduler = ProviderScheduler(
+                    provider,
+                    max_concurrency=getattr(config, f"{provider}_max_concurrency", config.scheduler_max_concurrency),
+                    tokens_per_minute=getattr(config, f"{provider}_tokens_per_minute", 0),
+                    queue_timeout=config.scheduler_queue_timeout_seconds,
+                )
+                _schedulers[provider] = scheduler
+    return scheduler
+
+
+def get_scheduler_stats() -> dict:
+    """Estadísticas de todos los planificadores creados en este worker"""
+    return {provider: scheduler.stats() for provider, scheduler in list(_schedulers.items())}
+
+
+def _scheduler_gauges():
+    totals = {}
+    for provider, values in get_scheduler_stats().items():
+        label = bounded_label("provider", provider)
+        active, queued = totals.get(label, (0, 0))
+        totals[label] = (active + values["active"], queued + values["queue_depth"])
+    return [
+        ("chatbot_scheduler_active", "Llamadas en curso por proveedor", ("provider",),
+         [((provider,), active) for provider, (active, _) in totals.items()]),
+        ("chatbot_scheduler_queue_depth", "Peticiones esperando turno por proveedor", ("provider",),
+         [((provider,), queued) for provider, (_, queued) in totals.items()]),
+    ]
+
+
+registry.add_collector(_scheduler_gauges)
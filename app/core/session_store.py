@@ -0,0 +1,327 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from .private_dir import open_private, private_directory
+
+# Activo durante lecturas masivas (exportación): no se recargan sesiones ni se altera el LRU
+_bulk_reading = ContextVar("tiered_bulk_reading", default=False)
+
+
+class TieredMemorySaver(InMemorySaver):
+    """
+    MemorySaver con memoria acotada por sesión (thread_id).
+
+    Lleva la cuenta de los bytes serializados de cada sesión y, cuando se supera
+    el límite de memoria o de sesiones, o cuando una sesión lleva más de `ttl_seconds`
+    inactiva, la expulsa (LRU) a un nivel en disco comprimido con zlib. La siguiente
+    lectura o escritura de esa sesión la vuelve a cargar de forma transparente.
+
+    El nivel en disco es privado de cada proceso (un subdirectorio por pid), igual
+    que la memoria de MemorySaver, y vive en un directorio accesible sólo por el
+    usuario del proceso: los ficheros son pickles y se deserializan al recargarlos.
+    """
+
+    def __init__(
+        self,
+        spill_dir: str = None,
+        *,
+        max_bytes: int,
+        max_sessions: int,
+        ttl_seconds: float,
+        compress_level: int = 6,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.spill_dir = private_directory(spill_dir, prefix="chatbot-sessions-")
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.compress_level = compress_level
+
+        self._tier_lock = threading.RLock()
+        # thread_id -> [último acceso, bytes en memoria]
+        self._sessions = OrderedDict()
+        self._blob_keys = defaultdict(set)
+        self._write_keys = defaultdict(set)
+        self._spilled = set()
+        self._pid = os.getpid()
+
+        self.bytes_in_memory = 0
+        self.evictions = {"lru": 0, "ttl": 0}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_spilled = 0
+
+    # --- Nivel en disco ---------------------------------------------------------
+
+    def _spill_path(self, thread_id: str) -> str:
+        digest = hashlib.sha1(thread_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, str(os.getpid()), f"{digest}.ckpt.z")
+
+    def _spill(self, thread_id: str, reason: str):
+        last_access, size = self._sessions.pop(thread_id)
+        if not self.storage.get(thread_id):
+            # Sesión sin checkpoints: no hay nada que guardar
+            self.storage.pop(thread_id, None)
+            self.bytes_in_memory -= size
+            return
+
+        payload = {
+            "thread_id": thread_id,
+            "storage": dict(self.storage.pop(thread_id, {})),
+            "writes": {key: self.writes.pop(key) for key in self._write_keys.pop(thread_id, ()) if key in self.writes},
+            "blobs": {key: self.blobs.pop(key) for key in self._blob_keys.pop(thread_id, ()) if key in self.blobs},
+        }
+        data = zlib.compress(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL), self.compress_level)
+
+        path = self._spill_path(thread_id)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open_private(tmp_path) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        self._spilled.add(thread_id)
+        self.bytes_in_memory -= size
+        self.bytes_spilled += len(data)
+        self.evictions[reason] += 1
+
+    def _read_spilled(self, thread_id: str) -> tuple:
+        with open(self._spill_path(thread_id), "rb") as f:
+            data = f.read()
+        return pickle.loads(zlib.decompress(data)), len(data)
+
+    def _load(self, thread_id: str):
+        payload, spilled_bytes = self._read_spilled(thread_id)
+
+        self.storage[thread_id].update(payload["storage"])
+        self.writes.update(payload["writes"])
+        self.blobs.update(payload["blobs"])
+        self._write_keys[thread_id] = set(payload["writes"])
+        self._blob_keys[thread_id] = set(payload["blobs"])
+
+        size = self._measure(thread_id)
+        self._sessions[thread_id] = [time.monotonic(), size]
+        self.bytes_in_memory += size
+        self.bytes_spilled -= spilled_bytes
+        self._spilled.discard(thread_id)
+        os.remove(self._spill_path(thread_id))
+
+    def _peek_spilled(self, config):
+        """Lee una sesión volcada a disco sin devolverla a memoria"""
+        payload, _ = self._read_spilled(config["configurable"]["thread_id"])
+        saver = InMemorySaver(serde=self.serde)
+        saver.storage[payload["thread_id"]].update(payload["storage"])
+        saver.writes.update(payload["writes"])
+        saver.blobs.update(payload["blobs"])
+        return saver.get_tuple(config)
+
+    # --- Contabilidad -------------------------------------------------------------
+
+    def _measure(self, thread_id: str) -> int:
+        size = 0
+        for checkpoints in self.storage.get(thread_id, {}).values():
+            for checkpoint, metadata, _ in checkpoints.values():
+                size += len(checkpoint[1]) + len(metadata[1])
+        for key in self._write_keys.get(thread_id, ()):
+            size += sum(len(value[2][1]) for value in self.writes.get(key, {}).values())
+        for key in self._blob_keys.get(thread_id, ()):
+            size += len(self.blobs[key][1])
+        return size
+
+    def _resize(self, thread_id: str, delta: int):
+        self._sessions[thread_id][1] += delta
+        self.bytes_in_memory += delta
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            # Tras un fork el nivel en disco del padre no pertenece a este worker
+            self._spilled.clear()
+            self._pid = os.getpid()
+
+    def _touch(self, thread_id: str, create: bool = False) -> bool:
+        """
+        Marca la sesión como usada, cargándola desde disco si fue expulsada.
+
+        Una sesión desconocida sólo se registra al escribirla (`create`): consultar ids
+        que no existen no ocupa sitio en el LRU ni expulsa sesiones reales.
+
+        :return: False si la sesión no existe
+        """
+        self._check_fork()
+        if thread_id in self._sessions:
+            self.memory_hits += 1
+        elif thread_id in self._spilled:
+            self.disk_hits += 1
+            self._load(thread_id)
+        else:
+            self.misses += 1
+            if not create:
+                return False
+            self._sessions[thread_id] = [time.monotonic(), 0]
+
+        self._sessions[thread_id][0] = time.monotonic()
+        self._sessions.move_to_end(thread_id)
+        self._enforce_limits(keep=thread_id)
+        return True
+
+    def _enforce_limits(self, keep: str = None):
+        now = time.monotonic()
+        for thread_id in list(self._sessions):
+            if thread_id == keep:
+                continue
+            last_access = self._sessions[thread_id][0]
+            if self.ttl_seconds and now - last_access > self.ttl_seconds:
+                self._spill(thread_id, "ttl")
+                continue
+            over_bytes = self.max_bytes and self.bytes_in_memory > self.max_bytes
+            over_sessions = self.max_sessions and len(self._sessions) > self.max_sessions
+            if not (over_bytes or over_sessions):
+                break
+            self._spill(thread_id, "lru")
+
+    # --- API de BaseCheckpointSaver ---------------------------------------------------
+
+    @contextmanager
+    def bulk_reads(self):
+        """
+        Lecturas masivas (exportación de sesiones): las sesiones volcadas a disco se
+        leen sin recargarlas y no se cambia el orden LRU, así que recorrer todas las
+        sesiones no expulsa a las que están en uso.
+        """
+        token = _bulk_reading.set(True)
+        try:
+            yield self
+        finally:
+            _bulk_reading.reset(token)
+
+    def list_threads(self) -> list:
+        """Ids de las sesiones en memoria y en disco (copia tomada bajo el lock)"""
+        with self._tier_lock:
+            self._check_fork()
+            in_memory = [thread_id for thread_id in self._sessions if self.storage.get(thread_id)]
+            return in_memory + sorted(self._spilled)
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        with self._tier_lock:
+            if not _bulk_reading.get():
+                if not self._touch(thread_id):
+                    return None
+            elif thread_id not in self._sessions:
+                return self._peek_spilled(config) if thread_id in self._spilled else None
+            return super().get_tuple(config)
+
+    def latest_checkpoint_id(self, thread_id: str, checkpoint_ns: str = ""):
+        """Id del último checkpoint; recupera la sesión del disco si estaba volcada"""
+        with self._tier_lock:
+            self._touch(thread_id)
+            checkpoints = self.storage.get(thread_id, {}).get(checkpoint_ns)
+            return max(checkpoints) if checkpoints else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        with self._tier_lock:
+            if config:
+                if not self._touch(config["configurable"]["thread_id"]):
+                    return
+                thread_ids = [config["configurable"]["thread_id"]]
+            else:
+                thread_ids = list(self._sessions) + list(self._spilled)
+
+        for thread_id in thread_ids:
+            with self._tier_lock:
+                if not self._touch(thread_id):
+                    continue
+                thread_config = config or {"configurable": {"thread_id": thread_id}}
+                items = list(super().list(thread_config, filter=filter, before=before, limit=limit))
+            for item in items:
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield item
+
+    def get_delta_channel_history(self, *, config, channels):
+        with self._tier_lock:
+            self._touch(config["configurable"]["thread_id"])
+            return super().get_delta_channel_history(config=config, channels=channels)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._tier_lock:
+            self._touch(thread_id, create=True)
+            previous = {key: len(self.blobs[key][1]) for key in (
+                (thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items()
+            ) if key in self.blobs}
+            result = super().put(config, checkpoint, metadata, new_versions)
+
+            delta = 0
+            for channel, version in new_versions.items():
+                key = (thread_id, checkpoint_ns, channel, version)
+                self._blob_keys[thread_id].add(key)
+                delta += len(self.blobs[key][1]) - previous.get(key, 0)
+            saved, saved_metadata, _ = self.storage[thread_id][checkpoint_ns][checkpoint["id"]]
+            delta += len(saved[1]) + len(saved_metadata[1])
+            self._resize(thread_id, delta)
+            self._enforce_limits(keep=thread_id)
+            return result
+
+    def put_writes(self, config, writes, task_id, task_path: str = ""):
+        thread_id = config["configurable"]["thread_id"]
+        outer_key = (thread_id, config["configurable"].get("checkpoint_ns", ""), config["configurable"]["checkpoint_id"])
+        with self._tier_lock:
+            self._touch(thread_id, create=True)
+            before = sum(len(value[2][1]) for value in self.writes.get(outer_key, {}).values())
+            super().put_writes(config, writes, task_id, task_path)
+            after = sum(len(value[2][1]) for value in self.writes.get(outer_key, {}).values())
+            self._write_keys[thread_id].add(outer_key)
+            self._resize(thread_id, after - before)
+            self._enforce_limits(keep=thread_id)
+
+    def delete_thread(self, thread_id: str):
+        with self._tier_lock:
+            if thread_id in self._spilled:
+                os.remove(self._spill_path(thread_id))
+                self._spilled.discard(thread_id)
+            if thread_id in self._sessions:
+                self.bytes_in_memory -= self._sessions.pop(thread_id)[1]
+            self.storage.pop(thread_id, None)
+            for key in self._write_keys.pop(thread_id, ()):
+                self.writes.pop(key, None)
+            for key in self._blob_keys.pop(thread_id, ()):
+                self.blobs.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._tier_lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            largest = sorted(self._sessions.items(), key=lambda item: item[1][1], reverse=True)[:10]
+            return {
+                "backend": "tiered",
+                "sessions_in_memory": len(self._sessions),
+                "sessions_on_disk": len(self._spilled),
+                "bytes_in_memory": self.bytes_in_memory,
+                "bytes_on_disk": self.bytes_spilled,
+                "max_bytes": self.max_bytes,
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": dict(self.evictions),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_hit_rate": self.memory_hits / lookups if lookups else 0.0,
+                "disk_hit_rate": self.disk_hits / lookups if lookups else 0.0,
+                "largest_sessions": [
+                    {"session_id": thread_id, "bytes": size} for thread_id, (_, size) in largest
+                ],
+            }
@@ -0,0 +1,316 @@
+import asyncio
+import hashlib
+import json
+import threading
+
+from ..config.config import config
+from .hedging import CancelScope, enter_scope, exit_scope, on_cancel
+
+_END = object()
+
+
+def request_key(kind: str, provider: str, model: str, messages, scope: str = "") -> str:
+    """
+    Clave de una petición al proveedor: tipo de llamada, proveedor, modelo,
+    temperatura, el prompt completo ya formateado y su ámbito.
+
+    Las llamadas de una sesión usan su session_id como ámbito: sólo se agrupan los
+    reintentos y envíos duplicados de la propia sesión, nunca prompts idénticos de
+    sesiones distintas. Sin ámbito (p. ej. /test-connection) se agrupan todas.
+    """
+    payload = [kind, provider, model or "", config.temperature, scope or "",
+               [(msg.type, msg.content) for msg in messages]]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+class _Call:
+    """Llamada en curso: resultado o error compartido por todos los que esperan"""
+
+    __slots__ = ("event", "future", "result", "error")
+
+    def __init__(self, future=None):
+        self.event = threading.Event()
+        self.future = future
+        self.result = None
+        self.error = None
+
+
+class _Stream:
+    """
+    Stream en curso. Los fragmentos se guardan en `buffer`; cada consumidor lleva
+    su propia posición y, cuando llega al final, el primero que lo necesita pide
+    el siguiente fragmento al proveedor (sin hilos adicionales). Si el que inició
+    el stream se va, otro consumidor sigue tirando de él.
+    """
+
+    def __init__(self, upstream, condition):
+        self.upstream = upstream
+        self.condition = condition
+        self.buffer = []
+        self.pulling = False
+        self.finished = False
+        self.error = None
+        self.consumers = 0
+        # Consumidores en curso (sólo en la versión síncrona) y ámbito de cancelación
+        # propio: cancelar a un consumidor sólo corta la petición si es el único
+        self.members = set()
+        self.scope = CancelScope()
+        # Petición del siguiente fragmento en curso (sólo en la versión asíncrona)
+        self.task = None
+
+
+class SingleFlight:
+    """
+    Agrupa peticiones idénticas simultáneas en una sola llamada al proveedor.
+
+    Mientras una llamada con la misma clave está en curso, las nuevas esperan su
+    resultado en lugar de repetirla; en streaming, quien llega tarde recibe los
+    fragmentos ya emitidos desde el principio y después sigue el stream en vivo.
+    Al terminar la llamada la clave se libera, así que no es una caché.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self._acalls = {}
+        self._astreams = {}
+
+        self.leaders = 0
+        self.joined = 0
+
+    def _count(self, joined: bool):
+        with self._lock:
+            if joined:
+                self.joined += 1
+            else:
+                self.leaders += 1
+
+    # --- Llamadas completas -----------------------------------------------------------
+
+    def do(self, key: str, call):
+        """
+        Ejecuta `call()` o se une a la ejecución en curso con la misma clave.
+
+        :return: (resultado, compartido) — compartido es True si no se hizo la llamada
+        """
+        if not config.single_flight_enabled:
+            return call(), False
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = _Call()
+        self._count(not leader)
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = call()
+            return flight.result, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            flight.event.set()
+
+    async def ado(self, key: str, call):
+        """Versión asíncrona de `do`; `call` devuelve un awaitable"""
+        if not config.single_flight_enabled:
+            return await call(), False
+        flight = self._acalls.get(key)
+        if flight is not None:
+            self._count(True)
+            return await asyncio.shield(flight.future), True
+
+        self._count(False)
+        flight = self._acalls[key] = _Call(asyncio.get_running_loop().create_future())
+        try:
+            result = await call()
+            flight.future.set_result(result)
+            return result, False
+        except asyncio.CancelledError:
+            flight.future.cancel()
+            raise
+        except BaseException as e:
+            flight.future.set_exception(e)
+            # Evita el aviso de excepción no recuperada si nadie más esperaba
+            flight.future.exception()
+            raise
+        finally:
+            self._acalls.pop(key, None)
+
+    # --- Streaming ----------------------------------------------------------------------
+
+    def stream(self, key: str, factory):
+        """
+        Stream compartido: `factory()` sólo se invoca si no hay otro en curso con la clave.
+
+        :return: Generador de fragmentos desde el principio del stream
+        """
+        if not config.single_flight_enabled:
+            yield from factory()
+            return
+        with self._lock:
+            flight = self._streams.get(key)
+            joined = flight is not None
+            if not joined:
+                flight = self._streams[key] = _Stream(factory(), threading.Condition(self._lock))
+            flight.consumers += 1
+            member = object()
+            flight.members.add(member)
+        self._count(joined)
+        on_cancel(lambda: self._abandon(key, flight, member))
+
+        position = 0
+        try:
+            while True:
+                with self._lock:
+                    while position >= len(flight.buffer) and not flight.finished and flight.pulling:
+                        flight.condition.wait()
+                    if position < len(flight.buffer):
+                        chunk = flight.buffer[position]
+                    elif flight.finished:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    else:
+                        flight.pulling = True
+                        chunk = _END
+                if chunk is _END:
+                    chunk = self._pull(key, flight)
+                    if chunk is _END:
+                        continue
+                position += 1
+                yield chunk
+        finally:
+            self._leave(key, flight, member)
+
+    def _pull(self, key: str, flight: _Stream):
+        # El proveedor registra sus cortes de conexión en el ámbito del stream, no en
+        # el del consumidor que tira de él en este momento
+        token = enter_scope(flight.scope)
+        try:
+            chunk = next(flight.upstream)
+        except StopIteration:
+            chunk, error = _END, None
+        except BaseException as e:
+            chunk, error = _END, e
+        finally:
+            exit_scope(token)
+        with self._lock:
+            flight.pulling = False
+            if chunk is _END:
+                flight.finished = True
+                flight.error = error
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+            else:
+                flight.buffer.append(chunk)
+            flight.condition.notify_all()
+        return chunk
+
+    def _abandon(self, key: str, flight: _Stream, member):
+        """Consumidor cancelado: si nadie más sigue el stream, se corta la petición"""
+        with self._lock:
+            if flight.finished or flight.members != {member}:
+                return
+            # Sin nuevos consumidores: la petición se va a cortar
+            if self._streams.get(key) is flight:
+                del self._streams[key]
+        flight.scope.cancel()
+
+    def _leave(self, key: str, flight: _Stream, member):
+        with self._lock:
+            flight.consumers -= 1
+            flight.members.discard(member)
+            abandoned = flight.consumers == 0 and not flight.finished
+            if abandoned:
+                flight.finished = True
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+        if abandoned:
+            # Nadie sigue el stream: se cierra la llamada al proveedor
+            flight.upstream.close()
+
+    async def astream(self, key: str, factory):
+        """Versión asíncrona de `stream`; `factory()` devuelve un generador asíncrono"""
+        if not config.single_flight_enabled:
+            async for chunk in factory():
+                yield chunk
+            return
+        flight = self._astreams.get(key)
+        joined = flight is not None
+        if not joined:
+            flight = self._astreams[key] = _Stream(factory(), asyncio.Condition())
+        flight.consumers += 1
+        self._count(joined)
+
+        position = 0
+        try:
+            while True:
+                async with flight.condition:
+                    while position >= len(flight.buffer) and not flight.finished and flight.pulling:
+                        await flight.condition.wait()
+                    if position < len(flight.buffer):
+                        chunk = flight.buffer[position]
+                    elif flight.finished:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    else:
+                        flight.pulling = True
+                        flight.task = asyncio.ensure_future(self._apull(key, flight))
+                        chunk = _END
+                if chunk is _END:
+                    # La petición sigue aunque se cancele este consumidor: puede haber otros
+                    await asyncio.shield(flight.task)
+                    continue
+                position += 1
+                yield chunk
+        finally:
+            flight.consumers -= 1
+            if flight.consumers == 0 and not flight.finished:
+                flight.finished = True
+                if self._astreams.get(key) is flight:
+                    del self._astreams[key]
+                if flight.pulling:
+                    flight.task.cancel()
+                else:
+                    await flight.upstream.aclose()
+
+    async def _apull(self, key: str, flight: _Stream):
+        try:
+            chunk, error = await flight.upstream.__anext__(), None
+        except StopAsyncIteration:
+            chunk, error = _END, None
+        except BaseException as e:
+            chunk, error = _END, e
+        async with flight.condition:
+            flight.pulling = False
+            if chunk is _END:
+                flight.finished = True
+                flight.error = error
+                if self._astreams.get(key) is flight:
+                    del self._astreams[key]
+            else:
+                flight.buffer.append(chunk)
+            flight.condition.notify_all()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls) + len(self._acalls),
+                "streams_in_flight": len(self._streams) + len(self._astreams),
+                "leaders": self.leaders,
+                "joined": self.joined,
+            }
+
+
+single_flight = SingleFlight()
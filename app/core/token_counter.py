@@ -0,0 +1,158 @@
+import threading
+from ..config.config import config
+
+
+class TokenCounter:
+    """
+    Contador de tokens local. Las subclases implementan `count_text`.
+    """
+
+    name = "base"
+    tokens_per_message = 4
+
+    def count_text(self, text: str) -> int:
+        raise NotImplementedError
+
+    def count_message(self, message) -> int:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        return self.count_text(content) + self.tokens_per_message
+
+    def count_messages(self, messages) -> int:
+        return sum(self.count_message(msg) for msg in messages)
+
+    def cache_key(self, message) -> str:
+        """Clave bajo la que se guarda el conteo de un mensaje en el estado de la sesión"""
+        return f"{self.name}:{message.id}"
+
+    def observe(self, estimated_tokens: int, actual_tokens: int):
+        """Recibe el conteo real reportado por el proveedor (no-op por defecto)"""
+        return None
+
+
+class TiktokenCounter(TokenCounter):
+    """Conteo exacto con tiktoken para modelos de OpenAI"""
+
+    tokens_per_message = 3
+
+    def __init__(self, model: str):
+        import tiktoken
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+        self.name = f"tiktoken-{self.encoding.name}"
+
+    def count_text(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+class EstimatedTokenCounter(TokenCounter):
+    """
+    Estimador por caracteres para proveedores sin tokenizador local (Gemini).
+    La relación caracteres/token se recalibra con el uso real que reporta el proveedor.
+    """
+
+    def __init__(self, name: str, chars_per_token: float):
+        self.name = f"estimate-{name}"
+        self.chars_per_token = chars_per_token
+        self._lock = threading.Lock()
+
+    def count_text(self, text: str) -> int:
+        return max(1, int(len(text) / self.chars_per_token + 0.5)) if text else 0
+
+    def observe(self, estimated_tokens: int, actual_tokens: int):
+        if not estimated_tokens or not actual_tokens:
+            return
+        with self._lock:
+            ratio = estimated_tokens / actual_tokens
+            corrected = self.chars_per_token * ratio
+            # Media móvil para no oscilar con respuestas atípicas
+            self.chars_per_token = min(8.0, max(1.5, 0.9 * self.chars_per_token + 0.1 * corrected))
+
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(provider: str, model: str = None) -> TokenCounter:
+    """
+    Devuelve el contador de tokens compartido para un proveedor y modelo.
+
+    :param provider: Proveedor LLM
+    :param model: Nombre del modelo
+    :return: Instancia de TokenCounter
+    """
+    key = (provider, model)
+    with _counters_lock:
+        counter = _counters.get(key)
+        if counter is None:
+            if provider == "openai":
+                try:
+                    counter = TiktokenCounter(model or config.openai_model)
+                except Exception as e:
+                    print(f"Warning: tiktoken unavailable, using estimator: {e}")
+                    counter = EstimatedTokenCounter(provider, config.openai_chars_per_token)
+            elif provider == "gemini":
+                counter = EstimatedTokenCounter(provider, config.gemini_chars_per_token)
+            else:
+                counter = EstimatedTokenCounter(provider, 4.0)
+            _counters[key] = counter
+        return counter
+
+
+def merge_token_counts(left: dict, right: dict) -> dict:
+    """Reducer de LangGraph para el caché de conteos de tokens por mensaje"""
+    if not left:
+        return dict(right or {})
+    if not right:
+        return left
+    merged = dict(left)
+    merged.update(right)
+    return merged
+
+
+def count_with_cache(messages, counter: TokenCounter, cached_counts: dict = None):
+    """
+    Cuenta los tokens de cada mensaje reutilizando los conteos ya guardados.
+
+    :param messages: Mensajes de la conversación
+    :param counter: Contador de tokens
+    :param cached_counts: Conteos guardados en el estado de la sesión
+    :return: (lista de conteos por mensaje, conteos nuevos a persistir)
+    """
+    cached_counts = cached_counts or {}
+    counts = []
+    new_counts = {}
+    for msg in messages:
+        key = counter.cache_key(msg) if msg.id else None
+        count = cached_counts.get(key) if key else None
+        if count is None:
+            count = counter.count_message(msg)
+            if key:
+                new_counts[key] = count
+        counts.append(count)
+    return counts, new_counts
+
+
+def trim_to_budget(messages, counts: list, max_tokens: int, start_on: str = "human"):
+    """
+    Conserva el sufijo más largo de mensajes cuyo total no supera `max_tokens`.
+
+    :param messages: Mensajes de la conversación
+    :param counts: Conteo de tokens de cada mensaje
+    :param max_tokens: Presupuesto de tokens
+    :param start_on: Tipo de mensaje con el que debe empezar el historial recortado
+    :return: Mensajes recortados
+    """
+    total = 0
+    start = len(messages)
+    for index in range(len(messages) - 1, -1, -1):
+        total += counts[index]
+        if total > max_tokens:
+            break
+        start = index
+
+    while start < len(messages) and start_on and messages[start].type != start_on:
+        start += 1
+
+    return list(messages[start:])
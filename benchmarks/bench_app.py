@@ -0,0 +1,213 @@
+"""
+Suite de benchmarks de la aplicación sin coste de proveedor (provider=fake).
+
+Levanta la app Flask en proceso con el modelo simulado y recorre /chat (JSON y
+SSE delta), /history (completo, con If-None-Match y con since) y /export-pdf
+sobre sesiones de longitud realista. Para cada escenario muestra throughput,
+latencias p50/p99 y memoria RSS máxima del proceso. Con latencia y velocidad
+del modelo a 0 (por defecto) lo que se mide es el coste de nuestro propio código.
+
+Si alguna petición falla el proceso termina con código 1, y `--json` guarda
+los resultados para compararlos entre ejecuciones (por ejemplo en CI).
+
+Uso:
+    python -m benchmarks.bench_app [--sessions 16] [--turns 10] [--concurrency 4]
+                                   [--history-messages 1000] [--latency-ms 0]
+                                   [--tokens-per-second 0] [--json resultados.json]
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=16, help="sesiones simultáneas")
+    parser.add_argument("--turns", type=int, default=10, help="turnos por sesión")
+    parser.add_argument("--concurrency", type=int, default=4, help="peticiones en paralelo")
+    parser.add_argument("--history-messages", type=int, default=1000, help="mensajes de la sesión larga")
+    parser.add_argument("--latency-ms", type=float, default=0, help="latencia simulada hasta el primer token")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="velocidad simulada (0 = sin espera)")
+    parser.add_argument("--json", help="fichero donde guardar los resultados")
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    """La configuración se lee al importar la app, así que se fija antes"""
+    os.environ.update({
+        "FAKE_PROVIDER_ENABLED": "true",
+        "FAKE_LATENCY_MS": str(args.latency_ms),
+        "FAKE_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "SUMMARY_PROVIDER": "fake",
+        "RESPONSE_CACHE_ENABLED": "false",
+        "EXPORT_DIR": tempfile.mkdtemp(prefix="bench-exports-"),
+    })
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def peak_rss_mib() -> float:
+    # ru_maxrss está en KiB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Scenario:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies = []
+        self.first_event = []
+        self.errors = 0
+        self.wall = 0.0
+
+    def run(self, requests, concurrency: int):
+        """Ejecuta callables que devuelven (ok, latencia, primer evento o None)"""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for ok, latency, first_event in pool.map(lambda request: request(), requests):
+                self.errors += not ok
+                self.latencies.append(latency)
+                if first_event is not None:
+                    self.first_event.append(first_event)
+        self.wall = time.perf_counter() - start
+        return self
+
+    def result(self) -> dict:
+        result = {
+            "scenario": self.name,
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "throughput_rps": round(len(self.latencies) / self.wall, 1) if self.wall else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 2),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 2),
+            "peak_rss_mib": round(peak_rss_mib(), 1),
+        }
+        if self.first_event:
+            result["first_event_p50_ms"] = round(percentile(self.first_event, 50) * 1000, 2)
+            result["first_event_p99_ms"] = round(percentile(self.first_event, 99) * 1000, 2)
+        return result
+
+
+def timed_get(client, url: str, expected=(200,), headers=None):
+    start = time.perf_counter()
+    response = client.get(url, headers=headers or {})
+    response.get_data()
+    return response.status_code in expected, time.perf_counter() - start, None
+
+
+def session_turns(client, session_id: str, turns: int, stream: bool):
+    """Una sesión completa: los turnos van en orden, como haría un usuario"""
+    results = []
+    query = "provider=fake&stream=true&stream_mode=delta" if stream else "provider=fake"
+    for turn in range(turns):
+        body = {"message": f"Sesión {session_id}, consulta {turn}: paciente con insomnio y ansiedad. " * 3,
+                "session_id": session_id}
+        start = time.perf_counter()
+        first_event = None
+        response = client.post(f"/api/v1/chat?{query}", json=body)
+        if stream:
+            ok = False
+            for chunk in response.response:
+                if first_event is None and b'"delta"' in chunk:
+                    first_event = time.perf_counter() - start
+                ok = ok or b'"done"' in chunk
+            response.close()
+        else:
+            ok = response.status_code == 200
+        results.append((ok and response.status_code == 200, time.perf_counter() - start, first_event))
+    return results
+
+
+def run_chat(client, name: str, prefix: str, args, stream: bool) -> Scenario:
+    scenario = Scenario(name)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        sessions = pool.map(
+            lambda index: session_turns(client, f"{prefix}-{index}", args.turns, stream), range(args.sessions)
+        )
+        for results in sessions:
+            for ok, latency, first_event in results:
+                scenario.errors += not ok
+                scenario.latencies.append(latency)
+                if first_event is not None:
+                    scenario.first_event.append(first_event)
+    scenario.wall = time.perf_counter() - start
+    return scenario
+
+
+def prefill_long_session(chat_services, session_id: str, count: int):
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    messages = []
+    for i in range(count // 2):
+        messages.append(HumanMessage(content=f"Consulta {i}: el paciente refiere rumiación nocturna. " * 4))
+        messages.append(AIMessage(content=f"Respuesta {i}: se propone registro de pensamientos y TCC-I. " * 12))
+    chat_services.app.update_state(
+        {"configurable": {"thread_id": session_id}},
+        {"messages": messages, "provider": "fake", "session_id": session_id, "prompt_type": "general"},
+        as_node="compact",
+    )
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+
+    from entrypoint import app
+    from app.chat.controller.chat_controller import chat_services
+
+    client = app.test_client()
+    results = []
+
+    def report(scenario: Scenario):
+        result = scenario.result()
+        results.append(result)
+        first = f"  primer evento p50={result['first_event_p50_ms']}ms" if "first_event_p50_ms" in result else ""
+        print(f"{result['scenario']:<20} {result['requests']:>6} req {result['throughput_rps']:>8} req/s "
+              f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms rss={result['peak_rss_mib']}MiB"
+              f"{first}  errores={result['errors']}")
+
+    report(run_chat(client, "chat_json", "json", args, stream=False))
+    report(run_chat(client, "chat_sse", "sse", args, stream=True))
+
+    prefill_long_session(chat_services, "bench-long", args.history_messages)
+    long_history = client.get("/api/v1/history/bench-long")
+    etag = long_history.headers["ETag"]
+    last_id = long_history.get_json()["messages"][-1]["id"]
+    repeats = max(args.sessions, 20)
+
+    report(Scenario("history_full").run(
+        [lambda: timed_get(client, "/api/v1/history/bench-long")] * repeats, args.concurrency))
+    report(Scenario("history_304").run(
+        [lambda: timed_get(client, "/api/v1/history/bench-long", (304,), {"If-None-Match": etag})] * repeats,
+        args.concurrency))
+    report(Scenario("history_since").run(
+        [lambda: timed_get(client, f"/api/v1/history/bench-long?since={last_id}")] * repeats, args.concurrency))
+
+    sessions = [f"json-{index}" for index in range(args.sessions)]
+    report(Scenario("export_pdf").run(
+        [lambda session_id=session_id: timed_get(client, f"/api/v1/export-pdf/{session_id}") for session_id in sessions],
+        args.concurrency))
+    report(Scenario("export_pdf_cached").run(
+        [lambda session_id=session_id: timed_get(client, f"/api/v1/export-pdf/{session_id}") for session_id in sessions],
+        args.concurrency))
+    report(Scenario("export_pdf_long").run(
+        [lambda: timed_get(client, "/api/v1/export-pdf/bench-long")], 1))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+    if any(result["errors"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
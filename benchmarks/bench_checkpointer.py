@@ -0,0 +1,86 @@
+"""
+Throughput de los checkpointers: MemorySaver frente a SQLiteCheckpointSaver.
+
+Ejecuta un grafo con el mismo esquema que el chat (ChatState) y un nodo que
+responde sin llamar a ningún LLM, midiendo turnos por segundo (invoke +
+get_state, como hace /chat seguido de /history). Para SQLite también se mide
+con varios procesos escribiendo en el mismo fichero, como varios workers de
+gunicorn.
+
+Uso:
+    python -m benchmarks.bench_checkpointer [turnos] [sesiones] [procesos]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import START, StateGraph
+
+from app.chat.models.chat_models import ChatState
+from app.chat.models.message_log import MessageLog
+from app.core.checkpointer import SQLiteCheckpointSaver, checkpoint_serde
+
+
+def build_graph(checkpointer):
+    def echo(state: ChatState):
+        return {"messages": [AIMessage(content="respuesta " * 40)]}
+
+    workflow = StateGraph(state_schema=ChatState)
+    workflow.add_node("model", echo)
+    workflow.add_edge(START, "model")
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def run_turns(graph, turns: int, sessions: int, prefix: str = "s") -> float:
+    start = time.perf_counter()
+    for turn in range(turns):
+        session_id = f"{prefix}-{turn % sessions}"
+        config = {"configurable": {"thread_id": session_id}}
+        graph.invoke({
+            "messages": [HumanMessage(content=f"mensaje {turn} " * 20)],
+            "provider": "openai",
+            "session_id": session_id,
+            "prompt_type": "general",
+        }, config)
+        graph.get_state(config)
+    return time.perf_counter() - start
+
+
+def _worker(path: str, turns: int, sessions: int, index: int, results):
+    graph = build_graph(SQLiteCheckpointSaver(path, serde=checkpoint_serde((MessageLog,))))
+    results.put(run_turns(graph, turns, sessions, prefix=f"p{index}"))
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    from langgraph.checkpoint.memory import MemorySaver
+    elapsed = run_turns(build_graph(MemorySaver(serde=checkpoint_serde((MessageLog,)))), turns, sessions)
+    print(f"MemorySaver          1 proceso : {turns / elapsed:8.1f} turnos/s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        elapsed = run_turns(build_graph(SQLiteCheckpointSaver(path, serde=checkpoint_serde((MessageLog,)))), turns, sessions)
+        print(f"SQLite (WAL)         1 proceso : {turns / elapsed:8.1f} turnos/s")
+
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=_worker, args=(path, turns, sessions, i, results))
+            for i in range(processes)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        print(f"SQLite (WAL) {processes:>6} procesos: {turns * processes / elapsed:8.1f} turnos/s (agregado)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Prueba de carga: streams SSE concurrentes por worker.
+
+Abre N streams simultáneos contra /api/v1/chat?stream=true de un servidor ya
+arrancado y mide cuántos se completan, el tiempo hasta el primer evento y el
+tiempo total. Sirve para comparar el modo WSGI (gunicorn, un hilo por stream)
+con el modo ASGI (uvicorn, un event loop por worker):
+
+    gunicorn -w 1 --threads 8 -b :5000 entrypoint:app
+    uvicorn app.asgi:app --workers 1 --port 8000
+
+    python -m benchmarks.bench_concurrent_streams http://localhost:5000 200 openai
+    python -m benchmarks.bench_concurrent_streams http://localhost:8000 200 openai
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+
+async def one_stream(client: httpx.AsyncClient, base_url: str, provider: str, index: int):
+    start = time.perf_counter()
+    first_event = None
+    async with client.stream(
+        "POST",
+        f"{base_url}/api/v1/chat",
+        params={"provider": provider, "stream": "true", "stream_mode": "delta"},
+        json={"message": f"Consulta de carga {index}", "session_id": f"load-{index}"},
+    ) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("data:") and first_event is None and '"start"' not in line:
+                first_event = time.perf_counter() - start
+            if '"done"' in line:
+                return first_event, time.perf_counter() - start
+    raise RuntimeError("stream sin evento done")
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:5000"
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    provider = sys.argv[3] if len(sys.argv) > 3 else "openai"
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=600, limits=limits) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(one_stream(client, base_url, provider, i) for i in range(concurrency)),
+            return_exceptions=True,
+        )
+        wall = time.perf_counter() - start
+
+    ok = [r for r in results if not isinstance(r, Exception)]
+    print(f"{base_url}: {len(ok)}/{concurrency} streams completados en {wall:.2f}s")
+    if ok:
+        ttfe = [r[0] for r in ok if r[0] is not None]
+        total = [r[1] for r in ok]
+        print(f"  primer evento p50={statistics.median(ttfe):.2f}s p99={percentile(ttfe, 99):.2f}s")
+        print(f"  duración      p50={statistics.median(total):.2f}s p99={percentile(total, 99):.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+"""
+Coste de guardar el historial en el checkpoint: mensajes de LangChain frente al
+historial compacto (MessageLog) que usa el grafo de chat.
+
+Para sesiones de varias longitudes mide, con el serializador de los checkpointers:
+bytes del historial serializado, tiempo de serializarlo y de leerlo, memoria de
+los objetos que resultan al leerlo y coste del reducer al añadir un turno.
+Después ejecuta turnos reales sobre un grafo con MemorySaver y compara la memoria
+total que ocupa la sesión en el checkpointer.
+
+Uso:
+    python -m benchmarks.bench_history_storage [tamaños separados por comas] [turnos del grafo]
+"""
+import sys
+import time
+import tracemalloc
+import uuid
+from typing import Annotated, Sequence, TypedDict
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import START, StateGraph
+from langgraph.graph.message import add_messages
+
+from app.chat.models.chat_models import ChatState
+from app.chat.models.message_log import MessageLog, add_compact_messages
+from app.core.checkpointer import checkpoint_serde
+
+
+class LegacyState(TypedDict):
+    """Esquema anterior: lista de mensajes de LangChain con add_messages"""
+    messages: Annotated[Sequence[BaseMessage], add_messages]
+
+
+def build_messages(count: int):
+    messages = []
+    for i in range(count // 2):
+        messages.append(HumanMessage(content=f"Consulta {i}: el paciente refiere rumiación nocturna. " * 4,
+                                     id=str(uuid.uuid4())))
+        # Metadatos como los que devuelve un proveedor real
+        messages.append(AIMessage(
+            content=f"Respuesta {i}: se propone registro de pensamientos y TCC-I. " * 12,
+            id=f"run-{uuid.uuid4()}-0",
+            response_metadata={"model_name": "gpt-4o-mini", "finish_reason": "stop", "system_fingerprint": "fp_0a"},
+            usage_metadata={"input_tokens": 900, "output_tokens": 150, "total_tokens": 1050},
+        ))
+    return messages
+
+
+def timed(func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def loaded_kib(serde, blob) -> float:
+    tracemalloc.start()
+    value = serde.loads_typed(blob)
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del value
+    return current / 1024
+
+
+def storage_row(label: str, serde, history, reducer, turn):
+    blob = serde.dumps_typed(history)
+    return (
+        label,
+        len(blob[1]) / 1024,
+        timed(lambda: serde.dumps_typed(history)) * 1000,
+        timed(lambda: serde.loads_typed(blob)) * 1000,
+        loaded_kib(serde, blob),
+        timed(lambda: reducer(history, turn)) * 1000,
+    )
+
+
+def saver_kib(saver) -> float:
+    """Bytes que ocupan los checkpoints, blobs y escrituras guardados en MemorySaver"""
+    total = sum(len(blob) for _, blob in saver.blobs.values())
+    for namespaces in saver.storage.values():
+        for checkpoints in namespaces.values():
+            for checkpoint, metadata, _ in checkpoints.values():
+                total += len(checkpoint[1]) + len(metadata[1])
+    for writes in saver.writes.values():
+        total += sum(len(write[2][1]) for write in writes.values())
+    return total / 1024
+
+
+def graph_kib(schema, turns: int) -> tuple:
+    def echo(state):
+        return {"messages": [AIMessage(content="respuesta del modelo " * 30, response_metadata={"model_name": "x"})]}
+
+    saver = MemorySaver(serde=checkpoint_serde((MessageLog,)))
+    workflow = StateGraph(state_schema=schema)
+    workflow.add_node("model", echo)
+    workflow.add_edge(START, "model")
+    graph = workflow.compile(checkpointer=saver)
+    config = {"configurable": {"thread_id": "bench"}}
+
+    start = time.perf_counter()
+    for turn in range(turns):
+        graph.invoke({"messages": [HumanMessage(content=f"mensaje {turn} " * 20)]}, config)
+    elapsed = time.perf_counter() - start
+    return saver_kib(saver), elapsed / turns * 1000
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1].split(",")] if len(sys.argv) > 1 else [100, 1000, 10000]
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    serde = checkpoint_serde((MessageLog,))
+
+    print(f"{'mensajes':>8} {'formato':<10} {'KiB':>9} {'dump ms':>9} {'load ms':>9} "
+          f"{'mem KiB':>9} {'turno ms':>9}")
+    for size in sizes:
+        messages = build_messages(size)
+        turn = build_messages(2)
+        for row in (
+            storage_row("langchain", serde, messages, add_messages, turn),
+            storage_row("compacto", serde, MessageLog.from_messages(messages), add_compact_messages, turn),
+        ):
+            label, kib, dump_ms, load_ms, mem_kib, turn_ms = row
+            print(f"{size:>8} {label:<10} {kib:>9.1f} {dump_ms:>9.2f} {load_ms:>9.2f} "
+                  f"{mem_kib:>9.1f} {turn_ms:>9.3f}")
+
+    print(f"\nMemorySaver tras {turns} turnos en una sesión:")
+    for label, schema in (("langchain", LegacyState), ("compacto", ChatState)):
+        kib, turn_ms = graph_kib(schema, turns)
+        print(f"  {label:<10} {kib / 1024:>8.1f} MiB  {turn_ms:>7.2f} ms/turno")
+
+
+if __name__ == "__main__":
+    main()
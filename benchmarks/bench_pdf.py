@@ -0,0 +1,68 @@
+"""
+Tiempo y memoria pico del informe PDF según el tamaño de la sesión.
+
+Compara la generación en memoria (`generate_clinical_report`, BytesIO) con la
+escritura directa a un fichero temporal (`write_clinical_report`), que es la que
+usan las exportaciones (también `GET /export-pdf`). El fichero reduce la memoria
+pico, no el tiempo: ReportLab escribe el PDF al final de la maquetación. El resumen se pasa ya calculado para no llamar a ningún LLM.
+
+Uso:
+    python -m benchmarks.bench_pdf [tamaños separados por comas]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.chat.services.pdf_service import PDFService
+
+
+def build_messages(count: int):
+    messages = []
+    for i in range(count):
+        if i % 2 == 0:
+            messages.append(HumanMessage(content=f"Consulta {i}: paciente con ansiedad y problemas de sueño. " * 3))
+        else:
+            messages.append(AIMessage(content=f"Respuesta {i}: se sugiere reestructuración cognitiva y registro. " * 8))
+    return messages
+
+
+def measure(render) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = render()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1].split(",")] if len(sys.argv) > 1 else [100, 1000, 10000]
+    service = PDFService()
+    summary = "Resumen de prueba."
+
+    print(f"{'mensajes':>9} {'modo':>8} {'tiempo':>9} {'pico memoria':>13} {'tamaño PDF':>11}")
+    for count in sizes:
+        messages = build_messages(count)
+
+        def in_memory():
+            return len(service.generate_clinical_report("bench", messages, summary=summary).getvalue())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.pdf")
+
+            def to_file():
+                service.write_clinical_report(path, "bench", messages, summary=summary)
+                return os.path.getsize(path)
+
+            for mode, render in (("memoria", in_memory), ("fichero", to_file)):
+                elapsed, peak, size = measure(render)
+                print(f"{count:>9} {mode:>8} {elapsed:>8.2f}s {peak / 2**20:>10.1f} MiB {size / 2**20:>7.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Micro-benchmark del coste por petición de obtener y formatear un prompt.
+
+Compara el comportamiento anterior (construir los cuatro ChatPromptTemplate en
+cada llamada y formatear con la plantilla) con el registro precompilado de
+PromptManager.
+
+Uso:
+    python -m benchmarks.bench_prompts
+"""
+import timeit
+from langchain_core.messages import HumanMessage, AIMessage
+
+from app.chat.prompts.prompt_manager import PromptManager
+from app.chat.prompts.psychology_prompts import PsychologyPrompts
+
+
+def build_history(turns: int):
+    history = []
+    for i in range(turns):
+        history.append(HumanMessage(content=f"Consulta {i} sobre el caso clínico"))
+        history.append(AIMessage(content=f"Respuesta {i} con sugerencias terapéuticas"))
+    return history
+
+
+def legacy_format(prompt_type: str, history):
+    prompts = {
+        "general": PsychologyPrompts.get_general_prompt(),
+        "case_analysis": PsychologyPrompts.get_case_analysis_prompt(),
+        "documentation": PsychologyPrompts.get_documentation_prompt(),
+        "resources": PsychologyPrompts.get_resources_prompt()
+    }
+    return prompts.get(prompt_type, prompts["general"]).format_messages(messages=history)
+
+
+def registry_format(prompt_type: str, history):
+    return PromptManager.get_prompt(prompt_type).format_messages(messages=history)
+
+
+def run(number: int = 2000):
+    for turns in (1, 20):
+        history = build_history(turns)
+        assert legacy_format("resources", history) == registry_format("resources", history)
+        legacy = timeit.timeit(lambda: legacy_format("resources", history), number=number)
+        registry = timeit.timeit(lambda: registry_format("resources", history), number=number)
+        print(
+            f"{turns * 2:>3} mensajes | anterior: {legacy / number * 1e6:8.1f} µs/petición"
+            f" | registro: {registry / number * 1e6:8.1f} µs/petición"
+            f" | x{legacy / registry:.0f}"
+        )
+
+
+if __name__ == "__main__":
+    run()
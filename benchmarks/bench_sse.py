@@ -0,0 +1,51 @@
+"""
+Ancho de banda y CPU del streaming SSE: protocolo "full" frente a "delta".
+
+Simula una respuesta de N tokens (fragmentos de ~4 caracteres, como los que
+envían los proveedores) y genera los eventos SSE de cada protocolo, midiendo
+bytes enviados, número de eventos y tiempo de CPU.
+
+Uso:
+    python -m benchmarks.bench_sse [tokens]
+"""
+import sys
+import time
+
+from app.chat.services.streaming import delta_frames, full_frames
+from app.config.config import config
+
+WORDS = "la terapia cognitivo conductual ayuda a identificar pensamientos automáticos y creencias".split()
+
+
+def fake_deltas(tokens: int):
+    for i in range(tokens):
+        word = WORDS[i % len(WORDS)]
+        yield (" " if i else "") + word[:4]
+
+
+def measure(frames):
+    start = time.process_time()
+    total_bytes = 0
+    events = 0
+    for frame in frames:
+        total_bytes += len(frame.encode("utf-8"))
+        events += 1
+    return total_bytes, events, time.process_time() - start
+
+
+def main():
+    tokens = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    interval = config.sse_flush_interval_ms / 1000
+    max_chars = config.sse_flush_max_chars
+
+    full = measure(full_frames(fake_deltas(tokens)))
+    delta = measure(delta_frames(fake_deltas(tokens), interval, max_chars))
+
+    print(f"Respuesta de {tokens} tokens (SSE_FLUSH_MAX_CHARS={max_chars})")
+    for name, (total_bytes, events, cpu) in (("full", full), ("delta", delta)):
+        print(f"  {name:<5}: {total_bytes / 1024:10.1f} KiB | {events:5d} eventos | {cpu * 1000:8.2f} ms CPU")
+    print(f"  reducción: x{full[0] / delta[0]:.0f} bytes, x{full[2] / max(delta[2], 1e-9):.0f} CPU")
+
+
+if __name__ == "__main__":
+    main()
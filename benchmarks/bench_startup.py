@@ -0,0 +1,180 @@
+"""
+Coste de arranque de un worker: tiempo de importación, primera petición y memoria.
+
+1. En un proceso nuevo por repetición: tiempo de `import entrypoint`, de la primera
+   petición que construye los servicios de chat (/api/v1/prompt-types) y de
+   `prewarm()`, con la RSS tras cada paso.
+2. Con gunicorn (si está instalado): arranca N workers con PRELOAD_APP=false y
+   PRELOAD_APP=true, mide el tiempo hasta responder /health y la primera petición,
+   y muestra RSS y PSS por worker. La PSS reparte las páginas compartidas entre
+   los procesos que las usan, así que refleja lo que se ahorra con el preload.
+
+Uso:
+    python -m benchmarks.bench_startup [--repeat 3] [--workers 2] [--port 8765]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+COLD_START = r"""
+import json, sys, time
+
+def rss_mib():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+result = {"rss_base_mib": rss_mib()}
+start = time.perf_counter()
+import entrypoint
+result["import_s"] = time.perf_counter() - start
+result["rss_import_mib"] = rss_mib()
+
+client = entrypoint.app.test_client()
+start = time.perf_counter()
+status = client.get("/api/v1/prompt-types").status_code
+result["first_request_s"] = time.perf_counter() - start
+result["first_request_ok"] = status == 200
+result["rss_first_request_mib"] = rss_mib()
+
+from app import prewarm
+start = time.perf_counter()
+prewarm()
+result["prewarm_s"] = time.perf_counter() - start
+result["rss_prewarm_mib"] = rss_mib()
+print(json.dumps(result))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="procesos en frío a medir")
+    parser.add_argument("--workers", type=int, default=2, help="workers de gunicorn")
+    parser.add_argument("--port", type=int, default=8765, help="puerto para gunicorn")
+    return parser.parse_args()
+
+
+def cold_start(repeat: int):
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_START], capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"Proceso en frío (mediana de {repeat}):")
+    for key, label in (("import_s", "import entrypoint"), ("first_request_s", "primera petición"),
+                       ("prewarm_s", "prewarm (tras la petición)")):
+        print(f"  {label:<28} {statistics.median(run[key] for run in runs) * 1000:>9.1f} ms")
+    for key, label in (("rss_base_mib", "RSS intérprete"), ("rss_import_mib", "RSS tras import"),
+                       ("rss_first_request_mib", "RSS tras 1ª petición"), ("rss_prewarm_mib", "RSS tras prewarm")):
+        print(f"  {label:<28} {statistics.median(run[key] for run in runs):>9.1f} MiB")
+    if not all(run["first_request_ok"] for run in runs):
+        print("  Error: la primera petición no devolvió 200")
+        sys.exit(1)
+
+
+def memory_mib(pid: int) -> tuple:
+    """RSS y PSS de un proceso (PSS desde smaps_rollup, si el kernel lo ofrece)"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in ("Rss", "Pss"):
+                    values[name] = int(rest.split()[0]) / 1024
+    except OSError:
+        pass
+    return values.get("Rss", 0.0), values.get("Pss", 0.0)
+
+
+def children(pid: int) -> list:
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status") as f:
+                if any(line.split() == ["PPid:", str(pid)] for line in f):
+                    pids.append(int(entry))
+        except OSError:
+            continue
+    return sorted(pids)
+
+
+def get(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            response.read()
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def gunicorn_run(preload: bool, workers: int, port: int):
+    env = {**os.environ, "PRELOAD_APP": "true" if preload else "false"}
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-w", str(workers),
+         "-b", f"127.0.0.1:{port}", "entrypoint:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while not get(f"{base}/health"):
+            if process.poll() is not None or time.perf_counter() - start > 60:
+                print(f"  Error: gunicorn no arrancó (preload={preload})")
+                sys.exit(1)
+            time.sleep(0.05)
+        ready = time.perf_counter() - start
+
+        # Varias peticiones para que (casi) todos los workers construyan los servicios
+        first = time.perf_counter()
+        ok = get(f"{base}/api/v1/prompt-types")
+        first = time.perf_counter() - first
+        for _ in range(workers * 4):
+            ok = get(f"{base}/api/v1/prompt-types") and ok
+
+        pids = children(process.pid)
+        while len(pids) < workers and time.perf_counter() - start < 60:
+            time.sleep(0.1)
+            pids = children(process.pid)
+        memory = [memory_mib(pid) for pid in pids]
+        master = memory_mib(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+
+    print(f"gunicorn -w {workers} PRELOAD_APP={str(preload).lower()}:")
+    print(f"  hasta /health {ready * 1000:>9.1f} ms   primera petición {first * 1000:>9.1f} ms")
+    print(f"  maestro       RSS {master[0]:>7.1f} MiB  PSS {master[1]:>7.1f} MiB")
+    for pid, (rss, pss) in zip(pids, memory):
+        print(f"  worker {pid:<6} RSS {rss:>7.1f} MiB  PSS {pss:>7.1f} MiB")
+    total = master[1] + sum(pss for _, pss in memory)
+    print(f"  PSS total     {total:>7.1f} MiB")
+    if not ok:
+        print("  Error: alguna petición no devolvió 200")
+        sys.exit(1)
+
+
+def main():
+    args = parse_args()
+    cold_start(args.repeat)
+
+    if importlib.util.find_spec("gunicorn") is None:
+        print("gunicorn no está instalado; se omite la comparación de workers")
+        return
+    for preload in (False, True):
+        gunicorn_run(preload, args.workers, args.port)
+
+
+if __name__ == "__main__":
+    main()
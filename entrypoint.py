@@ -1,5 +1,8 @@
 
+from flask import Response
+
 from app import create_app
+from app.core.metrics import CONTENT_TYPE, registry
 
 app = create_app()
 
@@ -7,3 +10,6 @@ app = create_app()
 def health():
     return "OK"
 
+@app.route("/metrics")
+def metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,27 @@
+"""
+Configuración de gunicorn (se carga automáticamente desde el directorio del proyecto).
+
+La app importa LangGraph, los proveedores y reportlab de forma diferida, en la
+primera petición de cada worker. Con PRELOAD_APP=true el proceso maestro carga
+la app y la precalienta antes de crear los workers: éstos heredan los módulos al
+hacer fork (memoria compartida copy-on-write) y atienden la primera petición sin
+esperar a las importaciones.
+
+    PRELOAD_APP=true gunicorn entrypoint:app
+"""
+import gc
+import os
+
+preload_app = os.getenv("PRELOAD_APP", "false").lower() == "true"
+
+
+def when_ready(server):
+    # El maestro ya tiene la app cargada (preload_app); aún no hay workers
+    if not preload_app:
+        return
+    from app import prewarm
+    prewarm()
+    # Los objetos ya creados no se recorren en las colecciones de los workers,
+    # así el GC no escribe en sus páginas y éstas siguen compartidas
+    gc.freeze()
+    server.log.info("App precargada en el proceso maestro")
@@ -0,0 +1,19 @@
+import pytest
+
+from app import create_app
+from app.config.config import config
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Cliente de la app Flask con el proveedor simulado (provider=fake) sin latencia"""
+    monkeypatch.setattr(config, "fake_provider_enabled", True)
+    monkeypatch.setattr(config, "fake_latency_ms", 0)
+    return create_app().test_client()
+
+
+@pytest.fixture
+def services(client):
+    """Instancia de ChatServices que atiende las peticiones de `client`"""
+    from app.chat.controller.chat_controller import chat_services
+    return chat_services.get()
@@ -0,0 +1,61 @@
+import json
+import threading
+import time
+
+from app.chat.services.chat_services import ChatServices
+
+
+def _post_batch(client, items):
+    response = client.post("/api/v1/chat/batch?provider=fake", json={"items": items})
+    return [json.loads(line) for line in response.data.decode("utf-8").splitlines()]
+
+
+def test_batch_runs_in_parallel_and_keeps_session_order(client, monkeypatch):
+    active, peak, order = [0], [0], []
+    lock = threading.Lock()
+    chat_turn = ChatServices._chat_turn
+
+    def slow_turn(self, state, config):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            order.append(state["messages"][-1].content)
+        time.sleep(0.05)
+        try:
+            return chat_turn(self, state, config)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    monkeypatch.setattr(ChatServices, "_chat_turn", slow_turn)
+    items = [{"message": f"{session}-{turn}", "session_id": f"batch-{session}"}
+             for turn in range(2) for session in "abc"]
+
+    lines = _post_batch(client, items)
+
+    results, summary = lines[:-1], lines[-1]
+    assert summary["type"] == "summary" and summary["succeeded"] == 6 and summary["failed"] == 0
+    assert sorted(line["index"] for line in results) == list(range(6))
+    assert peak[0] > 1
+    for session in "abc":
+        assert order.index(f"{session}-0") < order.index(f"{session}-1")
+        history = client.get(f"/api/v1/history/batch-{session}").json["messages"]
+        assert [msg["content"] for msg in history if msg["type"] == "HumanMessage"] == [f"{session}-0", f"{session}-1"]
+
+
+def test_failed_item_does_not_fail_the_batch(client, monkeypatch):
+    chat_turn = ChatServices._chat_turn
+
+    def flaky_turn(self, state, config):
+        if state["messages"][-1].content == "boom":
+            raise RuntimeError("provider down")
+        return chat_turn(self, state, config)
+
+    monkeypatch.setattr(ChatServices, "_chat_turn", flaky_turn)
+
+    lines = _post_batch(client, [{"message": "hola", "session_id": "batch-ok"},
+                                 {"message": "boom", "session_id": "batch-ko"}])
+
+    errors = [line for line in lines[:-1] if "error" in line]
+    assert [line["index"] for line in errors] == [1]
+    assert lines[-1]["succeeded"] == 1 and lines[-1]["failed"] == 1
@@ -0,0 +1,36 @@
+import pytest
+
+from app.chat.services.chat_services import ChatServices
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    captured = []
+    model_stream = ChatServices._model_stream
+
+    def capture(self, state, formatted_messages, estimated_tokens, routing):
+        captured.append(formatted_messages)
+        return model_stream(self, state, formatted_messages, estimated_tokens, routing)
+
+    monkeypatch.setattr(ChatServices, "_model_stream", capture)
+    return captured
+
+
+def _human_messages(formatted_messages):
+    return [msg.content for msg in formatted_messages if msg.type == "human"]
+
+
+@pytest.mark.parametrize("stream_mode", ["full", "delta"])
+def test_streamed_prompt_contains_user_message_once(client, prompts, stream_mode):
+    session_id = f"stream-prompt-{stream_mode}"
+    for message in ("primera", "segunda"):
+        response = client.post(
+            f"/api/v1/chat?provider=fake&stream=true&stream_mode={stream_mode}",
+            json={"message": message, "session_id": session_id, "prompt_type": "general"},
+        )
+        assert b'"type": "done"' in response.data
+
+    assert _human_messages(prompts[0]) == ["primera"]
+    assert _human_messages(prompts[1]) == ["primera", "segunda"]
+    history = client.get(f"/api/v1/history/{session_id}").json["messages"]
+    assert [msg["type"] for msg in history] == ["HumanMessage", "AIMessage", "HumanMessage", "AIMessage"]
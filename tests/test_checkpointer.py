@@ -0,0 +1,146 @@
+import asyncio
+import os
+import sqlite3
+import stat
+import threading
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import START, StateGraph
+from typing_extensions import TypedDict
+
+from app.core.checkpointer import SQLiteCheckpointSaver, batch_writes
+
+
+class State(TypedDict):
+    value: int
+
+
+def _config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+def _other_connection_can_write(path) -> bool:
+    conn = sqlite3.connect(path, timeout=0, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("ROLLBACK")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+def _reject_thread(saver, thread_id: str):
+    """Hace fallar dentro de la transacción cualquier escritura de `thread_id`"""
+    saver._connection().execute(
+        f"CREATE TRIGGER reject_{thread_id} BEFORE INSERT ON checkpoints WHEN NEW.thread_id = '{thread_id}' "
+        "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+    )
+
+
+@pytest.fixture
+def saver(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "checkpoints.sqlite3"), batch_size=3)
+    yield saver
+    saver.close()
+
+
+def test_put_writes_commits_immediately(saver):
+    saved = saver.put(_config("s1"), empty_checkpoint(), {}, {})
+    saver.put_writes(saved, [("value", 1)], "task-1")
+
+    assert not saver._connection().in_transaction
+    assert _other_connection_can_write(saver.path)
+
+
+def test_failing_node_releases_the_write_lock(saver):
+    def fail(state: State):
+        raise RuntimeError("provider down")
+
+    graph = StateGraph(State)
+    graph.add_node("model", fail)
+    graph.add_edge(START, "model")
+    app = graph.compile(checkpointer=saver)
+
+    with pytest.raises(RuntimeError):
+        app.invoke({"value": 1}, _config("s1"))
+
+    assert not saver._connection().in_transaction
+    assert _other_connection_can_write(saver.path)
+
+
+def test_failed_write_is_rolled_back(saver):
+    _reject_thread(saver, "lost")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        saver.put(_config("lost"), empty_checkpoint(), {}, {"value": 1})
+
+    assert not saver._connection().in_transaction
+    assert saver.get_tuple(_config("lost")) is None
+    assert _other_connection_can_write(saver.path)
+
+
+def test_batch_commits_every_batch_size_writes(saver):
+    with batch_writes(saver):
+        for index in range(2):
+            saver.put(_config(f"s{index}"), empty_checkpoint(), {}, {})
+        assert saver._connection().in_transaction
+        saver.put(_config("s2"), empty_checkpoint(), {}, {})
+        assert not saver._connection().in_transaction
+        saver.put(_config("s3"), empty_checkpoint(), {}, {})
+
+    assert not saver._connection().in_transaction
+    assert sorted(saver.list_threads()) == ["s0", "s1", "s2", "s3"]
+
+
+def test_failure_inside_batch_only_discards_that_write(saver):
+    _reject_thread(saver, "lost")
+
+    with batch_writes(saver):
+        saver.put(_config("kept"), empty_checkpoint(), {}, {"value": 1})
+        with pytest.raises(sqlite3.IntegrityError):
+            saver.put(_config("lost"), empty_checkpoint(), {}, {"value": 1})
+
+    assert list(saver.list_threads()) == ["kept"]
+
+
+def test_database_files_are_private(saver):
+    saver.put(_config("s1"), empty_checkpoint(), {}, {})
+
+    for path in (saver.path, f"{saver.path}-wal", f"{saver.path}-shm"):
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_async_methods_do_not_block_the_event_loop(saver):
+    saved = saver.put(_config("s1"), empty_checkpoint(), {}, {})
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        # Otro hilo retiene el checkpointer; la lectura espera sin parar el event loop
+        held = threading.Event()
+
+        def hold():
+            with saver._lock:
+                held.set()
+                threading.Event().wait(0.3)
+
+        threading.Thread(target=hold).start()
+        held.wait()
+        result = await saver.aget_tuple(saved)
+        ticker.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(run())
+
+    assert result is not None
+    assert ticks >= 10
@@ -0,0 +1,28 @@
+import pytest
+
+from app.chat.services.chat_services import ChatServices
+from app.config.config import config
+from app.core.context_budget import context_budget
+from app.core.llm_config import LLMConfig
+
+
+@pytest.fixture
+def services(monkeypatch):
+    monkeypatch.setattr(config, "auto_primary_provider", "gemini")
+    monkeypatch.setattr(config, "auto_secondary_provider", "openai")
+    monkeypatch.setattr(config, "gemini_context_window", 1048576)
+    monkeypatch.setattr(config, "openai_context_window", 8192)
+    services = ChatServices.__new__(ChatServices)
+    services.llm_config = LLMConfig()
+    return services
+
+
+def test_auto_budget_uses_the_smallest_window_of_both_providers(services):
+    assert services._context_window("auto") == 8192
+    assert services._context_limit("auto", "general") == context_budget.limit("gemini", "general", 8192)
+    assert services._context_limit("auto", "general") < services._context_limit("gemini", "general")
+
+
+def test_single_provider_budget_uses_its_own_window(services):
+    assert services._context_window("gemini") == 1048576
+    assert services._context_window("openai") == 8192
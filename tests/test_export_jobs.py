@@ -0,0 +1,45 @@
+import os
+import stat
+import threading
+
+from app.chat.services.export_jobs import DONE, ExportJobs
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def _wait(jobs, job_id):
+    for _ in range(200):
+        job = jobs.status(job_id)
+        if job["status"] == DONE:
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError("export did not finish")
+
+
+def test_exports_are_private(tmp_path):
+    export_dir = tmp_path / "exports"
+    export_dir.mkdir(mode=0o755)
+    os.chmod(export_dir, 0o755)
+    jobs = ExportJobs(str(export_dir), max_workers=1, cache_max_bytes=1 << 20, job_ttl_seconds=60)
+
+    job = jobs.submit("s1", "v1", lambda f: f.write(b"%PDF-1.4"))
+    _, path = jobs.result_path(_wait(jobs, job["job_id"])["job_id"])
+
+    assert _mode(export_dir) == 0o700
+    assert _mode(jobs.jobs_dir) == 0o700
+    assert _mode(path) == 0o600
+    assert _mode(jobs._job_path(job["job_id"])) == 0o600
+    with open(path, "rb") as f:
+        assert f.read() == b"%PDF-1.4"
+
+
+def test_second_export_of_same_version_is_cached(tmp_path):
+    jobs = ExportJobs(str(tmp_path / "exports"), max_workers=1, cache_max_bytes=1 << 20, job_ttl_seconds=60)
+    _wait(jobs, jobs.submit("s1", "v1", lambda f: f.write(b"%PDF"))["job_id"])
+
+    job = jobs.submit("s1", "v1", lambda f: f.write(b"other"))
+
+    assert job["cached"] and job["status"] == DONE
+    assert jobs.renders == 1
@@ -0,0 +1,20 @@
+import os
+
+from app.config.config import config
+
+
+def test_direct_export_streams_from_an_unlinked_temp_file(client, services, monkeypatch):
+    monkeypatch.setattr(config, "summary_provider", "fake")
+    client.post("/api/v1/chat?provider=fake", json={"message": "hola", "session_id": "export-direct"})
+
+    before = set(os.listdir(services.export_jobs.export_dir))
+
+    response = client.get("/api/v1/export-pdf/export-direct")
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/pdf"
+    assert response.is_streamed
+    assert response.get_data().startswith(b"%PDF")
+    response.close()
+    # El fichero temporal no llega a aparecer en el directorio de exportaciones
+    assert set(os.listdir(services.export_jobs.export_dir)) == before
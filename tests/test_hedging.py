@@ -0,0 +1,112 @@
+import socket
+import threading
+
+import httpx
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from app.core.hedging import CancelScope, enter_scope, exit_scope, hedged_stream, on_cancel
+from app.core.llm_config import _abort_on_cancel
+from app.core.single_flight import SingleFlight
+
+
+@pytest.fixture
+def stalled_server():
+    """Servidor SSE que envía las cabeceras y no llega a emitir ningún fragmento"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    connections = []
+
+    def serve():
+        try:
+            conn, _ = server.accept()
+        except OSError:
+            return
+        connections.append(conn)
+        conn.recv(4096)
+        conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield f"http://127.0.0.1:{server.getsockname()[1]}/"
+    for conn in connections:
+        conn.close()
+    server.close()
+
+
+def test_loser_blocked_before_first_token_is_aborted(stalled_server):
+    client = httpx.Client(event_hooks={"response": [_abort_on_cancel]})
+    loser_done = threading.Event()
+
+    def factory(provider):
+        if provider == "primary":
+            try:
+                with client.stream("GET", stalled_server) as response:
+                    for line in response.iter_lines():
+                        yield AIMessageChunk(content=line)
+            finally:
+                loser_done.set()
+        else:
+            yield AIMessageChunk(content="hola")
+
+    info = {}
+    chunks = list(hedged_stream(factory, ("primary", "secondary"), 0.1, info))
+
+    assert [chunk.content for chunk in chunks] == ["hola"]
+    assert info["provider"] == "secondary"
+    # Sin cortar la conexión, el perdedor seguiría bloqueado esperando su primer token
+    assert loser_done.wait(2)
+
+
+def test_cancel_scope_runs_callbacks_once():
+    scope = CancelScope()
+    calls = []
+    scope.add(lambda: calls.append("a"))
+    scope.cancel()
+    scope.cancel()
+    scope.add(lambda: calls.append("b"))
+
+    assert calls == ["a", "b"]
+    assert scope.cancelled
+
+
+def _upstream(aborted):
+    on_cancel(lambda: aborted.append(True))
+    for i in range(3):
+        yield i
+
+
+def test_cancelling_a_shared_stream_consumer_keeps_the_request():
+    flights = SingleFlight()
+    aborted = []
+    leader_scope, follower_scope = CancelScope(), CancelScope()
+
+    token = enter_scope(leader_scope)
+    leader = flights.stream("key", lambda: _upstream(aborted))
+    assert next(leader) == 0
+    exit_scope(token)
+
+    token = enter_scope(follower_scope)
+    follower = flights.stream("key", lambda: _upstream(aborted))
+    assert next(follower) == 0
+    exit_scope(token)
+
+    leader_scope.cancel()
+    assert aborted == []
+    leader.close()
+    assert list(follower) == [1, 2]
+
+
+def test_cancelling_the_only_consumer_aborts_the_request():
+    flights = SingleFlight()
+    aborted = []
+    scope = CancelScope()
+
+    token = enter_scope(scope)
+    stream = flights.stream("key", lambda: _upstream(aborted))
+    assert next(stream) == 0
+    exit_scope(token)
+
+    scope.cancel()
+    assert aborted == [True]
+    stream.close()
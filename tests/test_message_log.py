@@ -0,0 +1,51 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.chat.models.message_log import MessageLog, add_compact_messages
+from app.core.checkpointer import checkpoint_serde
+
+
+def _contents(log):
+    return [message.content for message in log]
+
+
+def test_append_to_latest_version_shares_the_columns():
+    first = add_compact_messages(None, [HumanMessage(content="a", id="1")])
+    second = add_compact_messages(first, [AIMessage(content="b", id="2")])
+
+    assert second.contents is first.contents
+    assert _contents(first) == ["a"] and len(first) == 1
+    assert _contents(second) == ["a", "b"]
+    assert second[-1].id == "2" and first[-1].id == "1"
+
+
+def test_append_to_an_older_version_copies():
+    base = add_compact_messages(None, [HumanMessage(content="a", id="1")])
+    left = add_compact_messages(base, [AIMessage(content="b", id="2")])
+    right = add_compact_messages(base, [AIMessage(content="c", id="3")])
+
+    assert right.contents is not left.contents
+    assert _contents(left) == ["a", "b"]
+    assert _contents(right) == ["a", "c"]
+    # Un id añadido en otra versión no cuenta como existente en ésta
+    again = add_compact_messages(base, [AIMessage(content="b2", id="2")])
+    assert _contents(again) == ["a", "b2"]
+
+
+def test_existing_id_replaces_the_message():
+    log = add_compact_messages(None, [HumanMessage(content="a", id="1"), AIMessage(content="b", id="2")])
+    updated = add_compact_messages(log, [AIMessage(content="b!", id="2"), HumanMessage(content="c", id="3")])
+
+    assert _contents(updated) == ["a", "b!", "c"]
+    assert _contents(log) == ["a", "b"]
+
+
+def test_serialised_log_keeps_only_its_messages():
+    serde = checkpoint_serde([MessageLog])
+    first = add_compact_messages(None, [HumanMessage(content="a", id="1")])
+    second = add_compact_messages(first, [AIMessage(content="b", id="2")])
+
+    restored = serde.loads_typed(serde.dumps_typed(first))
+    assert restored == first
+    assert _contents(restored) == ["a"]
+    assert _contents(add_compact_messages(restored, [AIMessage(content="c", id="3")])) == ["a", "c"]
+    assert serde.loads_typed(serde.dumps_typed(second)) == second
@@ -0,0 +1,21 @@
+import app.chat.prompts.prompt_classifier  # noqa: F401  (registra prompt_type=auto)
+import app.chat.prompts.prompt_manager  # noqa: F401  (registra los tipos de consulta)
+import app.core.llm_config  # noqa: F401  (registra los proveedores)
+from app.core import metrics
+
+
+def test_unknown_label_values_are_grouped_as_other():
+    metrics.count_request("x-provider-123", "x-type-456", "invoke")
+    metrics.observe_stage(metrics.SCHEMA_LOAD, 0.001, "x-provider-789", "auto")
+
+    output = metrics.registry.render()
+
+    assert "x-provider" not in output and "x-type" not in output
+    assert 'chatbot_chat_requests_total{provider="other",prompt_type="other",mode="invoke"}' in output
+    assert 'stage="schema_load",provider="other",prompt_type="auto"' in output
+
+
+def test_known_label_values_are_kept():
+    metrics.count_request("gemini", "case_analysis", "stream")
+
+    assert 'provider="gemini",prompt_type="case_analysis",mode="stream"' in metrics.registry.render()
@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.chat.services.pdf_service import PDFService
+
+
+class FakeSummaryModel:
+    def __init__(self, fail_on_call=None):
+        self.prompts = []
+        self.fail_on_call = fail_on_call
+
+    def invoke(self, messages):
+        self.prompts.append(messages[0].content)
+        if len(self.prompts) == self.fail_on_call:
+            raise RuntimeError("provider down")
+        return AIMessage(content=f"summary-{len(self.prompts)}", usage_metadata={
+            "input_tokens": 1, "output_tokens": 1, "total_tokens": 2,
+        })
+
+
+class FakeLLMConfig:
+    def __init__(self, model, max_messages=3):
+        self.model = model
+        self.config = SimpleNamespace(summary_provider="gemini", summary_max_messages=max_messages)
+
+    def get_chat_model(self, provider):
+        return self.model
+
+    def get_model_info(self, provider):
+        return {"model_name": "summary-test"}
+
+
+def _messages(count):
+    return [HumanMessage(content=f"m{i}") for i in range(count)]
+
+
+def test_first_summary_is_one_call_over_the_tail():
+    model = FakeSummaryModel()
+    messages = _messages(7)
+
+    summary, record = PDFService().update_ai_summary(messages, FakeLLMConfig(model))
+
+    assert summary == "summary-1"
+    assert record["count"] == 7
+    assert len(model.prompts) == 1
+    assert "m3\n" not in model.prompts[0] + "\n" and "m4" in model.prompts[0] and "m6" in model.prompts[0]
+
+
+def test_new_messages_are_folded_in_chunks():
+    service = PDFService()
+    messages = _messages(10)
+    _, record = service.update_ai_summary(messages[:3], FakeLLMConfig(FakeSummaryModel()))
+
+    model = FakeSummaryModel()
+    summary, record = service.update_ai_summary(messages, FakeLLMConfig(model), previous=record)
+
+    assert summary == "summary-3"
+    assert record["count"] == 10
+    assert len(model.prompts) == 3
+    # Cada mensaje nuevo se resume exactamente una vez, en orden
+    for message in messages[3:]:
+        assert sum(f"Psicólogo: {message.content}\n" in prompt + "\n" for prompt in model.prompts) == 1
+    assert "summary-1" in model.prompts[1] and "summary-2" in model.prompts[2]
+
+
+def test_cursor_only_advances_over_summarised_messages():
+    service = PDFService()
+    messages = _messages(10)
+    _, previous = service.update_ai_summary(messages[:3], FakeLLMConfig(FakeSummaryModel()))
+
+    summary, record = service.update_ai_summary(messages, FakeLLMConfig(FakeSummaryModel(fail_on_call=2)), previous=previous)
+
+    assert summary == "summary-1"
+    assert record["count"] == 6
+    assert record["hash"] == service._messages_hash(messages[:6])
+
+    model = FakeSummaryModel()
+    summary, record = service.update_ai_summary(messages, FakeLLMConfig(model), previous=record)
+
+    assert record["count"] == 10
+    assert len(model.prompts) == 2
+    assert "m5\n" not in model.prompts[0] + "\n" and "m6" in model.prompts[0]
+
+
+def test_failed_resume_keeps_the_previous_summary():
+    service = PDFService()
+    messages = _messages(5)
+    _, previous = service.update_ai_summary(messages[:3], FakeLLMConfig(FakeSummaryModel()))
+
+    summary, record = service.update_ai_summary(messages, FakeLLMConfig(FakeSummaryModel(fail_on_call=1)), previous=previous)
+
+    assert summary == previous["text"]
+    assert record is previous
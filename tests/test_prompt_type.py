@@ -0,0 +1,57 @@
+import json
+import stat
+
+import pytest
+
+from app.chat.prompts.prompt_classifier import PromptClassifier
+from app.chat.services.chat_services import ChatServices
+from app.config.config import config
+from app.core.llm_config import LLMConfig
+
+
+@pytest.fixture
+def example_log(monkeypatch, tmp_path):
+    path = tmp_path / "logs" / "examples.jsonl"
+    monkeypatch.setattr(config, "prompt_classifier_log_path", str(path))
+    return path
+
+
+@pytest.fixture
+def services():
+    services = ChatServices.__new__(ChatServices)
+    services.llm_config = LLMConfig()
+    return services
+
+
+def test_unknown_types_fall_back_to_general_and_are_not_logged(example_log):
+    assert ChatServices._resolve_prompt_type("no-such-type", "hola", "fake") == "general"
+    assert not example_log.exists()
+    assert ChatServices._resolve_prompt_type("case_analysis", "hola", "fake") == "case_analysis"
+    assert example_log.read_text(encoding="utf-8").count("\n") == 1
+
+
+def test_example_log_is_private(example_log):
+    ChatServices._resolve_prompt_type("resources", "Dame técnicas de relajación", "fake")
+
+    assert stat.S_IMODE(example_log.stat().st_mode) == 0o600
+    assert stat.S_IMODE(example_log.parent.stat().st_mode) == 0o700
+
+
+def test_saved_model_is_private(tmp_path):
+    path = tmp_path / "modelo.json"
+    PromptClassifier(["general"], {}, [0.0]).save(str(path))
+
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    assert json.loads(path.read_text(encoding="utf-8"))["labels"] == ["general"]
+
+
+def test_omitted_prompt_type_is_classified(services, monkeypatch):
+    assert ChatServices.prompt_types_payload()["default"] == "auto"
+    message = {"message": "Necesito ayuda para redactar el informe de evolución del paciente"}
+
+    state, _, _, _ = services.prepare_chat(message, {"provider": "openai"})
+    assert state["prompt_type"] == "documentation"
+
+    monkeypatch.setattr(config, "prompt_classifier_enabled", False)
+    state, _, _, _ = services.prepare_chat(message, {"provider": "openai"})
+    assert state["prompt_type"] == "general"
@@ -0,0 +1,69 @@
+import time
+
+from app.chat.services.response_cache import ResponseCache, normalize_message
+
+
+def test_normalized_message_hits_within_the_same_scope():
+    cache = ResponseCache(max_entries=10, ttl_seconds=60)
+    cache.put("¿Qué es la ansiedad?", "general", "openai", "gpt-4o", "respuesta")
+
+    assert normalize_message("  que es la ANSIEDAD ") == "que es la ansiedad"
+    assert cache.get("que es la ansiedad", "general", "openai", "gpt-4o") == "respuesta"
+    # prompt_type, proveedor y modelo forman parte de la clave
+    assert cache.get("que es la ansiedad", "resources", "openai", "gpt-4o") is None
+    assert cache.get("que es la ansiedad", "general", "gemini", "gpt-4o") is None
+    assert cache.get("que es la ansiedad", "general", "openai", "gpt-4.1") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_entries_expire_and_are_evicted_in_lru_order(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = ResponseCache(max_entries=2, ttl_seconds=10)
+    cache.put("a", "general", "openai", "m", "ra")
+    cache.put("b", "general", "openai", "m", "rb")
+    assert cache.get("a", "general", "openai", "m") == "ra"
+    cache.put("c", "general", "openai", "m", "rc")
+
+    assert cache.get("b", "general", "openai", "m") is None
+    assert cache.get("a", "general", "openai", "m") == "ra"
+    assert cache.stats()["evictions"] == 1
+
+    now[0] += 11
+    assert cache.get("a", "general", "openai", "m") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_near_duplicates_are_served_only_when_enabled():
+    question = "cuales son las tecnicas de respiracion para un ataque de panico"
+    variant = "cuales son las tecnicas de respiracion para un ataque de panico?!"
+    different = "como documentar una primera entrevista clinica"
+    exact = ResponseCache(max_entries=10, ttl_seconds=60)
+    near = ResponseCache(max_entries=10, ttl_seconds=60, near_duplicates=True, similarity=0.8)
+    for cache in (exact, near):
+        cache.put(question + " hoy", "resources", "openai", "m", "respuesta")
+
+    assert exact.get(variant + " hoy mismo", "resources", "openai", "m") is None
+    assert near.get(variant + " hoy mismo", "resources", "openai", "m") == "respuesta"
+    assert near.get(different, "resources", "openai", "m") is None
+    assert near.stats()["near_hits"] == 1
+
+
+def test_chat_serves_context_free_questions_from_cache(client, services, monkeypatch):
+    monkeypatch.setattr(services, "response_cache", ResponseCache(max_entries=10, ttl_seconds=60))
+
+    def ask(session_id, message="¿Qué es la ansiedad?"):
+        return client.post(
+            "/api/v1/chat?provider=fake", json={"message": message, "session_id": session_id}
+        ).json
+
+    first = ask("cache-1")
+    second = ask("cache-2")
+    # Con historial previo en la sesión la pregunta no se sirve desde caché
+    follow_up = ask("cache-1")
+
+    assert "cached" not in first
+    assert second == {**first, "cached": True}
+    assert "cached" not in follow_up
+    history = client.get("/api/v1/history/cache-2").json["messages"]
+    assert [msg["type"] for msg in history] == ["HumanMessage", "AIMessage"]
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from app.core import metrics, scheduler
+from app.core.scheduler import ProviderScheduler, get_scheduler
+
+
+def _wait_queued(sched, depth):
+    for _ in range(200):
+        if sched.stats()["queue_depth"] == depth:
+            return
+        time.sleep(0.005)
+    raise AssertionError(f"queue depth never reached {depth}")
+
+
+def test_waiting_sessions_are_served_round_robin():
+    sched = ProviderScheduler("test", max_concurrency=1)
+    holder = sched.acquire("holder")
+    granted = []
+    threads = []
+    for index, session_id in enumerate(["a", "a", "a", "b", "c"]):
+        def run(session_id=session_id, index=index):
+            with sched.slot(session_id):
+                granted.append(f"{session_id}{index}")
+        thread = threading.Thread(target=run)
+        thread.start()
+        threads.append(thread)
+        _wait_queued(sched, index + 1)
+
+    assert sched.stats()["sessions_waiting"] == 3
+    sched.release(holder)
+    for thread in threads:
+        thread.join(2)
+
+    # Una sesión con ráfaga no pasa por delante de las demás
+    assert granted == ["a0", "b3", "c4", "a1", "a2"]
+    assert sched.stats()["queue_depth"] == 0 and sched.active == 0
+
+
+def test_token_budget_makes_calls_wait_for_refill():
+    sched = ProviderScheduler("test", max_concurrency=4, tokens_per_minute=6000)
+    with sched.slot("a", tokens=6000):
+        pass
+
+    started = time.monotonic()
+    ticket = sched.acquire("b", tokens=50)
+    waited = time.monotonic() - started
+    sched.release(ticket)
+
+    # 100 tokens/s: 50 tokens tardan ~0.5 s en reponerse
+    assert 0.3 < waited < 2
+    assert ticket.wait_seconds == pytest.approx(waited, abs=0.1)
+
+
+def test_unused_tokens_are_returned_to_the_budget():
+    sched = ProviderScheduler("test", max_concurrency=4, tokens_per_minute=6000)
+    with sched.slot("a", tokens=6000) as ticket:
+        ticket.used_tokens = 100
+
+    assert sched.stats()["tokens_available"] >= 5900
+
+
+def test_queue_timeout_raises_and_leaves_the_queue():
+    sched = ProviderScheduler("test", max_concurrency=1, queue_timeout=0.1)
+    holder = sched.acquire("holder")
+
+    with pytest.raises(TimeoutError):
+        sched.acquire("late")
+
+    stats = sched.stats()
+    assert stats["timeouts"] == 1 and stats["queue_depth"] == 0
+    sched.release(holder)
+
+
+def test_unknown_provider_has_no_scheduler():
+    with pytest.raises(ValueError):
+        get_scheduler("junk0")
+
+    assert "junk0" not in scheduler._schedulers
+
+
+def test_bogus_provider_request_leaves_no_scheduler_or_metric(client):
+    response = client.post("/api/v1/chat?provider=junk1", json={"message": "hola", "session_id": "junk"})
+
+    assert response.status_code >= 400
+    assert "junk1" not in scheduler._schedulers
+    assert "junk1" not in metrics.registry.render()
+
+
+def test_scheduler_gauges_use_bounded_labels(monkeypatch):
+    monkeypatch.setitem(scheduler._schedulers, "junk2", ProviderScheduler("junk2", max_concurrency=1))
+
+    output = metrics.registry.render()
+
+    assert "junk2" not in output
+    assert 'chatbot_scheduler_active{provider="other"} 0' in output
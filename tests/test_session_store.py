@@ -0,0 +1,87 @@
+import os
+import stat
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+
+from app.core.session_store import TieredMemorySaver
+
+
+def _config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+def _save(saver, thread_id: str):
+    saver.put(_config(thread_id), empty_checkpoint(), {}, {})
+
+
+@pytest.fixture
+def saver(tmp_path):
+    return TieredMemorySaver(str(tmp_path / "spill"), max_bytes=0, max_sessions=2, ttl_seconds=0)
+
+
+def test_lookup_miss_does_not_register_session(saver):
+    _save(saver, "real-1")
+    _save(saver, "real-2")
+
+    for index in range(10):
+        assert saver.get_tuple(_config(f"probe-{index}")) is None
+        assert list(saver.list(_config(f"probe-{index}"))) == []
+        assert saver.latest_checkpoint_id(f"probe-{index}") is None
+
+    stats = saver.stats()
+    assert stats["sessions_in_memory"] == 2
+    assert stats["sessions_on_disk"] == 0
+    assert stats["evictions"] == {"lru": 0, "ttl": 0}
+    assert "probe-0" not in saver.storage
+
+
+def test_put_registers_and_evicts_by_lru(saver):
+    for thread_id in ("s1", "s2", "s3"):
+        _save(saver, thread_id)
+
+    assert saver.stats()["sessions_on_disk"] == 1
+    assert saver.get_tuple(_config("s1")) is not None
+    assert saver.stats()["disk_hits"] == 1
+
+
+def test_default_spill_dir_is_private():
+    saver = TieredMemorySaver(max_bytes=0, max_sessions=1, ttl_seconds=0)
+    _save(saver, "s1")
+    _save(saver, "s2")
+
+    info = os.stat(saver.spill_dir)
+    assert info.st_uid == os.geteuid()
+    assert stat.S_IMODE(info.st_mode) == 0o700
+    spilled = os.path.join(saver.spill_dir, str(os.getpid()))
+    assert stat.S_IMODE(os.stat(spilled).st_mode) == 0o700
+    for name in os.listdir(spilled):
+        assert stat.S_IMODE(os.stat(os.path.join(spilled, name)).st_mode) == 0o600
+
+
+def test_configured_spill_dir_is_made_private(tmp_path):
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir(mode=0o755)
+
+    TieredMemorySaver(str(spill_dir), max_bytes=0, max_sessions=1, ttl_seconds=0)
+
+    assert stat.S_IMODE(os.stat(spill_dir).st_mode) == 0o700
+
+
+def test_spill_dir_writable_by_others_is_rejected(tmp_path):
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+    os.chmod(spill_dir, 0o777)
+
+    with pytest.raises(PermissionError):
+        TieredMemorySaver(str(spill_dir), max_bytes=0, max_sessions=1, ttl_seconds=0)
+
+
+def test_spill_dir_symlink_is_rejected(tmp_path):
+    target = tmp_path / "target"
+    target.mkdir(mode=0o700)
+    link = tmp_path / "spill"
+    link.symlink_to(target)
+
+    with pytest.raises(PermissionError):
+        TieredMemorySaver(str(link), max_bytes=0, max_sessions=1, ttl_seconds=0)
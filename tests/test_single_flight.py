@@ -0,0 +1,77 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from app.core.single_flight import SingleFlight, request_key
+
+
+def test_identical_concurrent_calls_share_one_upstream_call():
+    flights = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def call():
+        calls.append(True)
+        release.wait(2)
+        return "respuesta"
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(flights.do, "key", call) for _ in range(5)]
+        while flights.leaders + flights.joined < 5:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert sorted(results) == [("respuesta", False)] + [("respuesta", True)] * 4
+    # Al terminar la clave se libera: no es una caché
+    assert flights.do("key", lambda: "nueva") == ("nueva", False)
+
+
+def test_joiners_receive_the_leader_error():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def call():
+        release.wait(2)
+        raise RuntimeError("provider down")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(flights.do, "key", call) for _ in range(3)]
+        while flights.leaders + flights.joined < 3:
+            time.sleep(0.01)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError, match="provider down"):
+                future.result()
+
+
+def test_late_stream_joiner_gets_replay_then_live_chunks():
+    flights = SingleFlight()
+    factory_calls = []
+
+    def factory():
+        factory_calls.append(True)
+        yield from ("a", "b", "c")
+
+    leader = flights.stream("key", factory)
+    assert next(leader) == "a"
+    assert next(leader) == "b"
+
+    follower = flights.stream("key", factory)
+    assert list(follower) == ["a", "b", "c"]
+    assert list(leader) == ["c"]
+    assert len(factory_calls) == 1
+    assert flights.stats()["streams_in_flight"] == 0
+
+
+def test_keys_are_scoped_to_the_session():
+    messages = [HumanMessage(content="¿Qué es la ansiedad?")]
+
+    first = request_key("invoke", "fake", "fake-model", messages, scope="session-1")
+
+    assert first == request_key("invoke", "fake", "fake-model", messages, scope="session-1")
+    assert first != request_key("invoke", "fake", "fake-model", messages, scope="session-2")
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+from app.chat.services.streaming import acoalesce_deltas, coalesce_deltas
+from app.core.hedging import on_cancel
+from app.core.single_flight import SingleFlight
+
+
+def _paused_deltas(closed: list):
+    try:
+        yield "a"
+        yield "b"
+        time.sleep(0.5)
+        yield "c"
+    finally:
+        closed.append(True)
+
+
+async def _apaused_deltas(closed: list):
+    try:
+        yield "a"
+        yield "b"
+        await asyncio.sleep(0.5)
+        yield "c"
+    finally:
+        closed.append(True)
+
+
+def _assert_flushed_during_pause(frames: list):
+    assert [text for text, _ in frames] == ["a", "b", "c"]
+    # "b" sale al vencer la ventana, sin esperar a que el modelo reanude
+    assert frames[1][1] < 0.3
+    assert frames[2][1] >= 0.45
+
+
+def test_buffer_is_flushed_while_the_model_pauses():
+    started = time.monotonic()
+    frames = [(text, time.monotonic() - started) for text in coalesce_deltas(_paused_deltas([]), 0.05, 1000)]
+
+    _assert_flushed_during_pause(frames)
+
+
+def test_closing_the_coalescer_closes_the_source():
+    closed = []
+    texts = coalesce_deltas(_paused_deltas(closed), 0.05, 1000)
+    assert next(texts) == "a"
+    texts.close()
+
+    deadline = time.monotonic() + 2
+    while not closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert closed
+
+
+def _stalled_deltas(aborted: list):
+    """Proveedor que tras el primer fragmento se queda esperando hasta que le cortan la conexión"""
+    connection = threading.Event()
+    on_cancel(lambda: (aborted.append(True), connection.set()))
+    yield "a"
+    connection.wait(5)
+
+
+def test_closing_the_coalescer_aborts_a_blocked_upstream_at_once():
+    aborted = []
+    texts = coalesce_deltas(_stalled_deltas(aborted), 0.05, 1000)
+    assert next(texts) == "a"
+    texts.close()
+
+    assert aborted == [True]
+
+
+def test_closing_the_coalescer_aborts_a_shared_stream_with_no_other_consumers():
+    aborted = []
+    flights = SingleFlight()
+    texts = coalesce_deltas(flights.stream("key", lambda: _stalled_deltas(aborted)), 0.05, 1000)
+    assert next(texts) == "a"
+    texts.close()
+
+    assert aborted == [True]
+
+
+def test_finished_stream_is_not_aborted():
+    aborted = []
+
+    def deltas():
+        on_cancel(lambda: aborted.append(True))
+        yield "a"
+
+    assert list(coalesce_deltas(deltas(), 0.05, 1000)) == ["a"]
+    assert aborted == []
+
+
+def test_async_buffer_is_flushed_while_the_model_pauses():
+    async def collect():
+        started = time.monotonic()
+        return [(text, time.monotonic() - started)
+                async for text in acoalesce_deltas(_apaused_deltas([]), 0.05, 1000)]
+
+    _assert_flushed_during_pause(asyncio.run(collect()))
+
+
+def test_async_closing_the_coalescer_closes_the_source():
+    closed = []
+
+    async def consume():
+        texts = acoalesce_deltas(_apaused_deltas(closed), 0.05, 1000)
+        assert await texts.__anext__() == "a"
+        await texts.__anext__()
+        await texts.aclose()
+
+    asyncio.run(consume())
+    assert closed